@@ -3,8 +3,8 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
-from movies.models import Review, Genre, UserPreference, Watchlist
-from django.db.models import Avg
+from movies.models import Review, Genre, UserPreference
+from movies.user_stats import user_stats_for
 import json
 
 
@@ -12,17 +12,16 @@ import json
 def user_profile(request):
     """Get user profile information"""
     user = request.user
-    user_reviews = Review.objects.filter(user=user)
-    watchlist_items = Watchlist.objects.filter(user=user)
+    stats = user_stats_for(user)
     
     return JsonResponse({
         'user_id': user.id,
         'username': user.username,
         'email': user.email,
         'date_joined': user.date_joined.isoformat(),
-        'total_reviews': user_reviews.count(),
-        'avg_rating': user_reviews.aggregate(Avg('rating'))['rating__avg'] or 0,
-        'watchlist_count': watchlist_items.count(),
+        'total_reviews': stats.review_count,
+        'avg_rating': stats.average_rating,
+        'watchlist_count': stats.watchlist_count,
     })
 
 
@@ -77,29 +76,18 @@ def update_preferences(request):
 def user_stats(request):
     """Get detailed user statistics"""
     user = request.user
-    user_reviews = Review.objects.filter(user=user)
-    
-    # Rating distribution
-    rating_distribution = {}
-    for i in range(1, 6):
-        rating_distribution[str(i)] = user_reviews.filter(rating=i).count()
-    
-    # Favorite genres based on ratings
-    favorite_genres = {}
-    for review in user_reviews.filter(rating__gte=4):
-        for genre in review.movie.genres.all():
-            favorite_genres[genre.name] = favorite_genres.get(genre.name, 0) + 1
+    stats = user_stats_for(user)
     
     # Recent reviews
-    recent_reviews = user_reviews.order_by('-created_at')[:5]
+    recent_reviews = Review.objects.filter(user=user).select_related('movie').order_by('-created_at')[:5]
     
     return JsonResponse({
         'user_id': user.id,
         'username': user.username,
-        'total_reviews': user_reviews.count(),
-        'avg_rating': user_reviews.aggregate(Avg('rating'))['rating__avg'] or 0,
-        'rating_distribution': rating_distribution,
-        'favorite_genres': dict(sorted(favorite_genres.items(), key=lambda x: x[1], reverse=True)[:5]),
+        'total_reviews': stats.review_count,
+        'avg_rating': stats.average_rating,
+        'rating_distribution': {str(star): count for star, count in stats.rating_histogram.items()},
+        'favorite_genres': dict(stats.favorite_genres(5)),
         'recent_reviews': [
             {
                 'movie_title': review.movie.title,
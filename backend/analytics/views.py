@@ -1,68 +1,62 @@
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.db.models import Avg, Count, Q
+from django.db.models import Count, F, Q, Sum
 from django.contrib.auth.decorators import login_required
-from movies.models import Movie, Review, Genre, MovieInteraction
+from movies.models import Movie, Genre
+from movies.json_stream import StreamingJSONResponse
+from movies.conditional import conditional_get, versions_etag, movies_etag, movies_last_modified
+from movies.page_cache import MOVIES_VERSION_KEY, REVIEWS_VERSION_KEY, USERS_VERSION_KEY
+from movies.user_stats import user_stats_for
 from django.contrib.auth.models import User
 
 
+@conditional_get(versions_etag(MOVIES_VERSION_KEY, REVIEWS_VERSION_KEY, USERS_VERSION_KEY))
 def analytics_dashboard(request):
     """Analytics dashboard with basic stats"""
-    total_movies = Movie.objects.count()
-    total_reviews = Review.objects.count()
+    # Films, avis et moyenne en une requête sur les agrégats de Movie
+    stats = Movie.objects.aggregate(
+        total_movies=Count('id'), total_reviews=Sum('rating_count'), rating_sum=Sum('rating_sum')
+    )
+    total_reviews = stats['total_reviews'] or 0
     total_users = User.objects.count()
-    avg_rating = Review.objects.aggregate(Avg('rating'))['rating__avg'] or 0
-    
-    return JsonResponse({
-        'total_movies': total_movies,
+
+    return StreamingJSONResponse(request, {
+        'total_movies': stats['total_movies'],
         'total_reviews': total_reviews,
         'total_users': total_users,
-        'average_rating': round(avg_rating, 2),
+        'average_rating': round(stats['rating_sum'] / total_reviews, 2) if total_reviews else 0,
     })
 
 
+@conditional_get(movies_etag, movies_last_modified)
 def movie_popularity(request):
     """Get movie popularity statistics"""
-    popular_movies = Movie.objects.order_by('-popularity')[:10]
-    
-    return JsonResponse({
-        'popular_movies': [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'popularity': movie.popularity,
-                'vote_average': movie.vote_average,
-                'vote_count': movie.vote_count,
-            }
-            for movie in popular_movies
-        ]
+    popular_movies = Movie.objects.order_by('-popularity').values(
+        'id', 'title', 'popularity', 'vote_average', 'vote_count'
+    )[:10]
+
+    return StreamingJSONResponse(request, {
+        'popular_movies': popular_movies.iterator()
     })
 
 
+@conditional_get(versions_etag(MOVIES_VERSION_KEY, REVIEWS_VERSION_KEY))
 def ratings_analytics(request):
     """Get ratings analytics"""
-    # Rating distribution
-    rating_distribution = {}
-    for i in range(1, 6):
-        rating_distribution[str(i)] = Review.objects.filter(rating=i).count()
-    
-    # Top rated movies
-    top_rated = Movie.objects.annotate(
-        avg_rating=Avg('review__rating'),
-        review_count=Count('review')
-    ).filter(review_count__gte=5).order_by('-avg_rating')[:10]
-    
-    return JsonResponse({
+    # Rating distribution (somme des histogrammes des films)
+    distribution = Movie.objects.aggregate(**{str(i): Sum(f'rating_{i}_count') for i in range(1, 6)})
+    rating_distribution = {star: count or 0 for star, count in distribution.items()}
+
+    # Top rated movies (index rating_average, id)
+    top_rated = Movie.objects.filter(rating_count__gte=5).order_by('-rating_average', '-id').values(
+        'id', 'title', avg_rating=F('rating_average'), review_count=F('rating_count')
+    )[:10]
+
+    return StreamingJSONResponse(request, {
         'rating_distribution': rating_distribution,
-        'top_rated_movies': [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'avg_rating': round(movie.avg_rating, 2),
-                'review_count': movie.review_count,
-            }
-            for movie in top_rated if movie.avg_rating
-        ]
+        'top_rated_movies': (
+            {**movie, 'avg_rating': round(movie['avg_rating'], 2)}
+            for movie in top_rated.iterator()
+        )
     })
 
 
@@ -70,45 +64,37 @@ def ratings_analytics(request):
 def user_statistics(request):
     """Get user statistics"""
     user = request.user
-    user_reviews = Review.objects.filter(user=user)
-    user_interactions = MovieInteraction.objects.filter(user=user)
-    
-    # User's favorite genres
-    favorite_genres = {}
-    for review in user_reviews.filter(rating__gte=4):
-        for genre in review.movie.genres.all():
-            favorite_genres[genre.name] = favorite_genres.get(genre.name, 0) + 1
-    
-    return JsonResponse({
+    stats = user_stats_for(user)
+
+    return StreamingJSONResponse(request, {
         'user_id': user.id,
         'username': user.username,
-        'total_reviews': user_reviews.count(),
-        'avg_rating': user_reviews.aggregate(Avg('rating'))['rating__avg'] or 0,
-        'total_interactions': user_interactions.count(),
-        'favorite_genres': dict(sorted(favorite_genres.items(), key=lambda x: x[1], reverse=True)[:5])
+        'total_reviews': stats.review_count,
+        'avg_rating': stats.average_rating,
+        'total_interactions': stats.interaction_count,
+        'favorite_genres': dict(stats.favorite_genres(5)),
     })
 
 
+@conditional_get(versions_etag(MOVIES_VERSION_KEY, REVIEWS_VERSION_KEY))
 def genre_trends(request):
     """Get genre popularity trends"""
-    genre_stats = []
-    
-    for genre in Genre.objects.all():
-        movie_count = genre.movie_set.count()
-        avg_rating = Review.objects.filter(
-            movie__genres=genre
-        ).aggregate(Avg('rating'))['rating__avg'] or 0
-        
-        genre_stats.append({
-            'id': genre.id,
-            'name': genre.name,
-            'movie_count': movie_count,
-            'avg_rating': round(avg_rating, 2),
-        })
-    
     # Sort by movie count
-    genre_stats.sort(key=lambda x: x['movie_count'], reverse=True)
-    
-    return JsonResponse({
-        'genre_trends': genre_stats
+    # Moyenne pondérée par les agrégats des films : pas de jointure sur les avis
+    genre_stats = Genre.objects.annotate(
+        movie_count=Count('movie'),
+        rating_sum=Sum('movie__rating_sum'),
+        rating_count=Sum('movie__rating_count'),
+    ).order_by('-movie_count', 'name').values('id', 'name', 'movie_count', 'rating_sum', 'rating_count')
+
+    return StreamingJSONResponse(request, {
+        'genre_trends': (
+            {
+                'id': genre['id'],
+                'name': genre['name'],
+                'movie_count': genre['movie_count'],
+                'avg_rating': round(genre['rating_sum'] / genre['rating_count'], 2) if genre['rating_count'] else 0,
+            }
+            for genre in genre_stats.iterator()
+        )
     })
@@ -1,9 +1,13 @@
 """
 Neo4j connection and utilities for the Movie Recommendation System
 """
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase
 from django.conf import settings
+from django.core.cache import cache
+import asyncio
 import logging
+import time
+import weakref
 from dotenv import load_dotenv
 import os
 
@@ -12,6 +16,65 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Canonical node identity: users and movies are keyed on their Django primary key in `id`.
+# Every writer that may create a User or Movie node goes through this fragment.
+USER_MOVIE_IDENTITY_CYPHER = """
+MERGE (u:User {id: $user_id})
+ON CREATE SET u.username = $username, u.created_at = datetime()
+MERGE (m:Movie {id: $movie_id})
+ON CREATE SET m.title = $title, m.created_at = datetime()
+"""
+
+USER_PROFILE_CACHE_TIMEOUT = 3600
+
+# Recomputes the rating profile of the bound user `u`, stores it on the User node
+# and returns it. Appended by write_rating to every query that changes RATED edges
+# so the summary stays current.
+USER_PROFILE_SUMMARY_CYPHER = """
+OPTIONAL MATCH (u)-[pr:RATED]->(pm:Movie)
+WITH u, count(pr) as total_ratings, coalesce(avg(pr.rating), 0.0) as avg_rating,
+     reduce(acc = [], genre_list IN collect(pm.genres) | acc + coalesce(genre_list, [])) as all_genres
+UNWIND (CASE WHEN size(all_genres) = 0 THEN [null] ELSE all_genres END) as genre
+WITH u, total_ratings, avg_rating, size(all_genres) as total_genre_count, genre, count(genre) as genre_count
+ORDER BY genre_count DESC
+WITH u, total_ratings, avg_rating, total_genre_count,
+     collect(CASE WHEN genre IS NULL THEN null ELSE {genre: genre, count: genre_count} END) as genre_counts
+WITH u, total_ratings, avg_rating,
+     [gc IN genre_counts | gc.genre][0..3] as dominant_genres,
+     toFloat(coalesce(head([gc IN genre_counts WHERE gc.genre = 'Action' | gc.count]), 0))
+        / CASE WHEN total_genre_count > 0 THEN total_genre_count ELSE 1 END as action_preference
+SET u.profile_total_ratings = total_ratings,
+    u.profile_avg_rating = avg_rating,
+    u.profile_dominant_genres = dominant_genres,
+    u.profile_action_preference = action_preference,
+    u.profile_updated_at = datetime()
+RETURN {
+    total_ratings: total_ratings,
+    avg_rating: avg_rating,
+    action_preference: action_preference,
+    dominant_genres: dominant_genres
+} as profile
+"""
+
+
+def user_profile_cache_key(user_id):
+    """Local cache key of the user profile summary"""
+    return f"neo4j_user_profile_{user_id}"
+
+
+def cache_user_profile(user_id, result):
+    """
+    Store the profile returned by a profile summary query in the local cache;
+    drop the cached copy when the query returned nothing (Neo4j unavailable)
+    """
+    if result:
+        profile = dict(result[0]['profile'])
+        cache.set(user_profile_cache_key(user_id), profile, USER_PROFILE_CACHE_TIMEOUT)
+        return profile
+    cache.delete(user_profile_cache_key(user_id))
+    return None
+
+
 class Neo4jConnection:
     """Neo4j connection manager"""
     
@@ -187,6 +250,188 @@ class Neo4jConnection:
             self._connection_attempted = False
             return []
     
+    def write_user_movie_relationship(self, user, movie, relationship_query, parameters=None, refresh_profile=False):
+        """
+        Write a user/movie relationship, creating both nodes on their canonical identity.
+        `refresh_profile` routes rating writes through write_rating.
+        """
+        params = {
+            "user_id": user.id,
+            "username": user.username,
+            "movie_id": movie.id,
+            "title": movie.title,
+        }
+        params.update(parameters or {})
+        if refresh_profile:
+            return self.write_rating(user.id, USER_MOVIE_IDENTITY_CYPHER + relationship_query, params)
+        return self.run_query(USER_MOVIE_IDENTITY_CYPHER + relationship_query, params)
+    
+    def write_rating(self, user_id, query, parameters=None):
+        """
+        Run a query changing the RATED edges of the user bound to `u`, refresh the
+        profile summary stored on the User node in the same statement, then the
+        local cache copy. Every rating writer goes through here.
+        """
+        result = self.run_query(query + "\nWITH DISTINCT u" + USER_PROFILE_SUMMARY_CYPHER, parameters)
+        cache_user_profile(user_id, result)
+        return result
+    
+    def remove_user_rating(self, user_id, movie_id):
+        """Delete the user's rating of a movie (RATED, or LIKES carrying a rating)"""
+        query = """
+        MATCH (u:User {id: $user_id})
+        OPTIONAL MATCH (u)-[r:RATED]->(:Movie {id: $movie_id})
+        OPTIONAL MATCH (u)-[l:LIKES]->(:Movie {id: $movie_id})
+        WHERE l.rating IS NOT NULL
+        DELETE r, l
+        """
+        return self.write_rating(user_id, query, {"user_id": user_id, "movie_id": movie_id})
+    
+    def merge_nodes(self, groups):
+        """
+        Merge duplicate nodes into a kept node, keeping each relationship's type and direction.
+        groups: [{'keep': element_id, 'duplicates': [element_id, ...]}]
+        The relationship moves and the delete of the duplicates run in one write
+        transaction: on error nothing is committed and the exception is raised.
+        """
+        duplicate_ids = [dup_id for group in groups for dup_id in group['duplicates']]
+        if not duplicate_ids:
+            return 0
+        
+        if not self._connection_attempted:
+            self.connect()
+        if not self.is_connected:
+            logger.warning("⚠️ Neo4j not connected. Cannot merge nodes.")
+            return 0
+        
+        with self.driver.session() as session:
+            return session.execute_write(self._merge_nodes_tx, groups, duplicate_ids)
+    
+    @staticmethod
+    def _merge_nodes_tx(tx, groups, duplicate_ids):
+        """Transaction function of merge_nodes (re-run as a whole on transient errors)"""
+        types_query = """
+        UNWIND $duplicate_ids as dup_id
+        MATCH (dup) WHERE elementId(dup) = dup_id
+        MATCH (dup)-[r]-()
+        RETURN DISTINCT type(r) as rel_type, startNode(r) = dup as outgoing
+        """
+        rel_types = list(tx.run(types_query, duplicate_ids=duplicate_ids))
+        
+        for record in rel_types:
+            rel_type = record['rel_type']
+            if not rel_type.replace('_', '').isalnum():
+                # Type inattendu : abandon plutôt que de perdre ces relations au DETACH DELETE
+                raise ValueError(f"Unexpected relationship type: {rel_type}")
+            
+            if record['outgoing']:
+                pattern = f"(dup)-[r:`{rel_type}`]->(other)"
+                merge_pattern = f"(keep)-[moved:`{rel_type}`]->(other)"
+            else:
+                pattern = f"(other)-[r:`{rel_type}`]->(dup)"
+                merge_pattern = f"(other)-[moved:`{rel_type}`]->(keep)"
+            
+            query = f"""
+            UNWIND $groups as grp
+            MATCH (keep) WHERE elementId(keep) = grp.keep
+            MATCH (dup) WHERE elementId(dup) IN grp.duplicates
+            MATCH {pattern}
+            WHERE other <> keep
+            MERGE {merge_pattern}
+            ON CREATE SET moved = properties(r)
+            DELETE r
+            """
+            tx.run(query, groups=groups).consume()
+        
+        delete_query = """
+        UNWIND $duplicate_ids as dup_id
+        MATCH (dup) WHERE elementId(dup) = dup_id
+        DETACH DELETE dup
+        RETURN count(*) as deleted
+        """
+        record = tx.run(delete_query, duplicate_ids=duplicate_ids).single()
+        return record['deleted'] if record else 0
+    
+    def migrate_legacy_identity(self, label, batch_size=500):
+        """
+        Fold legacy nodes keyed on `django_id` into the canonical `id` nodes.
+        A legacy node is merged into the canonical node when one exists,
+        otherwise it is promoted by copying `django_id` into `id`.
+        """
+        if label not in ('User', 'Movie'):
+            raise ValueError(f"Unsupported label: {label}")
+        
+        find_query = f"""
+        MATCH (legacy:{label})
+        WHERE legacy.django_id IS NOT NULL
+        WITH legacy LIMIT $batch_size
+        OPTIONAL MATCH (canonical:{label} {{id: legacy.django_id}})
+        WHERE canonical <> legacy
+        WITH legacy, head(collect(elementId(canonical))) as canonical_id
+        RETURN elementId(legacy) as legacy_id, legacy.django_id as django_id, canonical_id
+        """
+        promote_query = """
+        UNWIND $node_ids as node_id
+        MATCH (n) WHERE elementId(n) = node_id
+        SET n.id = n.django_id
+        REMOVE n.django_id
+        """
+        
+        stats = {'promoted': 0, 'merged': 0}
+        seen = set()
+        while True:
+            rows = self.run_query(find_query, {"batch_size": batch_size})
+            if not rows:
+                break
+            
+            batch_ids = {row['legacy_id'] for row in rows}
+            if batch_ids <= seen:
+                logger.warning(f"Legacy {label} identity migration made no progress, stopping")
+                break
+            seen |= batch_ids
+            
+            keep = {}
+            duplicates = {}
+            promote = []
+            for row in rows:
+                django_id = row['django_id']
+                if row['canonical_id']:
+                    keep.setdefault(django_id, row['canonical_id'])
+                    duplicates.setdefault(django_id, []).append(row['legacy_id'])
+                elif django_id not in keep:
+                    keep[django_id] = row['legacy_id']
+                    promote.append(row['legacy_id'])
+                else:
+                    duplicates.setdefault(django_id, []).append(row['legacy_id'])
+            
+            if promote:
+                self.run_query(promote_query, {"node_ids": promote})
+                stats['promoted'] += len(promote)
+            
+            groups = [
+                {'keep': keep[django_id], 'duplicates': node_ids}
+                for django_id, node_ids in duplicates.items()
+            ]
+            stats['merged'] += self.merge_nodes(groups)
+        
+        return stats
+    
+    def find_duplicate_identities(self):
+        """Report duplicated `id` values and remaining legacy `django_id` nodes per label"""
+        query = """
+        MATCH (n)
+        WHERE (n:User OR n:Movie) AND (n.id IS NOT NULL OR n.django_id IS NOT NULL)
+        WITH CASE WHEN n:User THEN 'User' ELSE 'Movie' END as label,
+             coalesce(n.id, n.django_id) as node_id,
+             count(*) as copies,
+             sum(CASE WHEN n.django_id IS NOT NULL THEN 1 ELSE 0 END) as legacy
+        RETURN label,
+               sum(CASE WHEN copies > 1 THEN 1 ELSE 0 END) as duplicated_ids,
+               sum(legacy) as legacy_nodes
+        ORDER BY label
+        """
+        return self.run_query(query)
+    
     def create_user_node(self, user_id, username):
         """Create a user node in Neo4j"""
         query = """
@@ -217,6 +462,10 @@ class Neo4jConnection:
             , m.vote_count = $vote_count
             , m.popularity = $popularity
             , m.tmdb_id = $tmdb_id
+            , m.director = $director
+            , m.cast = $cast
+            , m.keywords = $keywords
+            , m.certification = $certification
             """
             params.update({
                 "overview": movie_data.get("overview", ""),
@@ -227,7 +476,11 @@ class Neo4jConnection:
                 "vote_average": movie_data.get("vote_average", 0.0),
                 "vote_count": movie_data.get("vote_count", 0),
                 "popularity": movie_data.get("popularity", 0.0),
-                "tmdb_id": movie_data.get("tmdb_id")
+                "tmdb_id": movie_data.get("tmdb_id"),
+                "director": movie_data.get("director", ""),
+                "cast": movie_data.get("cast", []),
+                "keywords": movie_data.get("keywords", []),
+                "certification": movie_data.get("certification", "")
             })
         
         if genres:
@@ -238,6 +491,36 @@ class Neo4jConnection:
         
         return self.run_query(query, params)
     
+    def create_movie_nodes(self, movies):
+        """
+        Batched create_movie_node: one UNWIND query for a list of dicts holding
+        id, title, genres and the create_movie_node movie_data keys
+        """
+        if not movies:
+            return []
+        query = """
+        UNWIND $movies AS movie
+        MERGE (m:Movie {id: movie.id})
+        ON CREATE SET m.created_at = datetime()
+        SET m.title = movie.title,
+            m.genres = movie.genres,
+            m.overview = movie.overview,
+            m.release_date = movie.release_date,
+            m.runtime = movie.runtime,
+            m.poster_path = movie.poster_path,
+            m.backdrop_path = movie.backdrop_path,
+            m.vote_average = movie.vote_average,
+            m.vote_count = movie.vote_count,
+            m.popularity = movie.popularity,
+            m.tmdb_id = movie.tmdb_id,
+            m.director = movie.director,
+            m.cast = movie.cast,
+            m.keywords = movie.keywords,
+            m.certification = movie.certification
+        RETURN count(m) AS synced
+        """
+        return self.run_query(query, {"movies": movies})
+    
     def create_user_rating_relationship(self, user_id, movie_id, rating, comment=None):
         """Create a RATED relationship between user and movie"""
         query = """
@@ -248,13 +531,12 @@ class Neo4jConnection:
         """
         if comment:
             query += ", r.comment = $comment"
-        query += " RETURN r"
         
         params = {"user_id": user_id, "movie_id": movie_id, "rating": rating}
         if comment:
             params["comment"] = comment
             
-        return self.run_query(query, params)
+        return self.write_rating(user_id, query, params)
     
     def create_user_watchlist_relationship(self, user_id, movie_id):
         """Create a WANTS_TO_WATCH relationship"""
@@ -310,3 +592,104 @@ def get_neo4j_connection():
     if _neo4j_conn is None:
         _neo4j_conn = Neo4jConnection()
     return _neo4j_conn
+
+
+# After a failed async connection, no connection (in any event loop) retries before this long
+ASYNC_RETRY_INTERVAL = 60
+_async_retry_after = 0.0
+
+
+class AsyncNeo4jConnection:
+    """
+    Neo4j connection on the async driver, used by the async views.
+    An async driver belongs to the event loop that created it: use
+    get_async_neo4j_connection() rather than sharing an instance.
+    """
+    
+    def __init__(self):
+        self.driver = None
+        self.is_connected = False
+        self._connection_attempted = False
+        self._connect_lock = asyncio.Lock()
+    
+    async def connect(self):
+        """
+        Open the driver and check connectivity. After a failure nothing is attempted
+        until ASYNC_RETRY_INTERVAL has passed, then the next call connects again.
+        """
+        global _async_retry_after
+        async with self._connect_lock:
+            if self.is_connected or time.monotonic() < _async_retry_after:
+                return
+            self._connection_attempted = True
+            
+            neo4j_uri = os.getenv("NEO4J_URI")
+            neo4j_username = os.getenv("NEO4J_USERNAME")
+            neo4j_password = os.getenv("NEO4J_PASSWORD")
+            if not all([neo4j_uri, neo4j_username, neo4j_password]):
+                logger.error("❌ Neo4j connection settings are not properly configured in .env file")
+                _async_retry_after = time.monotonic() + ASYNC_RETRY_INTERVAL
+                return
+            
+            if self.driver:
+                # Reconnexion après une erreur de requête
+                await self.driver.close()
+                self.driver = None
+            
+            try:
+                # Un seul driver par boucle : le pool est partagé par toutes les requêtes concurrentes
+                self.driver = AsyncGraphDatabase.driver(
+                    neo4j_uri,
+                    auth=(neo4j_username, neo4j_password),
+                    connection_timeout=30,
+                    max_connection_lifetime=300,
+                    max_connection_pool_size=50
+                )
+                await self.driver.verify_connectivity()
+                self.is_connected = True
+                logger.info("✅ Connected to Neo4j (async driver).")
+            except Exception as e:
+                logger.error(f"❌ Failed to connect to Neo4j (async driver): {e}")
+                _async_retry_after = time.monotonic() + ASYNC_RETRY_INTERVAL
+                if self.driver:
+                    await self.driver.close()
+                    self.driver = None
+    
+    async def close(self):
+        """Close the async driver"""
+        if self.driver:
+            await self.driver.close()
+    
+    async def run_query(self, query, parameters=None):
+        """Run a Cypher query without blocking the event loop; [] when Neo4j is unavailable"""
+        if not self.is_connected:
+            # Première requête, ou nouvel essai une fois le délai après un échec écoulé
+            await self.connect()
+        
+        if not self.is_connected:
+            logger.warning("⚠️ Neo4j not connected. Cannot run query.")
+            return []
+        
+        try:
+            async with self.driver.session() as session:
+                result = await session.run(query, parameters or {})
+                return [record async for record in result]
+        except Exception as e:
+            logger.error(f"Neo4j query error: {e}")
+            # Try to reconnect on error
+            self.is_connected = False
+            self._connection_attempted = False
+            return []
+
+
+# One async connection per event loop. Under ASGI there is a single loop per worker;
+# under WSGI each async view runs in its own loop and opens its own driver.
+_async_connections = weakref.WeakKeyDictionary()
+
+def get_async_neo4j_connection():
+    """Get or create the async Neo4j connection of the running event loop"""
+    loop = asyncio.get_running_loop()
+    connection = _async_connections.get(loop)
+    if connection is None:
+        connection = _async_connections[loop] = AsyncNeo4jConnection()
+    return connection
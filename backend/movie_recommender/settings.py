@@ -78,6 +78,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "movies.middleware.AuthStateCookieMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -356,8 +357,12 @@ TMDB_SETTINGS = {
     'base_url': TMDB_BASE_URL,
     'image_base_url': 'https://image.tmdb.org/t/p/w500',
     'rate_limit': 40,  # requests per 10 seconds
+    'max_workers': 8,  # concurrent TMDb requests per process
 }
 
+# Anonymous page cache (home, movie list, genre and detail pages), in seconds; 0 disables it
+PAGE_CACHE_TIMEOUT = 300
+
 # Custom User Model (if needed)
 # AUTH_USER_MODEL = 'accounts.User'
 
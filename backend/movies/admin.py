@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Movie, Genre, Review, UserPreference, Watchlist, MovieInteraction
+from .models import Movie, Genre, Review, UserPreference, UserCohort, SyncCheckpoint, Watchlist, MovieInteraction, UserStats
 
 
 @admin.register(Genre)
@@ -28,6 +28,10 @@ class MovieAdmin(admin.ModelAdmin):
         ('Relations', {
             'fields': ('genres',)
         }),
+        ('Credits & Keywords', {
+            'fields': ('director', 'cast', 'keywords', 'certification'),
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -46,10 +50,24 @@ class ReviewAdmin(admin.ModelAdmin):
 
 @admin.register(UserPreference)
 class UserPreferenceAdmin(admin.ModelAdmin):
-    list_display = ('user', 'created_at')
+    list_display = ('user', 'cohort_id', 'created_at')
     filter_horizontal = ('favorite_genres',)
 
 
+@admin.register(UserCohort)
+class UserCohortAdmin(admin.ModelAdmin):
+    list_display = ('cohort_id', 'size', 'updated_at')
+    readonly_fields = ('updated_at',)
+    ordering = ('cohort_id',)
+
+
+@admin.register(SyncCheckpoint)
+class SyncCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at')
+    readonly_fields = ('updated_at',)
+    ordering = ('name',)
+
+
 @admin.register(Watchlist)
 class WatchlistAdmin(admin.ModelAdmin):
     list_display = ('user', 'movie', 'added_at')
@@ -66,6 +84,14 @@ class MovieInteractionAdmin(admin.ModelAdmin):
     ordering = ('-timestamp',)
 
 
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'review_count', 'watchlist_count', 'interaction_count', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('updated_at',)
+    ordering = ('-updated_at',)
+
+
 # Customize admin site
 admin.site.site_header = "Movie Recommender Admin"
 admin.site.site_title = "Movie Recommender"
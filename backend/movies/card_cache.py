@@ -0,0 +1,115 @@
+"""
+Per-movie cache of rendered card HTML and serialised card JSON
+Entries are keyed by (movie id, updated_at), so saving a movie makes its old entries
+unreachable without explicit invalidation. A list page costs one get_many plus a join;
+misses are rendered and written back with one set_many.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .json_stream import RawJSON, dumps
+from .models import Movie
+from .movie_summary import MovieSummary
+
+logger = logging.getLogger(__name__)
+
+CARD_CACHE_TIMEOUT = getattr(settings, 'MOVIE_CARD_CACHE_TIMEOUT', 24 * 3600)
+CARD_TEMPLATE = 'movies/movie_card.html'
+# Per-request fields, spliced into the cached JSON rather than cached with it
+DYNAMIC_FIELDS = ('score',)
+# Cards carry a short synopsis, as api_popular_movies always did
+CARD_OVERVIEW_LENGTH = 200
+
+
+def card_key(kind, movie_id, updated_at):
+    return f'movie_card:{kind}:{movie_id}:{updated_at.timestamp()}'
+
+
+def _versions(movies):
+    """updated_at of every movie, read from the objects or with one query for Neo4j summaries"""
+    versions, missing = {}, []
+    for movie in movies:
+        movie_id = getattr(movie, 'pk', None)
+        updated_at = getattr(movie, 'updated_at', None)
+        if movie_id is None:
+            continue
+        if updated_at is not None:
+            versions[movie_id] = updated_at
+        else:
+            missing.append(movie_id)
+    if missing:
+        versions.update(Movie.objects.filter(id__in=missing).values_list('id', 'updated_at'))
+    return versions
+
+
+def _cached(kind, movies, build):
+    """Cached value of `kind` for each movie, in order, building and storing the misses"""
+    movies = list(movies)
+    versions = _versions(movies)
+    keys = [
+        card_key(kind, movie.pk, versions[movie.pk]) if versions.get(getattr(movie, 'pk', None)) else None
+        for movie in movies
+    ]
+    found = cache.get_many([key for key in keys if key])
+
+    values, misses = [], {}
+    for movie, key in zip(movies, keys):
+        value = found.get(key) if key else None
+        if value is None:
+            value = build(movie)
+            if key:
+                misses[key] = value
+        values.append(value)
+
+    if misses:
+        cache.set_many(misses, CARD_CACHE_TIMEOUT)
+    return values
+
+
+def render_card(movie):
+    return render_to_string(CARD_TEMPLATE, {'movie': movie})
+
+
+def card_json(movie):
+    """Serialised card fields (MovieSummary.to_dict without the per-request ones)"""
+    if isinstance(movie, Movie):
+        movie = MovieSummary.from_movie(movie)
+    data = movie.to_dict()
+    for field in DYNAMIC_FIELDS:
+        data.pop(field, None)
+    data['overview'] = (data['overview'] or '')[:CARD_OVERVIEW_LENGTH]
+    return dumps(data)
+
+
+def movie_cards(movies):
+    """Rendered card HTML for each movie"""
+    return [mark_safe(html) for html in _cached('html', movies, render_card)]
+
+
+def movie_cards_json(movies, **extra):
+    """
+    RawJSON card objects for each movie, for StreamingJSONResponse.
+    `extra` maps field names to a callable(movie) whose result is appended to the object.
+    """
+    movies = list(movies)
+    rows = _cached('json', movies, card_json)
+    if not extra:
+        return [RawJSON(row) for row in rows]
+
+    spliced = []
+    for movie, row in zip(movies, rows):
+        fields = dumps({name: value(movie) for name, value in extra.items()})
+        spliced.append(RawJSON(row[:-1] + b',' + fields[1:]))
+    return spliced
+
+
+def warm_cards(movies):
+    """Populate both caches for the given movies; returns how many were rendered"""
+    movies = list(movies)
+    _cached('html', movies, render_card)
+    _cached('json', movies, card_json)
+    return len(movies)
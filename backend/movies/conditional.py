@@ -0,0 +1,68 @@
+"""
+Conditional GET (ETag / Last-Modified) for the JSON endpoints
+Validators come from the page cache version counters and indexed MAX(updated_at)
+lookups, computed before the view runs: a matching If-None-Match or If-Modified-Since
+is answered 304 without any Neo4j query or body rendering.
+"""
+from functools import wraps
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from .models import Movie
+from .page_cache import MOVIES_VERSION_KEY, current_versions
+
+
+def weak_etag(*parts):
+    """
+    Weak ETag over the given parts; weak because the same content is served
+    identity, gzip or brotli encoded
+    """
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def versions_etag(*version_keys, per_path=False):
+    """ETag function for content that only changes when the given version counters are bumped"""
+    def etag_func(request, *args, **kwargs):
+        parts = current_versions(list(version_keys))
+        if per_path:
+            parts.append(request.get_full_path())
+        return weak_etag(*parts)
+    return etag_func
+
+
+def movies_last_modified(request, *args, **kwargs):
+    """Last change to any movie (index on updated_at: one lookup, no scan)"""
+    return Movie.objects.aggregate(last_modified=Max('updated_at'))['last_modified']
+
+
+movies_etag = versions_etag(MOVIES_VERSION_KEY)
+
+
+def conditional_get(etag_func=None, last_modified_func=None):
+    """
+    django.views.decorators.http.condition for sync and async views. For async views
+    the validators (cache and SQL reads) run in a thread before the view is entered.
+    """
+    def decorator(view_func):
+        if not iscoroutinefunction(view_func):
+            return condition(etag_func, last_modified_func)(view_func)
+
+        def validators(request, *args, **kwargs):
+            etag = etag_func(request, *args, **kwargs) if etag_func else None
+            last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+            return etag, last_modified
+
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+            view = condition(
+                etag_func=lambda *a, **kw: etag,
+                last_modified_func=lambda *a, **kw: last_modified,
+            )(view_func)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,160 @@
+"""
+Typo-tolerant title matching with a symmetric-delete (SymSpell-style) dictionary
+Every title word is indexed under the variants obtained by deleting up to MAX_DISTANCE
+characters from its first PREFIX_LENGTH characters; a query word is looked up through
+its own deletes, so candidates are found without scanning every title.
+Shorter prefixes get their own delete table so incomplete words can be corrected while typing
+"""
+from .title_index import TitleIndex, normalize_text
+import itertools
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Words shorter than this must match exactly
+MIN_FUZZY_LENGTH = 3
+# Shortest incomplete word corrected while typing
+MIN_PREFIX_LENGTH = 4
+
+
+def max_distance_for(word):
+    """Edit distance allowed for a query word: 0 for very short words, 1 up to 4 letters, then 2"""
+    if len(word) < MIN_FUZZY_LENGTH:
+        return 0
+    if len(word) <= 4:
+        return 1
+    return MAX_DISTANCE
+
+
+def deletes(word, distance):
+    """All strings obtained by deleting up to `distance` characters from word"""
+    variants = {word}
+    for count in range(1, min(distance, len(word)) + 1):
+        for positions in itertools.combinations(range(len(word)), count):
+            variants.add(''.join(char for index, char in enumerate(word) if index not in positions))
+    return variants
+
+
+def edit_distance(source, target, bound):
+    """Optimal string alignment distance, or bound + 1 as soon as it exceeds bound"""
+    if abs(len(source) - len(target)) > bound:
+        return bound + 1
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > bound:
+            return bound + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyTitleIndex(TitleIndex):
+    """Dictionnaire de suppressions symétriques sur les mots des titres"""
+
+    def _empty_state(self):
+        return {
+            'deletes': {},     # delete variant -> {word, ...}
+            'prefix_deletes': {},  # delete variant of a short word prefix -> {word, ...}
+            'postings': {},    # word -> {movie_id, ...}
+            'movies': {},      # movie_id -> (words, popularity)
+        }
+
+    def _index(self, state, movie):
+        words = tuple(set(normalize_text(movie['title']).split()))
+        state['movies'][movie['id']] = (words, movie['popularity'] or 0.0)
+        for word in words:
+            if word not in state['postings']:
+                for variant in deletes(word[:PREFIX_LENGTH], MAX_DISTANCE):
+                    self._mutable(state, 'deletes', variant, set).add(word)
+                for length in range(MIN_PREFIX_LENGTH, min(len(word), PREFIX_LENGTH)):
+                    for variant in deletes(word[:length], max_distance_for(word[:length])):
+                        self._mutable(state, 'prefix_deletes', variant, set).add(word)
+            self._mutable(state, 'postings', word, set).add(movie['id'])
+
+    def _unindex(self, state, movie_id):
+        entry = state['movies'].pop(movie_id, None)
+        if entry is None:
+            return
+        for word in entry[0]:
+            if movie_id in state['postings'].get(word, ()):
+                self._mutable(state, 'postings', word, set).discard(movie_id)
+            # Les mots sans film restent dans le dictionnaire jusqu'à la prochaine reconstruction
+
+    def lookup(self, word, prefix=False):
+        """{indexed word: distance} for words within the allowed edit distance of `word`"""
+        state = self._state
+        bound = max_distance_for(word)
+        if bound == 0:
+            return {word: 0} if word in state['postings'] else {}
+
+        tables = [state['deletes']]
+        if prefix and len(word) < PREFIX_LENGTH:
+            tables.append(state['prefix_deletes'])
+
+        matches = {}
+        for variant, table in itertools.product(deletes(word[:PREFIX_LENGTH], bound), tables):
+            for candidate in table.get(variant, ()):
+                if candidate in matches:
+                    continue
+                # En mode préfixe, le dernier mot tapé est comparé au début des mots indexés
+                target = candidate[:len(word)] if prefix else candidate
+                distance = edit_distance(word, target, bound)
+                if distance <= bound:
+                    matches[candidate] = distance
+        return matches
+
+    def search_ids(self, query, limit=20, prefix=False):
+        """
+        Movie ids ranked by total edit distance, then popularity.
+        With prefix=True the last query word may be incomplete (search-as-you-type).
+        """
+        self.ensure_fresh()
+        words = normalize_text(query).split()
+        if not words or (prefix and len(words[-1]) < MIN_PREFIX_LENGTH):
+            # Un début de mot trop court est déjà couvert par l'index préfixe
+            return []
+        state = self._state
+
+        distances = None   # movie_id -> summed distance over matched query words
+        for position, word in enumerate(words):
+            matches = self.lookup(word, prefix=prefix and position == len(words) - 1)
+            if not matches:
+                if max_distance_for(word) == 0:
+                    continue   # mot court inconnu (article...), ignoré
+                return []
+
+            word_distances = {}
+            for candidate, distance in matches.items():
+                for movie_id in state['postings'].get(candidate, ()):
+                    if distance < word_distances.get(movie_id, MAX_DISTANCE + 1):
+                        word_distances[movie_id] = distance
+
+            if distances is None:
+                distances = word_distances
+            else:
+                distances = {
+                    movie_id: distance + word_distances[movie_id]
+                    for movie_id, distance in distances.items()
+                    if movie_id in word_distances
+                }
+            if not distances:
+                return []
+
+        if not distances:
+            return []
+
+        def rank(movie_id):
+            entry = state['movies'].get(movie_id)
+            return (distances[movie_id], -(entry[1] if entry else 0.0))
+
+        return sorted(distances, key=rank)[:limit]
+
+
+# Instance par processus
+fuzzy_index = FuzzyTitleIndex()
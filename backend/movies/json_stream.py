@@ -0,0 +1,152 @@
+"""
+Streaming JSON responses for the list APIs
+Top-level values that are iterators (querysets read with .iterator(), generators) are
+written as JSON arrays row by row, so memory stays flat and the first bytes leave
+before the last row is read. Uses orjson when installed and compresses on the fly
+with brotli or gzip according to Accept-Encoding. Under ASGI the chunks are handed to
+the server through an async iterator, each one produced in the request's sync thread.
+"""
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # sérialiseur standard, plus lent
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Rows are grouped into chunks of about this size before being compressed and sent
+CHUNK_BYTES = 16 * 1024
+# Default chunk size for QuerySet.iterator() (prefetch_related runs once per chunk)
+ITERATOR_CHUNK_SIZE = 500
+
+
+class RawJSON(bytes):
+    """Already-encoded JSON, written as is (e.g. cached movie cards)"""
+
+
+def dumps(value):
+    """JSON-encode a value to bytes"""
+    if isinstance(value, RawJSON):
+        return value
+    if orjson is not None:
+        return orjson.dumps(
+            value,
+            default=DjangoJSONEncoder().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def _is_stream(value):
+    return hasattr(value, '__next__')
+
+
+def iter_json(payload):
+    """Yield the JSON encoding of `payload` in chunks of roughly CHUNK_BYTES"""
+    if not isinstance(payload, dict):
+        yield dumps(payload)
+        return
+
+    buffer = bytearray(b'{')
+    for index, (key, value) in enumerate(payload.items()):
+        if index:
+            buffer += b','
+        buffer += dumps(str(key)) + b':'
+        if not _is_stream(value):
+            buffer += dumps(value)
+            continue
+
+        buffer += b'['
+        for row_index, row in enumerate(value):
+            if row_index:
+                buffer += b','
+            buffer += dumps(row)
+            if len(buffer) >= CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b']'
+    buffer += b'}'
+    yield bytes(buffer)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Z_SYNC_FLUSH : chaque morceau part tout de suite au lieu d'attendre la fin
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _brotli(chunks):
+    compressor = brotli.Compressor(quality=4)
+    for chunk in chunks:
+        yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+_END = object()
+
+
+async def _aiter_chunks(chunks):
+    """
+    Async iterator over a sync chunk generator. Django buffers the whole body of a sync
+    streaming response under ASGI; here each chunk is pulled with sync_to_async
+    (thread-sensitive: the queryset cursor stays on the request's sync thread).
+    """
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+def _accepted_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    encodings = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """StreamingHttpResponse for a JSON payload, compressed when the client allows it"""
+
+    def __init__(self, request, payload, status=200):
+        chunks = iter_json(payload)
+        encodings = _accepted_encodings(request)
+        content_encoding = None
+        if brotli is not None and 'br' in encodings:
+            chunks, content_encoding = _brotli(chunks), 'br'
+        elif 'gzip' in encodings:
+            chunks, content_encoding = _gzip(chunks), 'gzip'
+
+        if isinstance(request, ASGIRequest):
+            super().__init__(_aiter_chunks(chunks), content_type='application/json', status=status)
+            # Générateur synchrone fermé (curseur libéré) même si le client se déconnecte
+            self._resource_closers.append(chunks.close)
+        else:
+            super().__init__(chunks, content_type='application/json', status=status)
+        if content_encoding:
+            self['Content-Encoding'] = content_encoding
+        patch_vary_headers(self, ('Accept-Encoding',))
+
+
+def queryset_rows(queryset, serialize, chunk_size=ITERATOR_CHUNK_SIZE):
+    """Serialised rows of a queryset, read in chunks (prefetches run per chunk)"""
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield serialize(obj)
@@ -0,0 +1,191 @@
+"""
+Keyset (cursor) pagination for movie listings
+A cursor holds the sort value and id of the first or last row shown; the next page is a
+range scan on (value, id) instead of an OFFSET, so deep pages cost the same as the first.
+The same cursors drive the SQL listings and the Cypher queries.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Q, F, Value
+from django.db.models.functions import Coalesce
+
+from .page_cache import MOVIES_VERSION_KEY, current_versions
+
+# Sort option -> (field, descending)
+SORT_FIELDS = {
+    '-popularity': ('popularity', True),
+    '-vote_average': ('vote_average', True),
+    '-rating_average': ('rating_average', True),
+    '-release_date': ('release_date', True),
+    'release_date': ('release_date', False),
+    'title': ('title', False),
+}
+# Valeurs envoyées par le formulaire de movie_list.html
+SORT_ALIASES = {
+    'popularity': '-popularity',
+    'rating': '-vote_average',
+    'user_rating': '-rating_average',
+}
+DEFAULT_SORT = '-popularity'
+# Stand-in for a missing release date, keeps (value, id) totally ordered
+MISSING_DATE = date(1, 1, 1)
+COUNT_CACHE_TIMEOUT = 300
+
+
+def resolve_sort(sort):
+    """Normalised sort option, DEFAULT_SORT for unknown values"""
+    sort = SORT_ALIASES.get(sort, sort)
+    return sort if sort in SORT_FIELDS else DEFAULT_SORT
+
+
+def encode_cursor(value, pk, backwards=False):
+    payload = json.dumps([value, pk, int(backwards)], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(value, id, backwards) or None for a missing or malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk, backwards = json.loads(payload)
+        return value, int(pk), bool(backwards)
+    except (TypeError, ValueError, binascii.Error):
+        return None
+
+
+class KeysetPage:
+    """One page of rows with the cursors of its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def page_from_rows(rows, per_page, position, value_of, id_of):
+    """
+    Build a KeysetPage from up to per_page + 1 rows fetched in cursor order
+    (reversed order when paging backwards)
+    """
+    backwards = bool(position and position[2])
+    has_more = len(rows) > per_page
+    rows = list(rows[:per_page])
+    if backwards:
+        rows.reverse()
+
+    # En reculant, il reste forcément une page suivante (celle d'où l'on vient)
+    has_next = position is not None if backwards else has_more
+    has_previous = has_more if backwards else position is not None
+
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(value_of(rows[-1]), id_of(rows[-1]))
+    if rows and has_previous:
+        previous_cursor = encode_cursor(value_of(rows[0]), id_of(rows[0]), backwards=True)
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def paginate_queryset(queryset, sort, cursor=None, per_page=20):
+    """Keyset page of a Movie queryset for one of SORT_FIELDS"""
+    field, descending = SORT_FIELDS[resolve_sort(sort)]
+    if field == 'release_date':
+        queryset = queryset.annotate(keyset_value=Coalesce(F('release_date'), Value(MISSING_DATE)))
+        field = 'keyset_value'
+    return paginate_on(queryset, field, descending, cursor, per_page)
+
+
+def paginate_on(queryset, field, descending, cursor=None, per_page=20):
+    """Keyset page of a queryset ordered on (field, id)"""
+    position = decode_cursor(cursor)
+    backwards = bool(position and position[2])
+    smaller = descending != backwards
+    if position:
+        lookup = 'lt' if smaller else 'gt'
+        value, pk = position[0], position[1]
+        try:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+            )
+        except (ValidationError, ValueError, TypeError):
+            # Curseur d'un autre tri ou altéré : on repart de la première page
+            position, smaller = None, descending
+
+    prefix = '-' if smaller else ''
+    rows = list(queryset.order_by(f'{prefix}{field}', f'{prefix}id')[:per_page + 1])
+    return page_from_rows(rows, per_page, position, lambda obj: getattr(obj, field), lambda obj: obj.pk)
+
+
+def cypher_keyset(value_expr, id_expr, descending, cursor=None):
+    """
+    (where, order_by, params, position) fragments for a Cypher query paged on
+    (value_expr, id_expr); the query must LIMIT to per_page + 1 rows
+    """
+    position = decode_cursor(cursor)
+    backwards = bool(position and position[2])
+    smaller = descending != backwards
+    operator = '<' if smaller else '>'
+    direction = 'DESC' if smaller else 'ASC'
+
+    where, params = 'true', {}
+    if position:
+        where = (
+            f"({value_expr} {operator} $cursor_value OR "
+            f"({value_expr} = $cursor_value AND {id_expr} {operator} $cursor_id))"
+        )
+        params = {'cursor_value': position[0], 'cursor_id': position[1]}
+    return where, f"{value_expr} {direction}, {id_expr} {direction}", params, position
+
+
+def cached_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """
+    Row count of a listing, cached until the movie catalogue changes.
+    Listings show it as an indication only; pagination never depends on it.
+    """
+    version, = current_versions([MOVIES_VERSION_KEY])
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    query_hash = hashlib.md5(sql.encode('utf-8')).hexdigest()
+    key = f'listing_count:{version}:{query_hash}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, timeout)
+    return count
+
+
+def cursor_querystring(query_dict, cursor):
+    """Current query string with `cursor` swapped in (None when there is no such page)"""
+    if cursor is None:
+        return None
+    params = query_dict.copy()
+    params.pop('page', None)
+    params['cursor'] = cursor
+    return params.urlencode()
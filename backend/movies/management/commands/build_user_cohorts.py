@@ -0,0 +1,42 @@
+"""
+Management command to cluster users into taste cohorts
+"""
+from django.core.management.base import BaseCommand
+from movies.user_cohorts import build_user_cohorts, CLUSTERING_AVAILABLE
+
+
+class Command(BaseCommand):
+    help = 'Cluster users by taste and precompute a shared candidate pool per cohort'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clusters',
+            type=int,
+            default=50,
+            help='Number of cohorts to build (capped by the number of users)',
+        )
+        parser.add_argument(
+            '--candidates',
+            type=int,
+            default=200,
+            help='Size of the candidate pool stored per cohort',
+        )
+        parser.add_argument(
+            '--random-state',
+            type=int,
+            default=0,
+            help='Seed of the k-means initialisation (same seed and ratings, same cohorts)',
+        )
+
+    def handle(self, *args, **options):
+        if not CLUSTERING_AVAILABLE:
+            self.stdout.write(self.style.ERROR('❌ numpy et scikit-learn sont requis pour le clustering'))
+            return
+
+        self.stdout.write('🧮 Clustering des utilisateurs...')
+        cohorts = build_user_cohorts(
+            n_clusters=options['clusters'],
+            candidates_per_cohort=options['candidates'],
+            random_state=options['random_state']
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ {cohorts} cohortes construites'))
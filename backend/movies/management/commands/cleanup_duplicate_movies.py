@@ -0,0 +1,44 @@
+"""
+Management command to merge duplicate movie nodes in Neo4j
+"""
+from django.core.management.base import BaseCommand, CommandError
+from movies.neo4j_movie_service import neo4j_movie_service
+
+
+class Command(BaseCommand):
+    help = 'Merge duplicate Movie nodes in Neo4j grouped by normalised title and release date'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report duplicate group counts',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Duplicate groups per write transaction (relationship moves and deletes commit together)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔍 Recherche des films en double dans Neo4j...')
+
+        try:
+            stats = neo4j_movie_service.cleanup_duplicate_movies(
+                dry_run=options['dry_run'],
+                batch_size=options['batch_size']
+            )
+        except Exception as e:
+            # Le lot en cours a été annulé ; les lots précédents sont déjà validés
+            raise CommandError(f'Fusion interrompue : {e}') from e
+
+        self.stdout.write(
+            f"📊 {stats['groups']} groupes, {stats['duplicates']} doublons trouvés"
+        )
+        if stats['dry_run']:
+            self.stdout.write(self.style.WARNING('Mode simulation : aucune modification effectuée'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ {stats['duplicates_removed']} doublons supprimés")
+            )
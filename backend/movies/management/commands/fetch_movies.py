@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from movies.models import Movie, Genre
-import requests
+from movies.tmdb_service import tmdb_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,66 +31,49 @@ class Command(BaseCommand):
     def fetch_genres(self, api_key):
         """Récupère et sauvegarde les genres depuis TMDb"""
         self.stdout.write('📂 Récupération des genres...')
-        url = 'https://api.themoviedb.org/3/genre/movie/list'
-        params = {
-            'api_key': api_key,
-            'language': 'fr-FR'
-        }
         
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            genres_added = 0
-            for genre_data in data.get('genres', []):
-                genre, created = Genre.objects.get_or_create(
-                    tmdb_id=genre_data['id'],
-                    defaults={'name': genre_data['name']}
-                )
-                if created:
-                    genres_added += 1
-                    self.stdout.write(f"  + Genre ajouté: {genre.name}")
-                    
-            self.stdout.write(f'✅ Genres traités: {genres_added} nouveaux, {len(data.get("genres", []))} total')
-                    
-        except requests.exceptions.RequestException as e:
-            self.stdout.write(self.style.ERROR(f'❌ Erreur lors de la récupération des genres: {e}'))
+        data = tmdb_service.get('genre/movie/list', {'language': 'fr-FR'})
+        if data is None:
+            self.stdout.write(self.style.ERROR('❌ Erreur lors de la récupération des genres'))
+            return
+        
+        genres_added = 0
+        for genre_data in data.get('genres', []):
+            genre, created = Genre.objects.get_or_create(
+                tmdb_id=genre_data['id'],
+                defaults={'name': genre_data['name']}
+            )
+            if created:
+                genres_added += 1
+                self.stdout.write(f"  + Genre ajouté: {genre.name}")
+                
+        self.stdout.write(f'✅ Genres traités: {genres_added} nouveaux, {len(data.get("genres", []))} total')
 
     def fetch_movies(self, api_key):
-        """Récupère les films populaires depuis TMDb API"""
+        """Récupère les films populaires depuis TMDb API (pages en parallèle)"""
         self.stdout.write('🎬 Récupération des films populaires...')
-        url = 'https://api.themoviedb.org/3/movie/popular'
         
         total_movies = 0
         new_movies = 0
         
         # Récupérer plusieurs pages pour avoir plus de films
-        for page in range(1, 4):  # Pages 1 à 3 (60 films)
-            params = {
-                'api_key': api_key,
-                'language': 'fr-FR',
-                'page': page
-            }
-            
-            try:
-                self.stdout.write(f'  📄 Traitement de la page {page}...')
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                page_new_movies = 0
-                for movie_data in data.get('results', []):
-                    if self.save_movie(movie_data):
-                        page_new_movies += 1
-                    total_movies += 1
-                
-                new_movies += page_new_movies
-                self.stdout.write(f'    ✅ Page {page}: {len(data.get("results", []))} films, {page_new_movies} nouveaux')
-                    
-            except requests.exceptions.RequestException as e:
-                self.stdout.write(self.style.ERROR(f'❌ Erreur page {page}: {e}'))
+        pages = range(1, 4)  # Pages 1 à 3 (60 films)
+        pages_data = tmdb_service.fetch_pages('movie/popular', pages, {'language': 'fr-FR'})
+        
+        for page, data in zip(pages, pages_data):
+            if data is None:
+                self.stdout.write(self.style.ERROR(f'❌ Erreur page {page}'))
                 continue
+            
+            self.stdout.write(f'  📄 Traitement de la page {page}...')
+            page_new_movies = 0
+            for movie_data in data.get('results', []):
+                if self.save_movie(movie_data):
+                    page_new_movies += 1
+                total_movies += 1
+            
+            new_movies += page_new_movies
+            self.stdout.write(f'    ✅ Page {page}: {len(data.get("results", []))} films, {page_new_movies} nouveaux')
         
         self.stdout.write(f'📊 Résumé: {total_movies} films traités, {new_movies} nouveaux films ajoutés')
 
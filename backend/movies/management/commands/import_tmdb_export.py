@@ -0,0 +1,134 @@
+"""
+Management command to seed the catalogue from a TMDb daily ID export
+(movie_ids_MM_DD_YYYY.json.gz: one JSON object per line)
+"""
+import gzip
+import io
+import json
+import os
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from movies.models import SyncCheckpoint
+from movies.tmdb_service import tmdb_service
+
+
+class Command(BaseCommand):
+    help = 'Stream a gzip JSONL TMDb ID export, fetch details concurrently and bulk upsert, resumably'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Path or URL of the .json.gz export file')
+        parser.add_argument(
+            '--min-popularity',
+            type=float,
+            default=0.0,
+            help='Skip movies below this popularity',
+        )
+        parser.add_argument(
+            '--include-adult',
+            action='store_true',
+            help='Also import movies flagged adult',
+        )
+        parser.add_argument(
+            '--min-id',
+            type=int,
+            default=None,
+            help='Lowest TMDb id handled by this process (inclusive)',
+        )
+        parser.add_argument(
+            '--max-id',
+            type=int,
+            default=None,
+            help='Highest TMDb id handled by this process (inclusive)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of movies fetched and committed per batch',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the stored checkpoint and start from the first line',
+        )
+
+    def open_export(self, source):
+        """Text stream over the decompressed export, read line by line"""
+        if source.startswith(('http://', 'https://')):
+            response = requests.get(source, stream=True, timeout=60)
+            response.raise_for_status()
+            raw = response.raw
+        else:
+            if not os.path.exists(source):
+                raise CommandError(f'Fichier introuvable: {source}')
+            raw = open(source, 'rb')
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding='utf-8')
+
+    def handle(self, *args, **options):
+        min_id, max_id = options['min_id'], options['max_id']
+        checkpoint_name = f"tmdb_export:{os.path.basename(options['source'])}:{min_id or ''}-{max_id or ''}"
+        checkpoint, _ = SyncCheckpoint.objects.get_or_create(name=checkpoint_name)
+        if options['restart']:
+            checkpoint.value = {}
+
+        resume_line = checkpoint.value.get('line', 0)
+        imported = checkpoint.value.get('imported', 0)
+        if resume_line:
+            self.stdout.write(f'↪️  Reprise après la ligne {resume_line} ({imported} films déjà importés)')
+
+        def accept(entry):
+            movie_id = entry.get('id')
+            if movie_id is None:
+                return False
+            if min_id is not None and movie_id < min_id:
+                return False
+            if max_id is not None and movie_id > max_id:
+                return False
+            if entry.get('adult') and not options['include_adult']:
+                return False
+            return (entry.get('popularity') or 0.0) >= options['min_popularity']
+
+        def commit(batch, line_number):
+            nonlocal imported
+            # Échecs des lots précédents retentés avec ce lot ; seuls les 404 sont abandonnés
+            ids = list(dict.fromkeys(checkpoint.value.get('retry', []) + batch))
+            details, failed, missing = tmdb_service.fetch_movie_details(ids)
+            if ids and not details and not missing:
+                raise CommandError(
+                    f'TMDb indisponible : aucun détail récupéré, reprise après la ligne {checkpoint.value.get("line", 0)}'
+                )
+            # Upsert et point de reprise dans la même transaction (synchro Neo4j/Mongo après le COMMIT)
+            with transaction.atomic():
+                imported += len(tmdb_service.save_movies_bulk(details.values()))
+                checkpoint.value = {'line': line_number, 'imported': imported, 'retry': failed}
+                checkpoint.save(update_fields=['value', 'updated_at'])
+            self.stdout.write(
+                f'  ✅ ligne {line_number}: {len(details)}/{len(ids)} films récupérés, '
+                f'{len(failed)} à retenter, {len(missing)} introuvables, {imported} au total'
+            )
+
+        batch, line_number = [], 0
+        with self.open_export(options['source']) as export:
+            for line_number, line in enumerate(export, start=1):
+                if line_number <= resume_line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if accept(entry):
+                    batch.append(entry['id'])
+                if len(batch) >= options['batch_size']:
+                    commit(batch, line_number)
+                    batch = []
+
+        if batch or line_number > resume_line or checkpoint.value.get('retry'):
+            commit(batch, max(line_number, resume_line))
+
+        pending = checkpoint.value.get('retry', [])
+        if pending:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  {len(pending)} films en échec, gardés dans le point de reprise : relancez la commande'
+            ))
+        self.stdout.write(self.style.SUCCESS(f'🎉 Import terminé: {imported} films'))
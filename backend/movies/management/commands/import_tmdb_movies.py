@@ -1,20 +1,18 @@
 from django.core.management.base import BaseCommand
 from movies.models import Movie
-import requests
+from movies.tmdb_service import tmdb_service
 
 class Command(BaseCommand):
     help = "Importe les films populaires depuis TMDb (plusieurs pages) et les ajoute à la base Movie."
 
     def handle(self, *args, **options):
-        API_KEY = "aa6299adee2926856b3fde9e3eae2aee"  # Remplace par ta clé si besoin
         total_count = 0
-        for page in range(1, 11):  # Récupère les 10 premières pages (200 films)
-            url = f"https://api.themoviedb.org/3/movie/popular?api_key={API_KEY}&language=fr-FR&page={page}"
-            response = requests.get(url)
-            if response.status_code != 200:
-                self.stdout.write(self.style.ERROR(f"Erreur TMDb page {page}: {response.status_code}"))
+        pages = range(1, 11)  # Récupère les 10 premières pages (200 films)
+        pages_data = tmdb_service.fetch_pages('movie/popular', pages, {'language': 'fr-FR'})
+        for page, data in zip(pages, pages_data):
+            if data is None:
+                self.stdout.write(self.style.ERROR(f"Erreur TMDb page {page}"))
                 break
-            data = response.json()
             count = 0
             for movie_data in data.get("results", []):
                 tmdb_id = movie_data.get("id")
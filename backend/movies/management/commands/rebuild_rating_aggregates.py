@@ -0,0 +1,29 @@
+"""
+Management command to recompute the review aggregates stored on Movie
+"""
+from django.core.management.base import BaseCommand
+from movies.rating_aggregates import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Rebuild rating count, sum, average and per-star counts of movies from their reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--movie',
+            type=int,
+            action='append',
+            dest='movie_ids',
+            help='Movie id to rebuild (repeatable, defaults to every movie)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Movies checked per grouped review query',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('⭐ Recalcul des agrégats de notes...')
+        fixed = rebuild_rating_aggregates(options['movie_ids'], batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'✅ {fixed} films corrigés'))
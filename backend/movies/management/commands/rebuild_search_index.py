@@ -0,0 +1,20 @@
+"""
+Management command to (re)build the full-text movie search index
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from movies.search_index import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Create and rebuild the full-text search index on movie titles and overviews'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'🔄 Reconstruction de l\'index de recherche ({connection.vendor})...')
+
+        if rebuild_search_index():
+            self.stdout.write(self.style.SUCCESS('✅ Index de recherche reconstruit'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                'Index plein texte indisponible pour cette base : la recherche utilise icontains'
+            ))
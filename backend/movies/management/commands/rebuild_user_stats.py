@@ -0,0 +1,43 @@
+"""
+Management command to recompute the materialised per-user statistics
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from movies.user_stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UserStats rows (review counts, ratings, watchlist, interactions, liked genres)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='User id to rebuild (repeatable, defaults to every user)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Users rebuilt per set of grouped queries',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        users = User.objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        self.stdout.write('📊 Recalcul des statistiques utilisateurs...')
+        rebuilt, batch = 0, []
+        for user_id in users.values_list('pk', flat=True).iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                rebuilt += len(rebuild_user_stats(batch))
+                batch = []
+        if batch:
+            rebuilt += len(rebuild_user_stats(batch))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {rebuilt} utilisateurs recalculés'))
@@ -0,0 +1,109 @@
+"""
+Management command to refresh only the movies changed on TMDb since the last run
+"""
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from movies.models import Movie, SyncCheckpoint
+from movies.tmdb_service import tmdb_service
+
+CHECKPOINT_NAME = 'tmdb_changes'
+# /movie/changes accepts at most 14 days per request
+MAX_WINDOW_DAYS = 14
+
+
+class Command(BaseCommand):
+    help = 'Refetch the local movies listed by TMDb /movie/changes since the stored watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Start date (YYYY-MM-DD), overrides the stored watermark',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of movies fetched and upserted per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many local movies changed',
+        )
+
+    def save_checkpoint(self, checkpoint, **changes):
+        checkpoint.value = {**checkpoint.value, **changes}
+        checkpoint.save(update_fields=['value', 'updated_at'])
+
+    def refresh(self, checkpoint, tmdb_ids, batch_size, watermark=None):
+        """
+        Refetch and upsert `tmdb_ids`. Fetches happen outside any transaction; each
+        batch's upsert and checkpoint (ids to retry, watermark after the last batch)
+        commit together, and the Neo4j/Mongo sync runs after the commit.
+        """
+        updated = 0
+        batches = [tmdb_ids[offset:offset + batch_size] for offset in range(0, len(tmdb_ids), batch_size)] or [[]]
+        for index, batch in enumerate(batches):
+            details, failed, missing = tmdb_service.fetch_movie_details(batch, refresh=True)
+            if missing:
+                self.stdout.write(self.style.WARNING(f'  ⚠️  {len(missing)} films introuvables sur TMDb (404), ignorés'))
+
+            done = set(batch)
+            retry = [tmdb_id for tmdb_id in checkpoint.value.get('retry', []) if tmdb_id not in done]
+            changes = {'retry': list(dict.fromkeys(retry + failed))}
+            if watermark is not None and index == len(batches) - 1:
+                changes['watermark'] = watermark
+
+            with transaction.atomic():
+                updated += len(tmdb_service.save_movies_bulk(details.values()))
+                self.save_checkpoint(checkpoint, **changes)
+        return updated
+
+    def handle(self, *args, **options):
+        checkpoint, _ = SyncCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+        today = date.today()
+        batch_size = max(options['batch_size'], 1)
+
+        if options['since']:
+            start = options['since']
+        elif checkpoint.value.get('watermark'):
+            start = date.fromisoformat(checkpoint.value['watermark'])
+        else:
+            start = today - timedelta(days=1)
+
+        self.stdout.write(f'🔄 Synchronisation des changements TMDb depuis le {start}...')
+        total_changed = total_updated = 0
+
+        # Films en échec lors des passages précédents : retentés avant la suite
+        retry = checkpoint.value.get('retry', [])
+        if retry and not options['dry_run']:
+            self.stdout.write(f'  🔁 {len(retry)} films en échec au passage précédent')
+            total_updated += self.refresh(checkpoint, retry, batch_size)
+
+        while start < today:
+            end = min(start + timedelta(days=MAX_WINDOW_DAYS), today)
+
+            changed_ids = tmdb_service.get_changed_movie_ids(start, end)
+            if changed_ids is None:
+                raise CommandError(f'Impossible de lire /movie/changes pour {start} → {end}, watermark inchangé ({start})')
+
+            # Seuls les films déjà au catalogue sont rafraîchis
+            local_ids = list(Movie.objects.filter(tmdb_id__in=changed_ids).values_list('tmdb_id', flat=True))
+            total_changed += len(local_ids)
+            self.stdout.write(f'  📅 {start} → {end}: {len(changed_ids)} changements TMDb, {len(local_ids)} au catalogue')
+
+            if not options['dry_run']:
+                # Les échecs sont gardés dans le point de reprise : le watermark peut avancer
+                total_updated += self.refresh(checkpoint, local_ids, batch_size, watermark=end.isoformat())
+
+            start = end
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Mode simulation : {total_changed} films à rafraîchir'))
+        else:
+            pending = len(checkpoint.value.get('retry', []))
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {total_updated} films mis à jour, watermark: {start}, {pending} à retenter'
+            ))
@@ -0,0 +1,43 @@
+"""
+Management command to merge legacy django_id nodes into the canonical id nodes in Neo4j
+"""
+from django.core.management.base import BaseCommand
+from movie_recommender.neo4j_connection import get_neo4j_connection
+
+
+class Command(BaseCommand):
+    help = 'Merge legacy User/Movie nodes keyed on django_id into the nodes keyed on id'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of legacy nodes processed per batch',
+        )
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Only report remaining duplicate and legacy nodes',
+        )
+
+    def handle(self, *args, **options):
+        neo4j_conn = get_neo4j_connection()
+
+        if not options['verify_only']:
+            for label in ('User', 'Movie'):
+                self.stdout.write(f'🔄 Migration des nœuds {label}...')
+                stats = neo4j_conn.migrate_legacy_identity(label, batch_size=options['batch_size'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {label}: {stats['promoted']} promus, {stats['merged']} fusionnés"
+                ))
+
+        self.stdout.write('🔍 Vérification des identités...')
+        for record in neo4j_conn.find_duplicate_identities():
+            style = self.style.SUCCESS
+            if record['duplicated_ids'] or record['legacy_nodes']:
+                style = self.style.WARNING
+            self.stdout.write(style(
+                f"{record['label']}: {record['duplicated_ids']} ids en double, "
+                f"{record['legacy_nodes']} nœuds django_id restants"
+            ))
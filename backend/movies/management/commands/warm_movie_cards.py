@@ -0,0 +1,45 @@
+"""
+Management command to pre-render the cached movie cards (HTML and JSON)
+"""
+from django.core.management.base import BaseCommand
+from movies.models import Movie
+from movies.card_cache import warm_cards
+
+
+class Command(BaseCommand):
+    help = 'Render and cache the cards of the most popular movies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=1000,
+            help='Number of movies to warm, by popularity (0 for the whole catalogue)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Movies rendered per cache round-trip',
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        batch_size = max(options['batch_size'], 1)
+
+        movies = Movie.objects.order_by('-popularity', 'id').prefetch_related('genres')
+        if limit:
+            movies = movies[:limit]
+
+        self.stdout.write('🃏 Pré-rendu des cartes de films...')
+        warmed, batch = 0, []
+        for movie in movies.iterator(chunk_size=batch_size):
+            batch.append(movie)
+            if len(batch) >= batch_size:
+                warmed += warm_cards(batch)
+                batch = []
+                self.stdout.write(f'  {warmed} cartes en cache')
+        if batch:
+            warmed += warm_cards(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {warmed} cartes en cache'))
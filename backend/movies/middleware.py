@@ -0,0 +1,24 @@
+from .page_cache import AUTH_STATE_COOKIE
+
+
+class AuthStateCookieMiddleware:
+    """
+    Keep a non-sensitive "logged in" hint cookie in step with the session.
+    Cached pages are anonymous; base.html uses the hint to show the logged-in navbar
+    straight away and to decide whether api_page_state is worth calling.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        authenticated = bool(user and user.is_authenticated)
+        has_cookie = request.COOKIES.get(AUTH_STATE_COOKIE) == '1'
+        if authenticated and not has_cookie:
+            response.set_cookie(AUTH_STATE_COOKIE, '1', samesite='Lax')
+        elif not authenticated and AUTH_STATE_COOKIE in request.COOKIES:
+            response.delete_cookie(AUTH_STATE_COOKIE, samesite='Lax')
+        return response
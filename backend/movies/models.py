@@ -2,12 +2,36 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import datetime
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
+from contextlib import contextmanager
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Thread-local switch used by bulk imports to skip the per-movie sync signal
+_movie_sync = threading.local()
+
+
+@contextmanager
+def suppress_movie_sync():
+    """Disable movie_post_save in this thread; the caller syncs the batch itself"""
+    previous = getattr(_movie_sync, 'suppressed', False)
+    _movie_sync.suppressed = True
+    try:
+        yield
+    finally:
+        _movie_sync.suppressed = previous
+
+
+# Colonnes de Movie tenues à jour par rating_aggregates.apply_rating_change
+RATING_AGGREGATE_FIELDS = (
+    'rating_count', 'rating_sum', 'rating_average',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+)
+
 
 class Genre(models.Model):
     """Model pour gérer les genres de films"""
@@ -37,12 +61,28 @@ class Movie(models.Model):
     vote_count = models.IntegerField(default=0)
     popularity = models.FloatField(default=0.0)
     
+    # Agrégats des avis, maintenus par les signaux de Review (voir rating_aggregates.py)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_average = models.FloatField(default=0.0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    
     # Relations
     genres = models.ManyToManyField(Genre, blank=True)
     
+    # Enrichissement TMDb (credits, keywords, release_dates)
+    director = models.CharField(max_length=255, blank=True)
+    cast = models.JSONField(default=list, blank=True)  # noms des acteurs principaux
+    keywords = models.JSONField(default=list, blank=True)
+    certification = models.CharField(max_length=20, blank=True)
+    
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.title
@@ -65,10 +105,22 @@ class Movie(models.Model):
     
     @property
     def average_rating(self):
-        reviews = self.review_set.all()
-        if reviews.exists():
-            return sum([review.rating for review in reviews]) / len(reviews)
-        return 0
+        return self.rating_average
+    
+    @property
+    def rating_histogram(self):
+        """Number of reviews per star, {1: n1, ..., 5: n5}"""
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+    
+    def save(self, *args, **kwargs):
+        # Les agrégats des avis ne sont écrits que par des UPDATE atomiques :
+        # une instance chargée avant un nouvel avis ne doit pas les écraser
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
     
     def to_dict(self):
         """Convert movie to dictionary for MongoDB storage"""
@@ -86,12 +138,24 @@ class Movie(models.Model):
             'vote_count': self.vote_count,
             'popularity': self.popularity,
             'genres': [genre.name for genre in self.genres.all()],
+            'director': self.director,
+            'cast': self.cast,
+            'keywords': self.keywords,
+            'certification': self.certification,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
     
     class Meta:
         ordering = ['-created_at']
+        # Index (tri, id) des listes paginées par curseur (voir keyset.py)
+        indexes = [
+            models.Index(fields=['popularity', 'id'], name='movie_popularity_keyset'),
+            models.Index(fields=['vote_average', 'id'], name='movie_vote_average_keyset'),
+            models.Index(fields=['release_date', 'id'], name='movie_release_date_keyset'),
+            models.Index(fields=['title', 'id'], name='movie_title_keyset'),
+            models.Index(fields=['rating_average', 'id'], name='movie_rating_average_keyset'),
+        ]
 
 
 class Review(models.Model):
@@ -111,12 +175,20 @@ class Review(models.Model):
     
     def __str__(self):
         return f'{self.user.username} - {self.movie.title} ({self.rating}/5)'
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Film et note en base, pour corriger les agrégats si la note change
+        instance._stored_rating = (instance.__dict__.get('movie_id'), instance.__dict__.get('rating'))
+        return instance
 
 
 class UserPreference(models.Model):
     """Model pour stocker les préférences des utilisateurs"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     favorite_genres = models.ManyToManyField(Genre, blank=True)
+    cohort_id = models.IntegerField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -124,6 +196,34 @@ class UserPreference(models.Model):
         return f'Preferences for {self.user.username}'
 
 
+class UserCohort(models.Model):
+    """Model pour les cohortes d'utilisateurs aux goûts similaires (calculées hors ligne)"""
+    cohort_id = models.IntegerField(unique=True)
+    size = models.IntegerField(default=0)
+    genre_affinity = models.JSONField(default=dict, blank=True)
+    candidate_movie_ids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['cohort_id']
+    
+    def __str__(self):
+        return f'Cohort {self.cohort_id} ({self.size} users)'
+
+
+class SyncCheckpoint(models.Model):
+    """Model pour les points de reprise des imports et synchronisations TMDb"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
 class Watchlist(models.Model):
     """Model pour la liste de films à regarder"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -159,9 +259,105 @@ class MovieInteraction(models.Model):
         return f'{self.user.username} {self.interaction_type} {self.movie.title}'
 
 
+class UserStats(models.Model):
+    """Statistiques agrégées d'un utilisateur, une ligne par utilisateur (voir user_stats.py)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    watchlist_count = models.IntegerField(default=0)
+    interaction_count = models.IntegerField(default=0)
+    # Nom du genre -> nombre d'avis à 4 étoiles ou plus sur des films de ce genre
+    genre_counts = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'user stats'
+    
+    def __str__(self):
+        return f'Stats for user {self.user_id}'
+    
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0
+    
+    @property
+    def rating_histogram(self):
+        """Number of reviews per star, {1: n1, ..., 5: n5}"""
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+    
+    def favorite_genres(self, limit=5):
+        """(genre name, count) of the most liked genres, most liked first"""
+        ranked = sorted(self.genre_counts.items(), key=lambda item: (-item[1], item[0]))
+        return [(name, count) for name, count in ranked if count > 0][:limit]
+
+
+def neo4j_movie_data(movie):
+    """Properties written on the Neo4j Movie node"""
+    return {
+        "overview": movie.overview,
+        "release_date": movie.release_date.isoformat() if movie.release_date else "",
+        "runtime": movie.runtime or 0,
+        "poster_path": movie.poster_path,
+        "backdrop_path": movie.backdrop_path,
+        "vote_average": movie.vote_average,
+        "vote_count": movie.vote_count,
+        "popularity": movie.popularity,
+        "tmdb_id": movie.tmdb_id,
+        "director": movie.director,
+        "cast": movie.cast,
+        "keywords": movie.keywords,
+        "certification": movie.certification,
+    }
+
+
+def sync_movies(movie_ids, batch_size=500):
+    """Batched equivalent of movie_post_save for bulk imports (one round trip per batch and store)"""
+    from movie_recommender.neo4j_connection import get_neo4j_connection
+
+    movie_ids = list(movie_ids)
+    neo4j_conn = get_neo4j_connection()
+
+    for start in range(0, len(movie_ids), batch_size):
+        movies = list(Movie.objects.filter(id__in=movie_ids[start:start + batch_size]).prefetch_related('genres'))
+
+        try:
+            from pymongo import ReplaceOne
+            from movie_recommender.db_connections import get_mongodb
+            get_mongodb().movies.bulk_write(
+                [ReplaceOne({'_id': movie.id}, movie.to_dict(), upsert=True) for movie in movies],
+                ordered=False
+            )
+        except Exception as mongo_e:
+            logger.debug(f"MongoDB sync skipped: {mongo_e}")
+
+        try:
+            if neo4j_conn.is_connected:
+                neo4j_conn.create_movie_nodes([
+                    {
+                        'id': movie.id,
+                        'title': movie.title,
+                        'genres': [genre.name for genre in movie.genres.all()],
+                        **neo4j_movie_data(movie),
+                    }
+                    for movie in movies
+                ])
+        except Exception as e:
+            logger.error(f"Error syncing movies to Neo4j: {e}")
+
+    from .page_cache import bump_movies_version
+    bump_movies_version()
+
+
 @receiver(post_save, sender=Movie)
 def movie_post_save(sender, instance, **kwargs):
     """Sync movie to Neo4j when saved"""
+    if getattr(_movie_sync, 'suppressed', False):
+        return
     try:
         from movie_recommender.neo4j_connection import get_neo4j_connection
 
@@ -176,26 +372,103 @@ def movie_post_save(sender, instance, **kwargs):
         # Sync to Neo4j with complete movie data
         neo4j_conn = get_neo4j_connection()
         if neo4j_conn.is_connected:
-            movie_data = {
-                "overview": instance.overview,
-                "release_date": instance.release_date.isoformat() if instance.release_date else "",
-                "runtime": instance.runtime or 0,
-                "poster_path": instance.poster_path,
-                "backdrop_path": instance.backdrop_path,
-                "vote_average": instance.vote_average,
-                "vote_count": instance.vote_count,
-                "popularity": instance.popularity,
-                "tmdb_id": instance.tmdb_id
-            }
             neo4j_conn.create_movie_node(
                 instance.id, 
                 instance.title, 
                 [genre.name for genre in instance.genres.all()],
-                movie_data
+                neo4j_movie_data(instance)
             )
     except Exception as e:
         logger.error(f"Error syncing movie to Neo4j: {e}")
 
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(m2m_changed, sender=Movie.genres.through)
+def invalidate_movie_pages(sender, **kwargs):
+    """Movies or genres changed: cached anonymous pages are stale"""
+    if getattr(_movie_sync, 'suppressed', False):
+        return   # sync_movies invalide une fois pour tout le lot
+    from .page_cache import bump_movies_version
+    bump_movies_version()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_movie_detail_pages(sender, instance, **kwargs):
+    """Reviews are shown on the cached detail page of their movie and in the rating analytics"""
+    from .page_cache import bump_movie_version, bump_reviews_version
+    bump_movie_version(instance.movie_id)
+    bump_reviews_version()
+
+
+@receiver(post_save, sender=Review)
+def update_review_aggregates(sender, instance, created, **kwargs):
+    """
+    Count the new rating on the movie and on the user stats, or move it
+    on update_or_create / edit
+    """
+    from .rating_aggregates import apply_rating_change
+    from .user_stats import apply_review_change
+    movie_id, rating = (None, None) if created else getattr(instance, '_stored_rating', (None, None))
+    if movie_id is not None and movie_id != instance.movie_id:
+        apply_rating_change(movie_id, removed=rating)
+        apply_rating_change(instance.movie_id, added=instance.rating)
+    elif created or movie_id is not None:
+        apply_rating_change(instance.movie_id, removed=rating, added=instance.rating)
+    if created or movie_id is not None:
+        apply_review_change(
+            instance.user_id,
+            removed=(movie_id, rating) if movie_id is not None else None,
+            added=(instance.movie_id, instance.rating),
+        )
+    instance._stored_rating = (instance.movie_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_aggregates(sender, instance, **kwargs):
+    """Take the deleted review out of its movie aggregates and its user stats"""
+    from .rating_aggregates import apply_rating_change
+    from .user_stats import apply_review_change
+    movie_id, rating = getattr(instance, '_stored_rating', (instance.movie_id, instance.rating))
+    if movie_id is not None and rating is not None:
+        apply_rating_change(movie_id, removed=rating)
+        apply_review_change(instance.user_id, removed=(movie_id, rating))
+
+
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+@receiver(post_save, sender=MovieInteraction)
+@receiver(post_delete, sender=MovieInteraction)
+def update_user_counts(sender, instance, created=False, **kwargs):
+    """Watchlist and interaction counters of the user stats"""
+    if kwargs['signal'] is post_save and not created:
+        return
+    from .user_stats import apply_count_change
+    field = 'watchlist_count' if sender is Watchlist else 'interaction_count'
+    apply_count_change(instance.user_id, field, 1 if created else -1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+def invalidate_user_recommendations(sender, instance, **kwargs):
+    """Ratings and watchlist feed the user's ranked recommendation list"""
+    from .page_cache import bump_user_version
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_counts(sender, instance, created=True, **kwargs):
+    """Users counted by the analytics endpoints (not bumped on every login)"""
+    if created:
+        from .page_cache import bump_users_version
+        bump_users_version()
+
+
 @receiver(post_save, sender=Review)
 def review_post_save(sender, instance, **kwargs):
     """Sync review to MongoDB when saved"""
@@ -217,3 +490,20 @@ def user_post_save(sender, instance, **kwargs):
         logger.debug("MongoDB sync not available")
     except Exception as e:
         logger.error(f"Error syncing user to MongoDB: {e}")
+
+@receiver(user_logged_in)
+def user_logged_in_sync(sender, request, user, **kwargs):
+    """Sync user to Neo4j once per login rather than on every page view"""
+    try:
+        from .neo4j_movie_service import neo4j_movie_service
+        neo4j_movie_service.create_or_update_user({
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'date_joined': user.date_joined.isoformat(),
+            'is_active': user.is_active
+        })
+    except Exception as e:
+        logger.error(f"Error syncing user to Neo4j: {e}")
@@ -0,0 +1,184 @@
+"""
+Compact movie representation shared by list pages and JSON APIs
+Built straight from Neo4j records, plain dicts, Movie instances or TMDb payloads
+"""
+from datetime import datetime
+
+POSTER_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+# Result column -> MovieSummary attribute. Several Cypher queries alias the same value differently.
+FIELD_ALIASES = {
+    'movie_id': 'movie_id',
+    'id': 'movie_id',
+    'title': 'title',
+    'genres': 'genres',
+    'rating': 'rating',
+    'vote_average': 'rating',
+    'release_date': 'release_date',
+    'overview': 'overview',
+    'poster_path': 'poster_path',
+    'backdrop_path': 'backdrop_path',
+    'popularity': 'popularity',
+    'final_score': 'score',
+    'similarity_score': 'score',
+    'recommendation_score': 'score',
+    'tmdb_id': 'tmdb_id',
+}
+
+# Precompiled (attribute, column index) mappings, one per distinct record key layout
+_key_mappings = {}
+
+
+def _key_mapping(keys):
+    mapping = _key_mappings.get(keys)
+    if mapping is None:
+        mapping = tuple(
+            (FIELD_ALIASES[key], index)
+            for index, key in enumerate(keys)
+            if key in FIELD_ALIASES
+        )
+        _key_mappings[keys] = mapping
+    return mapping
+
+
+def _to_native(value):
+    # Neo4j temporal values (neo4j.time.Date/DateTime) expose to_native()
+    to_native = getattr(value, 'to_native', None)
+    return to_native() if to_native is not None else value
+
+
+class MovieSummary:
+    """Résumé d'un film pour les listes, les cartes et les API JSON"""
+    __slots__ = (
+        'movie_id', 'title', 'genres', 'rating', 'release_date',
+        'overview', 'poster_path', 'backdrop_path', 'popularity', 'score', 'tmdb_id', 'updated_at',
+    )
+
+    def __init__(self, movie_id=None, title='', genres=(), rating=0.0, release_date=None,
+                 overview='', poster_path=None, backdrop_path=None, popularity=0.0, score=None,
+                 tmdb_id=None, updated_at=None):
+        self.movie_id = movie_id
+        self.title = title
+        self.genres = genres
+        self.rating = rating
+        self.release_date = release_date
+        self.overview = overview
+        self.poster_path = poster_path
+        self.backdrop_path = backdrop_path
+        self.popularity = popularity
+        self.score = score
+        self.tmdb_id = tmdb_id
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_record(cls, record):
+        """Build a summary from a Neo4j Record (or a dict with the same keys)"""
+        summary = cls()
+        if isinstance(record, dict):
+            for key, value in record.items():
+                attribute = FIELD_ALIASES.get(key)
+                if attribute is not None and value is not None:
+                    setattr(summary, attribute, value)
+        else:
+            for attribute, index in _key_mapping(tuple(record.keys())):
+                value = record[index]
+                if value is not None:
+                    setattr(summary, attribute, value)
+        summary.release_date = _to_native(summary.release_date)
+        return summary
+
+    @classmethod
+    def from_movie(cls, movie):
+        """Build a summary from a Movie instance (prefetch 'genres' when building lists)"""
+        return cls(
+            movie_id=movie.id,
+            title=movie.title,
+            genres=[genre.name for genre in movie.genres.all()],
+            rating=movie.vote_average,
+            release_date=movie.release_date,
+            overview=movie.overview,
+            poster_path=movie.poster_path,
+            backdrop_path=movie.backdrop_path,
+            popularity=movie.popularity,
+            tmdb_id=movie.tmdb_id,
+            updated_at=movie.updated_at,
+        )
+
+    @classmethod
+    def from_tmdb(cls, movie_data, genre_names=None):
+        """
+        Build a summary from a TMDb API payload for a movie that may not be stored yet
+        (movie_id stays None). genre_names maps TMDb genre ids to names.
+        """
+        release_date = None
+        if movie_data.get('release_date'):
+            try:
+                release_date = datetime.strptime(movie_data['release_date'], '%Y-%m-%d').date()
+            except ValueError:
+                pass
+
+        if movie_data.get('genres'):
+            genres = [genre['name'] for genre in movie_data['genres']]
+        else:
+            genre_names = genre_names or {}
+            genres = [genre_names[genre_id] for genre_id in movie_data.get('genre_ids', []) if genre_id in genre_names]
+
+        return cls(
+            title=movie_data.get('title', ''),
+            genres=genres,
+            rating=movie_data.get('vote_average', 0.0),
+            release_date=release_date,
+            overview=movie_data.get('overview', ''),
+            poster_path=movie_data.get('poster_path'),
+            backdrop_path=movie_data.get('backdrop_path'),
+            popularity=movie_data.get('popularity', 0.0),
+            tmdb_id=movie_data.get('id'),
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        """Build summaries for a result set, skipping rows without a movie id"""
+        summaries = []
+        for record in records or ():
+            summary = cls.from_record(record)
+            if summary.movie_id is not None:
+                summaries.append(summary)
+        return summaries
+
+    # Template compatibility with Movie instances
+    @property
+    def pk(self):
+        return self.movie_id
+
+    @property
+    def id(self):
+        return self.movie_id
+
+    @property
+    def vote_average(self):
+        return self.rating
+
+    @property
+    def poster_url(self):
+        if self.poster_path:
+            return f"{POSTER_BASE_URL}{self.poster_path}"
+        return ""
+
+    def to_dict(self):
+        """JSON-serialisable representation"""
+        release_date = self.release_date
+        return {
+            'id': self.movie_id,
+            'title': self.title,
+            'overview': self.overview,
+            'release_date': release_date.isoformat() if hasattr(release_date, 'isoformat') else release_date,
+            'vote_average': self.rating,
+            'poster_path': self.poster_path,
+            'poster_url': self.poster_url,
+            'genres': list(self.genres),
+            'popularity': self.popularity,
+            'score': self.score,
+        }
+
+    def __repr__(self):
+        return f"<MovieSummary {self.movie_id}: {self.title}>"
@@ -20,10 +20,30 @@ Manages movie data s        params = {
         }nd operations in Neo4j
 """
 import logging
-from movie_recommender.neo4j_connection import get_neo4j_connection
+from movie_recommender.neo4j_connection import get_neo4j_connection, get_async_neo4j_connection
+from .keyset import cypher_keyset
 
 logger = logging.getLogger(__name__)
 
+POPULAR_MOVIES_CYPHER = """
+MATCH (m:Movie)
+WHERE m.vote_average >= 7.0
+AND m.vote_count >= 500
+
+RETURN m.id as movie_id,
+       m.title as title,
+       m.genres as genres,
+       m.vote_average as rating,
+       m.release_date as release_date,
+       m.overview as overview,
+       m.popularity as popularity,
+       m.poster_path as poster_path,
+       m.backdrop_path as backdrop_path
+ORDER BY m.popularity DESC, m.vote_average DESC
+LIMIT $limit
+"""
+
+
 class Neo4jMovieService:
     """
     Service for managing movie data in Neo4j
@@ -152,14 +172,18 @@ class Neo4jMovieService:
         
         return self.neo4j.run_query(query, {"query_text": query_text, "limit": limit})
     
-    def get_movies_by_genre(self, genre_name, limit=20):
+    def get_movies_by_genre(self, genre_name, limit=20, cursor=None):
         """
-        Get movies by specific genre
+        Get movies by specific genre, best rated first.
+        `cursor` is a keyset cursor on (vote_average, id); rows come back in cursor
+        order (see keyset.page_from_rows)
         """
-        query = """
+        keyset_where, keyset_order, params, position = cypher_keyset('m.vote_average', 'm.id', True, cursor)
+        query = f"""
         MATCH (m:Movie)
         WHERE $genre_name IN m.genres
         AND m.vote_average >= 6.0
+        AND {keyset_where}
         
         RETURN m.id as movie_id,
                m.title as title,
@@ -168,35 +192,23 @@ class Neo4jMovieService:
                m.release_date as release_date,
                m.overview as overview,
                m.poster_path as poster_path
-        ORDER BY m.vote_average DESC, m.popularity DESC
+        ORDER BY {keyset_order}
         LIMIT $limit
         """
         
-        return self.neo4j.run_query(query, {"genre_name": genre_name, "limit": limit})
+        return self.neo4j.run_query(query, {"genre_name": genre_name, "limit": limit, **params})
     
     def get_popular_movies(self, limit=20):
         """
         Get popular movies
         """
-        query = """
-        MATCH (m:Movie)
-        WHERE m.vote_average >= 7.0
-        AND m.vote_count >= 500
-        
-        RETURN m.id as movie_id,
-               m.title as title,
-               m.genres as genres,
-               m.vote_average as rating,
-               m.release_date as release_date,
-               m.overview as overview,
-               m.popularity as popularity,
-               m.poster_path as poster_path,
-               m.backdrop_path as backdrop_path
-        ORDER BY m.popularity DESC, m.vote_average DESC
-        LIMIT $limit
+        return self.neo4j.run_query(POPULAR_MOVIES_CYPHER, {"limit": limit})
+    
+    async def aget_popular_movies(self, limit=20):
         """
-        
-        return self.neo4j.run_query(query, {"limit": limit})
+        Async get_popular_movies, on the async driver of the running event loop
+        """
+        return await get_async_neo4j_connection().run_query(POPULAR_MOVIES_CYPHER, {"limit": limit})
     
     def get_user_watchlist(self, user_id):
         """
@@ -305,31 +317,50 @@ class Neo4jMovieService:
         
         return self.neo4j.run_query(query)
     
-    def cleanup_duplicate_movies(self):
+    def find_duplicate_movie_groups(self):
         """
-        Clean up duplicate movie entries
+        Group movie nodes by normalised (title, release_date) in a single aggregation pass
         """
         query = """
-        MATCH (m1:Movie), (m2:Movie)
-        WHERE m1.id < m2.id 
-        AND m1.title = m2.title 
-        AND m1.release_date = m2.release_date
+        MATCH (m:Movie)
+        WHERE m.id IS NOT NULL AND m.title IS NOT NULL
+        WITH m ORDER BY m.id
+        WITH toLower(trim(m.title)) + '|' + coalesce(toString(m.release_date), '') as dedup_key,
+             collect(elementId(m)) as node_ids
+        WHERE size(node_ids) > 1
+        RETURN dedup_key,
+               node_ids[0] as keep,
+               node_ids[1..] as duplicates
+        """
+        
+        return self.neo4j.run_query(query)
+    
+    def cleanup_duplicate_movies(self, dry_run=False, batch_size=100):
+        """
+        Clean up duplicate movie entries, merging each duplicate group into its lowest id
+        """
+        groups = [
+            {
+                'keep': record['keep'],
+                'duplicates': list(record['duplicates']),
+            }
+            for record in self.find_duplicate_movie_groups()
+        ]
         
-        // Merge relationships from m2 to m1
-        OPTIONAL MATCH (u:User)-[r]->(m2)
-        FOREACH(rel IN CASE WHEN r IS NOT NULL THEN [r] ELSE [] END |
-            MERGE (u)-[new_rel:RATED]->(m1)
-            SET new_rel = properties(rel)
-            DELETE rel
-        )
+        stats = {
+            'groups': len(groups),
+            'duplicates': sum(len(group['duplicates']) for group in groups),
+            'duplicates_removed': 0,
+            'dry_run': dry_run,
+        }
         
-        // Delete duplicate movie
-        DETACH DELETE m2
+        if dry_run:
+            return stats
         
-        RETURN count(*) as duplicates_removed
-        """
+        for i in range(0, len(groups), batch_size):
+            stats['duplicates_removed'] += self.neo4j.merge_nodes(groups[i:i + batch_size])
         
-        return self.neo4j.run_query(query)
+        return stats
 
 # Global instance
 neo4j_movie_service = Neo4jMovieService()
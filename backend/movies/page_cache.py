@@ -0,0 +1,203 @@
+"""
+Anonymous full-page cache for the public movie pages
+Pages are always rendered as seen by an anonymous visitor, so one cached copy serves
+everyone; user-specific bits are hydrated client-side from api_page_state.
+Keys embed version counters that the model signals bump when movies or reviews change.
+"""
+from contextlib import contextmanager
+from functools import wraps
+import hashlib
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+MOVIES_VERSION_KEY = 'page_version:movies'
+REVIEWS_VERSION_KEY = 'page_version:reviews'
+USERS_VERSION_KEY = 'page_version:users'
+# Cookie read by base.html to pick the navbar variant before hydration
+AUTH_STATE_COOKIE = 'movierec_auth'
+
+
+def movie_version_key(movie_id):
+    return f'page_version:movie:{movie_id}'
+
+
+def user_version_key(user_id):
+    return f'page_version:user:{user_id}'
+
+
+def _fresh_version():
+    # Horodatage en microsecondes : jamais une valeur déjà servie, même après éviction de la clé
+    return time.time_ns() // 1000
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Clé absente ou expirée : toute valeur neuve invalide les pages existantes
+        cache.set(key, _fresh_version(), None)
+
+
+def bump_movies_version():
+    """Invalidate every cached page listing movies"""
+    _bump(MOVIES_VERSION_KEY)
+
+
+def bump_movie_version(movie_id):
+    """Invalidate the cached detail pages of one movie (reviews changed)"""
+    _bump(movie_version_key(movie_id))
+
+
+def bump_reviews_version():
+    """Invalidate everything aggregated over all reviews (rating analytics)"""
+    _bump(REVIEWS_VERSION_KEY)
+
+
+def bump_user_version(user_id):
+    """Invalidate what is computed from one user's ratings and watchlist (ranked recommendations)"""
+    _bump(user_version_key(user_id))
+
+
+def bump_users_version():
+    """Invalidate everything counting users"""
+    _bump(USERS_VERSION_KEY)
+
+
+def current_versions(version_keys):
+    """
+    Current value of each version counter. A missing counter starts at a fresh value
+    rather than 0, so a key evicted from the cache never brings back an old version.
+    """
+    versions = cache.get_many(version_keys)
+    missing = [key for key in version_keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _fresh_version(), None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in version_keys]
+
+
+def page_cache_key(prefix, request, movie_id=None):
+    version_keys = [MOVIES_VERSION_KEY]
+    if movie_id is not None:
+        version_keys.append(movie_version_key(movie_id))
+    version = '.'.join(str(value) for value in current_versions(version_keys))
+    path_hash = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    return f'page:{prefix}:{version}:{path_hash}'
+
+
+def _has_pending_messages(request):
+    # len() charge les messages sans les marquer comme lus
+    return len(messages.get_messages(request)) > 0
+
+
+async def _anonymous_auser():
+    return AnonymousUser()
+
+
+@contextmanager
+def _as_anonymous(request):
+    """Render the view as an anonymous visitor, restoring the real user afterwards"""
+    user, auser = request.user, getattr(request, 'auser', None)
+    request.user = AnonymousUser()
+    request.auser = _anonymous_auser
+    try:
+        yield
+    finally:
+        request.user = user
+        if auser is not None:
+            request.auser = auser
+
+
+def _cached_page(prefix, request, movie_id):
+    """(key, cached response); key is None when the request bypasses the cache"""
+    if request.method not in ('GET', 'HEAD') or not PAGE_CACHE_TIMEOUT or _has_pending_messages(request):
+        return None, None
+
+    key = page_cache_key(prefix, request, movie_id)
+    # Le jeton CSRF n'est pas dans la page en cache : le cookie doit exister pour les appels AJAX
+    get_token(request)
+
+    # La clé change avec le contenu : le navigateur qui a déjà cette version reçoit un 304
+    not_modified = get_conditional_response(request, etag=_page_etag(key))
+    if not_modified is not None:
+        not_modified['ETag'] = _page_etag(key)
+        return key, not_modified
+
+    cached = cache.get(key)
+    if cached is None:
+        return key, None
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'hit'
+    response['ETag'] = _page_etag(key)
+    return key, response
+
+
+def _page_etag(key):
+    return f'W/"{hashlib.md5(key.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def _store_page(key, response):
+    if response.status_code == 200 and not response.streaming:
+        cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+        response['ETag'] = _page_etag(key)
+    return response
+
+
+def _is_template_response(response):
+    return hasattr(response, 'render') and callable(response.render)
+
+
+def anonymous_page_cache(prefix, movie_kwarg=None):
+    """
+    Cache the anonymous rendering of a GET view (sync or async).
+    `movie_kwarg` names the URL kwarg holding a movie id whose own version is part of the key.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                movie_id = kwargs.get(movie_kwarg) if movie_kwarg else None
+                key, cached = await sync_to_async(_cached_page)(prefix, request, movie_id)
+                if cached is not None:
+                    return cached
+                if key is None:
+                    return await view_func(request, *args, **kwargs)
+
+                with _as_anonymous(request):
+                    response = await view_func(request, *args, **kwargs)
+                    if _is_template_response(response):
+                        await sync_to_async(response.render)()
+                return await sync_to_async(_store_page)(key, response)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            movie_id = kwargs.get(movie_kwarg) if movie_kwarg else None
+            key, cached = _cached_page(prefix, request, movie_id)
+            if cached is not None:
+                return cached
+            if key is None:
+                return view_func(request, *args, **kwargs)
+
+            with _as_anonymous(request):
+                response = view_func(request, *args, **kwargs)
+                if _is_template_response(response):
+                    response.render()
+            return _store_page(key, response)
+        return wrapper
+    return decorator
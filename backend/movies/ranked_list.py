@@ -0,0 +1,177 @@
+"""
+Stable ranked recommendation lists behind the recommendations page
+The engine runs once per (user, type, version): the ranking is stored in the cache as two
+packed arrays (movie ids, scores) and every page is a slice of it, addressed by a cursor
+holding the version and offset. Pages of one list never shift while the user browses;
+when the user nears the end, a background job asks the engine for a longer list and
+appends the new movies.
+"""
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import binascii
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .keyset import KeysetPage
+from .models import Movie
+from .movie_summary import MovieSummary
+from .page_cache import MOVIES_VERSION_KEY, current_versions, user_version_key
+
+logger = logging.getLogger(__name__)
+
+RANKED_LIST_TIMEOUT = getattr(settings, 'RANKED_LIST_TIMEOUT', 3600)
+# Movies asked of the engine for a new list, and the most a list grows to
+RANKED_LIST_INITIAL = 60
+RANKED_LIST_MAX = 240
+# The list is extended when fewer than this many pages are left after the current one
+REFILL_PAGES_AHEAD = 2
+REFILL_LOCK_TIMEOUT = 60
+
+# Extensions en arrière-plan (moteur synchrone)
+refill_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ranked-list')
+
+
+class RankedList:
+    """Movie ids and scores in ranking order, packed for the cache"""
+    __slots__ = ('ids', 'scores', 'exhausted')
+
+    def __init__(self, ids=(), scores=(), exhausted=False):
+        self.ids = array('q', ids)
+        self.scores = array('f', scores)
+        self.exhausted = exhausted
+
+    def __len__(self):
+        return len(self.ids)
+
+    def extend(self, movies, requested):
+        """Append the movies not ranked yet; the engine ran dry if it returned fewer than requested"""
+        seen = set(self.ids)
+        for movie in movies:
+            if movie.movie_id is not None and movie.movie_id not in seen:
+                seen.add(movie.movie_id)
+                self.ids.append(movie.movie_id)
+                self.scores.append(movie.score or 0.0)
+        self.exhausted = self.exhausted or len(movies) < requested or len(self.ids) >= RANKED_LIST_MAX
+        return self
+
+    def to_cache(self):
+        return (self.ids.tobytes(), self.scores.tobytes(), self.exhausted)
+
+    @classmethod
+    def from_cache(cls, value):
+        ranked = cls(exhausted=value[2])
+        ranked.ids.frombytes(value[0])
+        ranked.scores.frombytes(value[1])
+        return ranked
+
+
+def ranked_list_key(user_id, recommendation_type, version):
+    return f'ranked_list:{user_id}:{recommendation_type}:{version}'
+
+
+def list_version(user_id):
+    """Catalogue and user versions: a new rating or watchlist entry starts a new list"""
+    return '.'.join(str(value) for value in current_versions([MOVIES_VERSION_KEY, user_version_key(user_id)]))
+
+
+def encode_cursor(version, offset):
+    payload = json.dumps([version, offset], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(version, offset) or None for a missing or malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        version, offset = json.loads(payload)
+        return str(version), max(int(offset), 0)
+    except (TypeError, ValueError, binascii.Error):
+        return None
+
+
+def _refill(engine, user_id, recommendation_type, key):
+    """Ask the engine for a longer list and append the new movies (runs on refill_executor)"""
+    try:
+        value = cache.get(key)
+        if value is None:
+            return
+        ranked = RankedList.from_cache(value)
+        requested = min(len(ranked) * 2, RANKED_LIST_MAX)
+        movies = engine.get_recommendations_for_user(
+            user_id, limit=requested, recommendation_type=recommendation_type
+        ) or []
+        # ranked_page a pu stocker une liste plus longue pendant le calcul : relit la clé,
+        # ajoute les nouveaux films à la valeur actuelle et n'écrit que si elle s'allonge
+        current = cache.get(key)
+        if current is not None:
+            ranked = RankedList.from_cache(current)
+        before = (len(ranked), ranked.exhausted)
+        ranked.extend(movies, requested)
+        if current is None or (len(ranked), ranked.exhausted) != before:
+            cache.set(key, ranked.to_cache(), RANKED_LIST_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error extending ranked recommendations: {e}")
+    finally:
+        cache.delete(f'{key}:refill')
+        close_old_connections()
+
+
+def _schedule_refill(engine, user_id, recommendation_type, key):
+    # Un seul remplissage à la fois par liste
+    if cache.add(f'{key}:refill', 1, REFILL_LOCK_TIMEOUT):
+        refill_executor.submit(_refill, engine, user_id, recommendation_type, key)
+
+
+def _load_movies(ids, scores):
+    """Summaries of the sliced movies in ranking order, scores attached"""
+    movies = Movie.objects.prefetch_related('genres').in_bulk(ids)
+    summaries = []
+    for movie_id, score in zip(ids, scores):
+        if movie_id in movies:
+            summary = MovieSummary.from_movie(movies[movie_id])
+            summary.score = score
+            summaries.append(summary)
+    return summaries
+
+
+async def ranked_page(engine, user_id, recommendation_type, cursor=None, per_page=12):
+    """
+    KeysetPage of MovieSummary for one page of the user's ranked list, with
+    `number` set to the page number
+    """
+    position = decode_cursor(cursor)
+    version, offset = position if position else (await sync_to_async(list_version)(user_id), 0)
+    key = ranked_list_key(user_id, recommendation_type, version)
+
+    value = await cache.aget(key)
+    ranked = RankedList.from_cache(value) if value is not None else None
+    if ranked is None or (offset + per_page > len(ranked) and not ranked.exhausted):
+        # Liste absente (ou curseur en avance sur le remplissage) : calculée maintenant
+        requested = max(RANKED_LIST_INITIAL, min(offset + per_page * (REFILL_PAGES_AHEAD + 1), RANKED_LIST_MAX))
+        movies = await engine.aget_recommendations_for_user(
+            user_id, limit=requested, recommendation_type=recommendation_type
+        ) or []
+        ranked = (ranked or RankedList()).extend(movies, requested)
+        await cache.aset(key, ranked.to_cache(), RANKED_LIST_TIMEOUT)
+
+    offset = min(offset, max(len(ranked) - 1, 0) // per_page * per_page)
+    end = offset + per_page
+    if not ranked.exhausted and end + per_page * REFILL_PAGES_AHEAD > len(ranked):
+        await sync_to_async(_schedule_refill)(engine, user_id, recommendation_type, key)
+
+    movies = await sync_to_async(_load_movies)(ranked.ids[offset:end].tolist(), ranked.scores[offset:end].tolist())
+    page = KeysetPage(
+        movies,
+        next_cursor=encode_cursor(version, end) if end < len(ranked) else None,
+        previous_cursor=encode_cursor(version, max(offset - per_page, 0)) if offset else None,
+    )
+    page.number = offset // per_page + 1
+    return page
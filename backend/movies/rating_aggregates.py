@@ -0,0 +1,103 @@
+"""
+Denormalised review aggregates on Movie
+rating_count, rating_sum, rating_average and the per-star counts are changed by the
+Review signals with F() UPDATEs (no read-modify-write, safe under concurrent reviews),
+so pages, APIs and sorts read columns instead of aggregating the review table.
+Writes that bypass the signals (bulk_create, QuerySet.update) are fixed by the
+rebuild_rating_aggregates command.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Movie, Review, RATING_AGGREGATE_FIELDS
+
+RATING_STARS = range(1, 6)
+
+
+def star_field(rating):
+    return f'rating_{rating}_count'
+
+
+def _average():
+    return Case(
+        When(rating_count__gt=0, then=Cast('rating_sum', FloatField()) / F('rating_count')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def apply_rating_change(movie_id, removed=None, added=None):
+    """
+    Take the `removed` rating out of the movie aggregates and count the `added` one
+    (either may be None: review created or deleted)
+    """
+    if removed == added:
+        return
+    deltas = {}
+    for rating, delta in ((removed, -1), (added, 1)):
+        if rating is None:
+            continue
+        for field, amount in (('rating_count', delta), ('rating_sum', delta * rating), (star_field(rating), delta)):
+            deltas[field] = deltas.get(field, 0) + amount
+
+    movie = Movie.objects.filter(pk=movie_id)
+    with transaction.atomic():
+        # updated_at suit les agrégats : ETag / Last-Modified de la fiche restent justes
+        movie.update(updated_at=timezone.now(), **{field: F(field) + amount for field, amount in deltas.items() if amount})
+        # La moyenne est recalculée sur les colonnes déjà mises à jour (ligne verrouillée)
+        movie.update(rating_average=_average())
+
+
+def aggregates_from_reviews(movie_ids=None):
+    """{movie id: {field: value}} computed from the review table, one grouped query"""
+    reviews = Review.objects.order_by()
+    if movie_ids is not None:
+        reviews = reviews.filter(movie_id__in=movie_ids)
+
+    aggregates = {}
+    for row in reviews.values('movie_id', 'rating').annotate(count=Count('id')):
+        values = aggregates.setdefault(row['movie_id'], dict.fromkeys(RATING_AGGREGATE_FIELDS, 0))
+        values['rating_count'] += row['count']
+        values['rating_sum'] += row['count'] * row['rating']
+        values[star_field(row['rating'])] += row['count']
+    for values in aggregates.values():
+        values['rating_average'] = values['rating_sum'] / values['rating_count']
+    return aggregates
+
+
+def rebuild_rating_aggregates(movie_ids=None, batch_size=500):
+    """
+    Recompute the aggregates of the given movies (all of them by default) from the
+    reviews; returns the number of movies whose stored values were wrong
+    """
+    empty = dict.fromkeys(RATING_AGGREGATE_FIELDS, 0)
+    movies = Movie.objects.order_by('pk').only('pk', *RATING_AGGREGATE_FIELDS)
+    if movie_ids is not None:
+        movies = movies.filter(pk__in=movie_ids)
+
+    fixed, batch = 0, []
+    for movie in movies.iterator(chunk_size=batch_size):
+        batch.append(movie)
+        if len(batch) >= batch_size:
+            fixed += _rebuild_batch(batch, empty)
+            batch = []
+    if batch:
+        fixed += _rebuild_batch(batch, empty)
+    return fixed
+
+
+def _rebuild_batch(movies, empty):
+    aggregates = aggregates_from_reviews([movie.pk for movie in movies])
+    stale = []
+    for movie in movies:
+        values = aggregates.get(movie.pk, empty)
+        if any(getattr(movie, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(movie, field, value)
+            movie.updated_at = timezone.now()
+            stale.append(movie)
+    if stale:
+        Movie.objects.bulk_update(stale, RATING_AGGREGATE_FIELDS + ('updated_at',))
+    return len(stale)
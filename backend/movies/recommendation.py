@@ -1,6 +1,7 @@
 from .models import Review, Movie, Genre
+from .user_stats import user_stats_for
 from django.contrib.auth.models import User
-from django.db.models import Avg, Count
+from django.db.models import Count
 import logging
 
 logger = logging.getLogger(__name__)
@@ -89,22 +90,14 @@ def get_similar_movies(movie_id, limit=6):
 
 def get_user_stats(user):
     """Retourne les statistiques d'un utilisateur"""
-    user_reviews = Review.objects.filter(user=user)
+    stats = user_stats_for(user)
     return {
-        'total_reviews': user_reviews.count(),
-        'average_rating': user_reviews.aggregate(Avg('rating'))['rating__avg'] or 0,
-        'favorite_genres': get_user_favorite_genres(user)
+        'total_reviews': stats.review_count,
+        'average_rating': stats.average_rating,
+        'favorite_genres': [genre for genre, count in stats.favorite_genres(3)]
     }
 
 def get_user_favorite_genres(user):
     """Retourne les genres favoris d'un utilisateur"""
-    user_reviews = Review.objects.filter(user=user, rating__gte=4.0)
-    genre_counts = {}
-    
-    for review in user_reviews:
-        for genre in review.movie.genres.all():
-            genre_counts[genre.name] = genre_counts.get(genre.name, 0) + 1
-    
-    # Trier par popularité
-    sorted_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)
-    return [genre for genre, count in sorted_genres[:3]]  # Top 3 genres
+    # Top 3 genres, lus sur les statistiques matérialisées
+    return [genre for genre, count in user_stats_for(user).favorite_genres(3)]
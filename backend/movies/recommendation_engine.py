@@ -48,10 +48,16 @@ def get_content_based_recommendations(user, limit=10):
         genre_preferences = analyze_user_genre_preferences(user)
         rating_preferences = analyze_user_rating_patterns(user)
         
-        # Get candidate movies
-        candidate_movies = Movie.objects.exclude(
+        # Get candidate movies - the cohort's shared pool when the user has been clustered
+        from .user_cohorts import get_cohort_candidate_ids
+        cohort_candidates = get_cohort_candidate_ids(user)
+        if cohort_candidates:
+            candidate_movies = Movie.objects.filter(id__in=cohort_candidates)
+        else:
+            candidate_movies = Movie.objects.all()
+        candidate_movies = candidate_movies.exclude(
             id__in=user_reviews.values_list('movie_id', flat=True)
-        )
+        ).prefetch_related('genres')
         
         # Score movies based on user preferences
         scored_movies = []
@@ -326,11 +332,11 @@ def get_neo4j_recommendations(user, limit=10):
         
         # Cypher query to find recommendations based on user similarity
         query = """
-        MATCH (u:User {django_id: $user_id})-[:LIKES]->(m:Movie)<-[:LIKES]-(similar_user:User)
+        MATCH (u:User {id: $user_id})-[:LIKES]->(m:Movie)<-[:LIKES]-(similar_user:User)
         WHERE similar_user <> u
         MATCH (similar_user)-[:LIKES]->(rec_movie:Movie)
         WHERE NOT (u)-[:LIKES]->(rec_movie)
-        RETURN rec_movie.django_id as movie_id, COUNT(*) as score
+        RETURN rec_movie.id as movie_id, COUNT(*) as score
         ORDER BY score DESC
         LIMIT $limit
         """
@@ -406,42 +412,17 @@ def sync_interaction_to_neo4j(user, movie, interaction_type):
         if not neo4j_conn.is_connected:
             return
         
-        # Create user and movie nodes if they don't exist
-        create_user_query = """
-        MERGE (u:User {django_id: $user_id, username: $username})
-        """
-        
-        create_movie_query = """
-        MERGE (m:Movie {django_id: $movie_id, title: $title})
-        """
-        
-        neo4j_conn.run_query(create_user_query, {
-            "user_id": user.id,
-            "username": user.username
-        })
-        
-        neo4j_conn.run_query(create_movie_query, {
-            "movie_id": movie.id,
-            "title": movie.title
-        })
-        
-        # Create interaction relationship
+        # Create interaction relationship on the canonical user/movie nodes
         if interaction_type == 'view':
             relationship_query = """
-            MATCH (u:User {django_id: $user_id})
-            MATCH (m:Movie {django_id: $movie_id})
             MERGE (u)-[:VIEWED]->(m)
             """
         else:
             relationship_query = """
-            MATCH (u:User {django_id: $user_id})
-            MATCH (m:Movie {django_id: $movie_id})
             MERGE (u)-[:INTERACTED {type: $interaction_type}]->(m)
             """
         
-        neo4j_conn.run_query(relationship_query, {
-            "user_id": user.id,
-            "movie_id": movie.id,
+        neo4j_conn.write_user_movie_relationship(user, movie, relationship_query, {
             "interaction_type": interaction_type
         })
         
@@ -462,47 +443,24 @@ def sync_user_review_to_neo4j(user, movie, rating, comment):
         if not neo4j_conn.is_connected:
             return
         
-        # Create user and movie nodes if they don't exist
-        create_user_query = """
-        MERGE (u:User {django_id: $user_id, username: $username})
-        """
-        
-        create_movie_query = """
-        MERGE (m:Movie {django_id: $movie_id, title: $title})
-        """
-        
-        neo4j_conn.run_query(create_user_query, {
-            "user_id": user.id,
-            "username": user.username
-        })
-        
-        neo4j_conn.run_query(create_movie_query, {
-            "movie_id": movie.id,
-            "title": movie.title
-        })
-        
-        # Create review relationship
+        # Create review relationship on the canonical user/movie nodes
         if rating >= 4:
             # High rating = LIKES relationship
             review_query = """
-            MATCH (u:User {django_id: $user_id})
-            MATCH (m:Movie {django_id: $movie_id})
-            MERGE (u)-[:LIKES {rating: $rating, comment: $comment}]->(m)
+            MERGE (u)-[r:LIKES]->(m)
+            SET r.rating = $rating, r.comment = $comment
             """
         else:
             # Low rating = DISLIKES relationship
             review_query = """
-            MATCH (u:User {django_id: $user_id})
-            MATCH (m:Movie {django_id: $movie_id})
-            MERGE (u)-[:RATED {rating: $rating, comment: $comment}]->(m)
+            MERGE (u)-[r:RATED]->(m)
+            SET r.rating = $rating, r.comment = $comment
             """
         
-        neo4j_conn.run_query(review_query, {
-            "user_id": user.id,
-            "movie_id": movie.id,
+        neo4j_conn.write_user_movie_relationship(user, movie, review_query, {
             "rating": rating,
             "comment": comment
-        })
+        }, refresh_profile=True)
         
         logger.debug(f"Synced review to Neo4j: {user.username} rated {movie.title} {rating}/5")
         
@@ -521,36 +479,12 @@ def sync_user_watchlist_to_neo4j(user, movie):
         if not neo4j_conn.is_connected:
             return
         
-        # Create user and movie nodes if they don't exist
-        create_user_query = """
-        MERGE (u:User {django_id: $user_id, username: $username})
-        """
-        
-        create_movie_query = """
-        MERGE (m:Movie {django_id: $movie_id, title: $title})
-        """
-        
-        neo4j_conn.run_query(create_user_query, {
-            "user_id": user.id,
-            "username": user.username
-        })
-        
-        neo4j_conn.run_query(create_movie_query, {
-            "movie_id": movie.id,
-            "title": movie.title
-        })
-        
-        # Create watchlist relationship
+        # Create watchlist relationship on the canonical user/movie nodes
         watchlist_query = """
-        MATCH (u:User {django_id: $user_id})
-        MATCH (m:Movie {django_id: $movie_id})
         MERGE (u)-[:WANTS_TO_WATCH]->(m)
         """
         
-        neo4j_conn.run_query(watchlist_query, {
-            "user_id": user.id,
-            "movie_id": movie.id
-        })
+        neo4j_conn.write_user_movie_relationship(user, movie, watchlist_query)
         
         logger.debug(f"Synced watchlist to Neo4j: {user.username} wants to watch {movie.title}")
         
@@ -568,7 +502,7 @@ def remove_user_watchlist_from_neo4j(user, movie):
         if not neo4j_conn.is_connected:
             return
         query = """
-        MATCH (u:User {django_id: $user_id})-[r:WANTS_TO_WATCH]->(m:Movie {django_id: $movie_id})
+        MATCH (u:User {id: $user_id})-[r:WANTS_TO_WATCH]->(m:Movie {id: $movie_id})
         DELETE r
         """
         neo4j_conn.run_query(query, {
@@ -754,9 +688,9 @@ def get_neo4j_similar_movies(movie, limit=6):
         
         # Find movies that users who liked this movie also liked
         query = """
-        MATCH (m:Movie {django_id: $movie_id})<-[:LIKES]-(u:User)-[:LIKES]->(similar:Movie)
+        MATCH (m:Movie {id: $movie_id})<-[:LIKES]-(u:User)-[:LIKES]->(similar:Movie)
         WHERE similar <> m
-        RETURN similar.django_id as movie_id, COUNT(*) as score
+        RETURN similar.id as movie_id, COUNT(*) as score
         ORDER BY score DESC
         LIMIT $limit
         """
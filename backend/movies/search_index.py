@@ -0,0 +1,188 @@
+"""
+Full-text search index for movie titles and overviews
+SQLite: FTS5 external-content table kept in sync by triggers
+PostgreSQL: GIN index over a weighted tsvector expression
+"""
+from django.db import connection, DatabaseError
+from django.db.models import Case, When, IntegerField
+from .models import Movie
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'movies_movie_fts'
+POSTGRES_INDEX = 'movies_movie_search_idx'
+
+# Share of the final score given to popularity, the rest goes to text relevance
+POPULARITY_WEIGHT = 0.3
+# Candidates fetched by relevance before blending with popularity, per requested result
+CANDIDATE_FACTOR = 5
+
+SQLITE_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, overview,
+        content='movies_movie', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, overview) VALUES (new.id, new.title, new.overview);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, overview) VALUES ('delete', old.id, old.title, old.overview);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, overview ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, overview) VALUES ('delete', old.id, old.title, old.overview);
+        INSERT INTO {FTS_TABLE}(rowid, title, overview) VALUES (new.id, new.title, new.overview);
+    END
+    """,
+]
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(overview, '')), 'B')"
+)
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def ensure_search_index():
+    """
+    Create the search index if it does not exist yet. Returns True when the index is usable.
+    """
+    if 'movies_movie' not in connection.introspection.table_names():
+        logger.debug("Movie table missing, search index not created")
+        return False
+
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                created = FTS_TABLE not in connection.introspection.table_names()
+                for statement in SQLITE_SCHEMA:
+                    cursor.execute(statement)
+                if created:
+                    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON movies_movie USING GIN (({POSTGRES_VECTOR}))"
+                )
+            else:
+                return False
+        return True
+    except DatabaseError as e:
+        logger.warning(f"Search index unavailable: {e}")
+        return False
+
+
+def rebuild_search_index():
+    """Rebuild the search index from the movie table"""
+    if not ensure_search_index():
+        return False
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        else:
+            cursor.execute(f"REINDEX INDEX {POSTGRES_INDEX}")
+    return True
+
+
+def _fetch_candidates(tokens, limit):
+    """Return (movie_id, relevance, popularity) rows, best relevance first"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            match = ' '.join('"%s"*' % token.replace('"', '""') for token in tokens)
+            cursor.execute(
+                f"""
+                SELECT m.id, -bm25({FTS_TABLE}, 10.0, 1.0) AS relevance, m.popularity
+                FROM {FTS_TABLE}
+                JOIN movies_movie m ON m.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)
+                LIMIT %s
+                """,
+                [match, limit]
+            )
+        elif connection.vendor == 'postgresql':
+            tsquery = ' & '.join(f"{token}:*" for token in tokens)
+            cursor.execute(
+                f"""
+                SELECT id, ts_rank_cd({POSTGRES_VECTOR}, to_tsquery('simple', %s)) AS relevance, popularity
+                FROM movies_movie
+                WHERE ({POSTGRES_VECTOR}) @@ to_tsquery('simple', %s)
+                ORDER BY relevance DESC
+                LIMIT %s
+                """,
+                [tsquery, tsquery, limit]
+            )
+        else:
+            return None
+        return cursor.fetchall()
+
+
+def search_movie_ids(query, limit=20, popularity_weight=POPULARITY_WEIGHT):
+    """
+    Rank movie ids by text relevance (BM25 / ts_rank) blended with popularity.
+    Returns None when no full-text index is available, so callers can fall back.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+
+    try:
+        rows = _fetch_candidates(tokens, limit * CANDIDATE_FACTOR)
+    except DatabaseError as e:
+        logger.warning(f"Full-text search failed, falling back: {e}")
+        return None
+    if rows is None:
+        return None
+    if not rows:
+        return []
+
+    max_relevance = max(row[1] for row in rows) or 1.0
+    max_popularity = math.log1p(max(max(row[2] or 0.0, 0.0) for row in rows)) or 1.0
+
+    scored = []
+    for movie_id, relevance, popularity in rows:
+        relevance_score = relevance / max_relevance
+        popularity_score = math.log1p(max(popularity or 0.0, 0.0)) / max_popularity
+        score = (1 - popularity_weight) * relevance_score + popularity_weight * popularity_score
+        scored.append((movie_id, score))
+
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [movie_id for movie_id, score in scored[:limit]]
+
+
+def rank_expression(movie_ids):
+    """Position of each id in movie_ids, usable for ordering or keyset pagination"""
+    return Case(
+        *[When(id=movie_id, then=position) for position, movie_id in enumerate(movie_ids)],
+        output_field=IntegerField()
+    )
+
+
+def order_by_ids(queryset, movie_ids):
+    """Filter a queryset to the given ids and keep their order"""
+    return queryset.filter(id__in=movie_ids).order_by(rank_expression(movie_ids))
+
+
+def search_movies(query, limit=20):
+    """
+    Ranked Movie instances for a query, or None when no full-text index is available
+    """
+    movie_ids = search_movie_ids(query, limit)
+    if movie_ids is None:
+        return None
+    movies = Movie.objects.in_bulk(movie_ids)
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
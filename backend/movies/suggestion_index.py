@@ -0,0 +1,153 @@
+"""
+In-memory prefix index for search-as-you-type suggestions
+Each prefix of a normalised title (and of each title suffix starting at a word) holds
+its top movies by popularity, so lookups never touch the database
+"""
+from django.conf import settings
+from .models import Genre
+from .title_index import TitleIndex, normalize_text
+from .fuzzy_search import fuzzy_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 8
+# Extra ids kept per node so incremental removals rarely leave a node short
+NODE_CAPACITY = TOP_K * 2
+MAX_PREFIX_LENGTH = 20
+# Memory budget, expressed as a maximum number of prefix nodes
+MAX_NODES = getattr(settings, 'SEARCH_SUGGESTION_MAX_NODES', 300000)
+
+
+def title_keys(title):
+    """Normalised title plus every suffix starting at a word boundary"""
+    words = normalize_text(title).split()
+    return [' '.join(words[index:]) for index in range(len(words))]
+
+
+class SuggestionIndex(TitleIndex):
+    """Index préfixe des titres de films pour l'autocomplétion"""
+
+    def __init__(self, max_nodes=MAX_NODES):
+        self.max_nodes = max_nodes
+        super().__init__()
+
+    def _empty_state(self):
+        return {
+            'nodes': {},           # prefix -> [movie_id, ...] ordered by popularity
+            'movies': {},          # movie_id -> (title, year, poster_path, popularity)
+            'genres': [],          # [(normalised name, genre_id, name)]
+            'budget_reached': False,
+        }
+
+    def _index(self, state, movie):
+        nodes, movies = state['nodes'], state['movies']
+        movie_id = movie['id']
+        release_date = movie['release_date']
+        movies[movie_id] = (
+            movie['title'],
+            release_date.year if release_date else None,
+            movie['poster_path'],
+            movie['popularity'] or 0.0,
+        )
+        for key in title_keys(movie['title']):
+            for length in range(1, min(len(key), MAX_PREFIX_LENGTH) + 1):
+                prefix = key[:length]
+                if prefix not in nodes and len(nodes) >= self.max_nodes:
+                    if not state['budget_reached']:
+                        logger.warning(f"Suggestion index reached its budget of {self.max_nodes} nodes")
+                    state['budget_reached'] = True
+                    continue
+                node = self._mutable(state, 'nodes', prefix, list)
+                if movie_id in node:
+                    node.remove(movie_id)
+                node.append(movie_id)
+                if len(node) > 1:
+                    node.sort(key=lambda mid: movies[mid][3], reverse=True)
+                    del node[NODE_CAPACITY:]
+
+    def _unindex(self, state, movie_id):
+        entry = state['movies'].pop(movie_id, None)
+        if entry is None:
+            return
+        for key in title_keys(entry[0]):
+            for length in range(1, min(len(key), MAX_PREFIX_LENGTH) + 1):
+                prefix = key[:length]
+                if movie_id in state['nodes'].get(prefix, ()):
+                    self._mutable(state, 'nodes', prefix, list).remove(movie_id)
+
+    def _rebuild_extra(self, state):
+        state['genres'] = [
+            (normalize_text(name), genre_id, name)
+            for genre_id, name in Genre.objects.order_by('name').values_list('id', 'name')
+        ]
+
+    # Lecture
+    def movie_ids(self, query, limit=TOP_K):
+        """Top movie ids whose title (or a title suffix) starts with the query"""
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+        state = self._state
+        movie_ids = state['nodes'].get(normalized[:MAX_PREFIX_LENGTH], ())
+        if len(normalized) > MAX_PREFIX_LENGTH:
+            # Nodes stop at MAX_PREFIX_LENGTH, check the rest of the query on the titles
+            movie_ids = [
+                movie_id for movie_id in movie_ids
+                if movie_id in state['movies']
+                and any(key.startswith(normalized) for key in title_keys(state['movies'][movie_id][0]))
+            ]
+        return list(movie_ids[:limit])
+
+    def suggest(self, query, limit=TOP_K, genre_limit=3):
+        """Suggestion payloads in the format expected by static/js/main.js"""
+        self.ensure_fresh()
+        state = self._state
+
+        movie_ids = self.movie_ids(query, limit)
+        if len(movie_ids) < limit:
+            # Complète avec les titres proches (fautes de frappe)
+            for movie_id in fuzzy_index.search_ids(query, limit, prefix=True):
+                if movie_id not in movie_ids:
+                    movie_ids.append(movie_id)
+            movie_ids = movie_ids[:limit]
+
+        suggestions = []
+        for movie_id in movie_ids:
+            entry = state['movies'].get(movie_id)
+            if entry is None:
+                continue
+            title, year, poster_path, popularity = entry
+            suggestions.append({
+                'title': title,
+                'type': 'movie',
+                'year': year,
+                'poster_url': f"https://image.tmdb.org/t/p/w92{poster_path}" if poster_path else None,
+                'url': f"/movies/{movie_id}/"
+            })
+
+        normalized = normalize_text(query)
+        if len(normalized) >= 3:
+            genres = [genre for genre in state['genres'] if normalized in genre[0]][:genre_limit]
+            for normalized_name, genre_id, name in genres:
+                suggestions.append({
+                    'title': name,
+                    'type': 'genre',
+                    'url': f"/movies/genre/{genre_id}/"
+                })
+
+        return suggestions
+
+    def stats(self):
+        state = self._state
+        return {
+            'movies': len(state['movies']),
+            'nodes': len(state['nodes']),
+            'max_nodes': self.max_nodes,
+            'budget_reached': state['budget_reached'],
+            'watermark': self._watermark.isoformat() if self._watermark else None,
+        }
+
+
+# Instance par processus
+suggestion_index = SuggestionIndex()
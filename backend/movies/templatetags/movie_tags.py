@@ -1,5 +1,8 @@
 from django import template
 
+from movies.card_cache import movie_cards as cached_movie_cards
+from movies.tmdb_ingestion import sign_tmdb_id
+
 register = template.Library()
 
 @register.filter
@@ -22,3 +25,14 @@ def is_iterable(obj):
         return not isinstance(obj, (str, bytes))
     except TypeError:
         return False
+
+@register.simple_tag
+def movie_cards(movies):
+    """(movie, card HTML) pairs, cards read from the per-movie cache in one round trip"""
+    movies = list(movies)
+    return list(zip(movies, cached_movie_cards(movies)))
+
+@register.filter
+def tmdb_link_token(tmdb_id):
+    """Signed token of a TMDb search result for the movies:movie_detail_tmdb link"""
+    return sign_tmdb_id(tmdb_id)
@@ -1,3 +1,736 @@
-from django.test import TestCase
+from concurrent.futures import Future
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .fuzzy_search import FuzzyTitleIndex
+from .json_stream import CHUNK_BYTES
+from .keyset import decode_cursor, encode_cursor, paginate_queryset
+from .models import (
+    Genre, Movie, Review, SyncCheckpoint, UserCohort, UserPreference, UserStats, Watchlist,
+)
+from .movie_summary import MovieSummary
+from .ranked_list import RankedList, _refill, ranked_list_key
+from .rating_aggregates import rebuild_rating_aggregates
+from .recommendation_engine import get_content_based_recommendations
+from .search_index import ensure_search_index, search_movie_ids
+from .suggestion_index import SuggestionIndex
+from .tmdb_http_cache import HTTPCache
+from .tmdb_ingestion import sign_tmdb_id
+from .tmdb_rate_limiter import TokenBucket
+from .tmdb_service import TMDbService, tmdb_service
+from .user_cohorts import CLUSTERING_AVAILABLE, build_user_cohorts
+from .user_stats import STATS_FIELDS, rebuild_user_stats, user_stats_for
+
+
+def setUpModule():
+    # Les migrations de l'app movies ne sont pas versionnées : crée les tables manquantes
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in apps.get_app_config('movies').get_models():
+            if model._meta.db_table not in existing:
+                editor.create_model(model)
+
+
+class ImmediateExecutor:
+    """Runs submitted Neo4j calls inline so tests can assert on them"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MovieDetailViewQueryTests(TestCase):
+    """The detail page runs a constant number of queries, whatever the number of reviews"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='secret')
+        cls.movie = Movie.objects.create(title='Heat', tmdb_id=949)
+        cls.movie.genres.add(
+            Genre.objects.create(tmdb_id=28, name='Action'),
+            Genre.objects.create(tmdb_id=80, name='Crime'),
+        )
+        reviewers = User.objects.bulk_create([User(username=f'reviewer{i}') for i in range(25)])
+        Review.objects.bulk_create([
+            Review(user=reviewer, movie=cls.movie, rating=i % 5 + 1) for i, reviewer in enumerate(reviewers)
+        ])
+        # bulk_create ne déclenche pas les signaux : agrégats recalculés
+        rebuild_rating_aggregates([cls.movie.pk])
+        Review.objects.create(user=cls.user, movie=cls.movie, rating=4, comment='Great')
+        Watchlist.objects.create(user=cls.user, movie=cls.movie)
+        cls.movie.refresh_from_db()
+
+    def setUp(self):
+        self.neo4j_service = mock.Mock()
+        self.neo4j_service.get_similar_movies.return_value = []
+        self.neo4j_engine = mock.Mock()
+        for target, value in (
+            ('movies.views.neo4j_movie_service', self.neo4j_service),
+            ('movies.views.neo4j_engine', self.neo4j_engine),
+            ('movies.neo4j_movie_service.neo4j_movie_service', self.neo4j_service),
+            ('movies.views.neo4j_executor', ImmediateExecutor()),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.url = reverse('movies:movie_detail', args=[self.movie.pk])
+
+    def test_anonymous_query_budget(self):
+        # film, genres, page d'avis (compteur et moyenne lus sur le film)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['reviews_count'], 26)
+        self.assertAlmostEqual(response.context['average_rating'], (75 + 4) / 26)
+        self.assertEqual(len(response.context['reviews']), 10)
+        self.neo4j_service.get_similar_movies.assert_called_once_with(self.movie.pk, 6)
+        self.neo4j_engine.record_user_interaction.assert_not_called()
+
+    def test_cached_page_served_to_logged_in_users(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        # session et utilisateur seulement : la page vient du cache
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(response.cookies['movierec_auth'].value, '1')
+
+    def test_review_change_invalidates_cached_page(self):
+        self.client.get(self.url)
+        Review.objects.filter(user=self.user).update(comment='Changed')
+        Review.objects.get(user=self.user).save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Changed')
+
+    def test_page_state_query_budget(self):
+        self.client.force_login(self.user)
+        other = Movie.objects.create(title='Ronin', tmdb_id=8195)
+        # session, utilisateur, puis un seul SELECT pour watchlist et avis
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('movies:api_page_state'),
+                {'movies': f'{self.movie.pk},{other.pk}'}
+            )
+
+        state = response.json()
+        self.assertTrue(state['authenticated'])
+        self.assertEqual(state['movies'][str(self.movie.pk)]['review']['rating'], 4)
+        self.assertTrue(state['movies'][str(self.movie.pk)]['in_watchlist'])
+        self.assertEqual(state['movies'][str(other.pk)], {'in_watchlist': False, 'review': None})
+        self.neo4j_engine.record_user_interaction.assert_not_called()
+
+    def test_record_view_requires_csrf_post(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        url = reverse('movies:api_record_view', args=[self.movie.pk])
+        self.assertEqual(client.get(url).status_code, 405)
+        self.assertEqual(client.post(url).status_code, 403)
+        self.neo4j_engine.record_user_interaction.assert_not_called()
+
+        client.get(reverse('movies:movie_detail', args=[self.movie.pk]))
+        response = client.post(url, HTTP_X_CSRFTOKEN=client.cookies['csrftoken'].value)
+        self.assertEqual(response.json(), {'success': True})
+        self.neo4j_engine.record_user_interaction.assert_called_once_with(self.user.id, self.movie.pk, 'view')
+
+    def test_page_state_anonymous(self):
+        response = self.client.get(reverse('movies:api_page_state'), {'movies': self.movie.pk})
+        self.assertEqual(response.json(), {'authenticated': False})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ConditionalGetTests(TestCase):
+    """Validators are checked before the view: a matching ETag costs one lookup and no body"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(title='Heat', tmdb_id=949)
+
+    def test_movie_detail_not_modified(self):
+        url = reverse('movies:api_movie_detail', args=[self.movie.pk])
+        etag = self.client.get(url)['ETag']
+
+        # updated_at du film uniquement
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.movie.title = 'Heat (1995)'
+        self.movie.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RatingAggregateTests(TestCase):
+    """Review signals keep the movie aggregates equal to a recomputation from the reviews"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(title='Heat', tmdb_id=949)
+        cls.users = User.objects.bulk_create([User(username=f'rater{i}') for i in range(3)])
+
+    def assertAggregates(self, count, total, histogram):
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_count, self.movie.rating_sum), (count, total))
+        self.assertAlmostEqual(self.movie.average_rating, total / count if count else 0)
+        self.assertEqual(self.movie.rating_histogram, {star: histogram.get(star, 0) for star in range(1, 6)})
+        self.assertEqual(rebuild_rating_aggregates([self.movie.pk]), 0)
+
+    def test_create_update_delete(self):
+        Review.objects.create(user=self.users[0], movie=self.movie, rating=5)
+        Review.objects.create(user=self.users[1], movie=self.movie, rating=2)
+        self.assertAggregates(2, 7, {5: 1, 2: 1})
+
+        Review.objects.update_or_create(user=self.users[1], movie=self.movie, defaults={'rating': 4})
+        self.assertAggregates(2, 9, {5: 1, 4: 1})
+
+        Review.objects.get(user=self.users[0]).delete()
+        self.assertAggregates(1, 4, {4: 1})
+
+    def test_stale_instance_save_keeps_aggregates(self):
+        movie = Movie.objects.get(pk=self.movie.pk)
+        Review.objects.create(user=self.users[2], movie=self.movie, rating=3)
+        movie.title = 'Heat (1995)'
+        movie.save()
+        self.assertAggregates(1, 3, {3: 1})
+
+    def test_rebuild_fixes_bypassed_signals(self):
+        Review.objects.bulk_create([Review(user=user, movie=self.movie, rating=4) for user in self.users])
+        self.assertEqual(rebuild_rating_aggregates(), 1)
+        self.assertAggregates(3, 12, {4: 3})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class UserStatsTests(TestCase):
+    """Signals keep the UserStats row equal to a rebuild from the source tables"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', password='secret')
+        action = Genre.objects.create(tmdb_id=28, name='Action')
+        drama = Genre.objects.create(tmdb_id=18, name='Drama')
+        cls.heat = Movie.objects.create(title='Heat', tmdb_id=949)
+        cls.heat.genres.add(action, drama)
+        cls.ronin = Movie.objects.create(title='Ronin', tmdb_id=8195)
+        cls.ronin.genres.add(action)
+
+    def assertMatchesRebuild(self):
+        stats = UserStats.objects.get(user=self.user)
+        rebuilt = rebuild_user_stats([self.user.pk])[self.user.pk]
+        for field in STATS_FIELDS:
+            self.assertEqual(getattr(stats, field), getattr(rebuilt, field), field)
+        return stats
+
+    def test_signals_update_existing_row(self):
+        user_stats_for(self.user)
+        Review.objects.create(user=self.user, movie=self.heat, rating=5)
+        Review.objects.create(user=self.user, movie=self.ronin, rating=2)
+        Watchlist.objects.create(user=self.user, movie=self.ronin)
+        stats = self.assertMatchesRebuild()
+        self.assertEqual(stats.favorite_genres(), [('Action', 1), ('Drama', 1)])
+
+        Review.objects.update_or_create(user=self.user, movie=self.ronin, defaults={'rating': 4})
+        Review.objects.get(user=self.user, movie=self.heat).delete()
+        stats = self.assertMatchesRebuild()
+        self.assertEqual((stats.review_count, stats.average_rating, stats.watchlist_count), (1, 4, 1))
+        self.assertEqual(stats.favorite_genres(), [('Action', 1)])
+
+    def test_profile_api_reads_one_row(self):
+        Review.objects.create(user=self.user, movie=self.heat, rating=4)
+        self.client.force_login(self.user)
+        self.client.get(reverse('movies:api_user_profile'))
+        # session, utilisateur, ligne UserStats
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('movies:api_user_profile'))
+        self.assertEqual(response.json()['reviews_count'], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StreamingJSONASGITests(TestCase):
+    """Under ASGI the JSON body is streamed chunk by chunk, not buffered by Django"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Genre.objects.bulk_create([Genre(tmdb_id=i, name=f'Genre {i:05d}') for i in range(2000)])
+
+    async def test_streamed_through_asgi_handler(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = await self.async_client.get(reverse('movies:api_genres_list'))
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertFalse([w for w in caught if 'synchronous iterators' in str(w.message)])
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 2 * CHUNK_BYTES for chunk in chunks))
+        self.assertEqual(len(json.loads(b''.join(chunks))['genres']), 2000)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MovieDetailTMDbTests(TestCase):
+    """Only ids signed into search results can trigger an import, and it goes through the queue"""
+
+    def test_unsigned_id_rejected(self):
+        with mock.patch('movies.views.tmdb_service') as service:
+            response = self.client.get('/movies/tmdb/603/')
+        self.assertEqual(response.status_code, 404)
+        service.get_movie_details.assert_not_called()
+
+    def test_signed_id_of_stored_movie_redirects(self):
+        movie = Movie.objects.create(title='Heat', tmdb_id=949)
+        response = self.client.get(reverse('movies:movie_detail_tmdb', args=[sign_tmdb_id(949)]))
+        self.assertRedirects(response, reverse('movies:movie_detail', args=[movie.pk]), fetch_redirect_response=False)
+
+    def test_signed_id_enqueued_not_saved_inline(self):
+        payload = {'id': 603, 'title': 'The Matrix'}
+        with mock.patch('movies.views.tmdb_service') as service, \
+                mock.patch('movies.views.ingestion_queue') as queue:
+            service.get_movie_details.return_value = payload
+            queue.is_pending.return_value = False
+            response = self.client.get(reverse('movies:movie_detail_tmdb', args=[sign_tmdb_id(603)]))
+        self.assertEqual(response.status_code, 202)
+        queue.enqueue.assert_called_once_with([payload])
+        service.save_movie_to_db.assert_not_called()
+        self.assertFalse(Movie.objects.filter(tmdb_id=603).exists())
+
+
+class TMDbStubServerTests(SimpleTestCase):
+    """The fetcher against a local HTTP stub: 429 + Retry-After, then 200"""
+
+    def setUp(self):
+        self.requests = []
+        responses = [(429, {'Retry-After': '1'}, b'{}')]
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                test.requests.append((time.monotonic(), self.path))
+                status, headers, body = responses.pop(0) if responses else (200, {}, b'{"results": []}')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.service = TMDbService(
+            api_key='test',
+            base_url=f'http://127.0.0.1:{self.server.server_port}',
+            rate_limiter=TokenBucket(capacity=2, period=1.0, path=os.path.join(tmp.name, 'bucket.json')),
+            http_cache=HTTPCache(directory=os.path.join(tmp.name, 'http')),
+            max_workers=2,
+        )
+
+    def test_retry_after_pause_and_pacing(self):
+        self.assertEqual(self.service.get('movie/popular', {'page': 1}), {'results': []})
+
+        # Le 429 est retenté une fois, après le délai Retry-After
+        (first, path), (second, retried_path) = self.requests
+        self.assertEqual(path, retried_path)
+        self.assertGreaterEqual(second - first, 0.9)
+
+        # Le seau est vidé par la pause : les requêtes suivantes sont espacées de 1/rate (0,5 s)
+        for page in (2, 3):
+            self.service.get('movie/popular', {'page': page})
+        times = [at for at, _ in self.requests[1:]]
+        for earlier, later in zip(times, times[1:]):
+            self.assertGreaterEqual(later - earlier, 0.4)
+
+
+class AsyncNeo4jReconnectTests(SimpleTestCase):
+    """A failed async connect is retried by run_query once the retry interval has passed"""
+
+    def test_reconnects_after_retry_interval(self):
+        from movie_recommender import neo4j_connection
+
+        async def records():
+            yield {'ok': 1}
+
+        session = mock.MagicMock()
+        session.__aenter__.return_value.run = mock.AsyncMock(return_value=records())
+        driver = mock.MagicMock(session=mock.MagicMock(return_value=session))
+        driver.verify_connectivity = mock.AsyncMock(side_effect=[OSError('DNS'), None])
+        driver.close = mock.AsyncMock()
+
+        env = {'NEO4J_URI': 'neo4j://stub', 'NEO4J_USERNAME': 'neo4j', 'NEO4J_PASSWORD': 'secret'}
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(neo4j_connection, '_async_retry_after', 0.0), \
+                mock.patch.object(neo4j_connection.AsyncGraphDatabase, 'driver', return_value=driver):
+            async def scenario():
+                connection = neo4j_connection.AsyncNeo4jConnection()
+                failed = await connection.run_query('RETURN 1 AS ok')
+                # Pendant le délai : aucune nouvelle tentative
+                blocked = await connection.run_query('RETURN 1 AS ok')
+                neo4j_connection._async_retry_after = time.monotonic() - 1
+                return failed, blocked, await connection.run_query('RETURN 1 AS ok')
+
+            failed, blocked, result = asyncio.run(scenario())
+
+        self.assertEqual((failed, blocked), ([], []))
+        self.assertEqual(driver.verify_connectivity.await_count, 2)
+        self.assertEqual(result, [{'ok': 1}])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RankedListRefillTests(TestCase):
+    """A background refill never replaces a longer list stored while the engine was running"""
+
+    def test_refill_merges_with_longer_list_stored_meanwhile(self):
+        key = ranked_list_key(1, 'smart', 1)
+        cache.set(key, RankedList(range(1, 4), [1.0] * 3).to_cache())
+        longer = RankedList(range(1, 9), [1.0] * 8)
+
+        def recommendations(user_id, limit, recommendation_type):
+            # ranked_page a calculé une liste plus longue pendant le remplissage
+            cache.set(key, longer.to_cache())
+            return [MovieSummary(movie_id=movie_id, score=1.0) for movie_id in (1, 2, 3, 4, 5, 9)]
+
+        engine = mock.Mock(get_recommendations_for_user=recommendations)
+        _refill(engine, 1, 'smart', key)
+
+        stored = RankedList.from_cache(cache.get(key))
+        self.assertEqual(stored.ids.tolist(), [1, 2, 3, 4, 5, 6, 7, 8, 9])
+
+
+class TitleIndexRefreshTests(TestCase):
+    """A refresh publishes a new state, copying only the containers of the changed titles"""
+
+    def test_fuzzy_refresh_copies_on_write(self):
+        Movie.objects.create(title='Heat', tmdb_id=949, popularity=5)
+        Movie.objects.create(title='Ronin', tmdb_id=8195, popularity=3)
+        index = FuzzyTitleIndex()
+        index.rebuild()
+        published = index._state
+        heat_posting = published['postings']['heat']
+
+        Movie.objects.create(title='Heat Wave', tmdb_id=1, popularity=1)
+        index.refresh()
+
+        self.assertEqual(published['postings']['heat'], heat_posting)
+        self.assertNotIn('wave', published['postings'])
+        self.assertIs(index._state['postings']['ronin'], published['postings']['ronin'])
+        self.assertIsNot(index._state['postings']['heat'], heat_posting)
+        self.assertEqual(len(index._state['postings']['heat']), 2)
+        self.assertEqual(len(index.search_ids('wavr')), 1)
+
+    def test_suggestion_refresh_copies_on_write(self):
+        heat = Movie.objects.create(title='Heat', tmdb_id=949, popularity=5)
+        Movie.objects.create(title='Ronin', tmdb_id=8195, popularity=3)
+        index = SuggestionIndex()
+        index.rebuild()
+        published = index._state
+        heat_node = published['nodes']['heat']
+
+        Movie.objects.create(title='Heathers', tmdb_id=2640, popularity=9)
+        index.refresh()
+
+        self.assertEqual(published['nodes']['heat'], [heat.pk])
+        self.assertIs(published['nodes']['heat'], heat_node)
+        self.assertIs(index._state['nodes']['ron'], published['nodes']['ron'])
+        self.assertEqual(len(index._state['nodes']['heat']), 2)
+        self.assertEqual(index.movie_ids('heath'), [Movie.objects.get(tmdb_id=2640).pk])
+
+
+class SaveMoviesBulkTests(TestCase):
+    """save_movies_bulk upserts on tmdb_id, grouped by field set, and rewrites genre links"""
+
+    def details(self, title, genres, director):
+        return {
+            'id': 949, 'title': title, 'release_date': '1995-12-15', 'vote_average': 7.9,
+            'genres': genres,
+            'credits': {'cast': [{'name': 'Al Pacino', 'order': 0}],
+                        'crew': [{'name': director, 'job': 'Director'}]},
+        }
+
+    def test_upsert_twice_updates_row_genres_and_updated_at(self):
+        action, crime = {'id': 28, 'name': 'Action'}, {'id': 80, 'name': 'Crime'}
+        with mock.patch('movies.tmdb_service.sync_movies') as sync, \
+                self.captureOnCommitCallbacks(execute=True):
+            first_ids = tmdb_service.save_movies_bulk([self.details('Heat', [action, crime], 'Michael Mann')])
+        sync.assert_called_once_with(first_ids, batch_size=500)
+        movie = Movie.objects.get(tmdb_id=949)
+        first_updated_at = movie.updated_at
+        self.assertEqual(sorted(movie.genres.values_list('name', flat=True)), ['Action', 'Crime'])
+
+        # Même film en payload de liste (sans credits) et un autre en détails : deux groupes de champs
+        drama = Genre.objects.create(tmdb_id=18, name='Drama')
+        list_payload = {'id': 949, 'title': 'Heat (1995)', 'vote_average': 8.3, 'genre_ids': [18]}
+        other = dict(self.details('Ronin', [action], 'John Frankenheimer'), id=8195)
+        with mock.patch('movies.tmdb_service.sync_movies'), self.captureOnCommitCallbacks(execute=True):
+            second_ids = tmdb_service.save_movies_bulk([list_payload, other])
+
+        movie.refresh_from_db()
+        self.assertEqual(second_ids.count(movie.pk), 1)
+        self.assertEqual(Movie.objects.count(), 2)
+        self.assertEqual((movie.title, movie.vote_average), ('Heat (1995)', 8.3))
+        self.assertEqual(movie.director, 'Michael Mann')   # enrichissement conservé
+        self.assertEqual(list(movie.genres.all()), [drama])
+        self.assertGreater(movie.updated_at, first_updated_at)
+        self.assertEqual(Movie.objects.get(tmdb_id=8195).director, 'John Frankenheimer')
+
+
+class SyncTMDbChangesTests(TestCase):
+    """sync_tmdb_changes: failed fetches are retried, the watermark moves only once a window is saved"""
+
+    def setUp(self):
+        for tmdb_id in (1, 2, 3):
+            Movie.objects.create(title=f'Movie {tmdb_id}', tmdb_id=tmdb_id)
+        self.today = date.today()
+        self.checkpoint = SyncCheckpoint.objects.create(
+            name='tmdb_changes', value={'watermark': (self.today - timedelta(days=20)).isoformat()}
+        )
+        patcher = mock.patch('movies.management.commands.sync_tmdb_changes.tmdb_service')
+        self.service = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.failing = set()
+        self.service.fetch_movie_details.side_effect = self.fetch
+        self.service.save_movies_bulk.side_effect = lambda details: [movie['id'] for movie in details]
+
+    def fetch(self, tmdb_ids, refresh=False):
+        if 'crash' in self.failing and self.service.fetch_movie_details.call_count > 1:
+            raise RuntimeError('TMDb down')
+        ok = [tmdb_id for tmdb_id in tmdb_ids if tmdb_id not in self.failing]
+        return {tmdb_id: {'id': tmdb_id} for tmdb_id in ok}, [t for t in tmdb_ids if t in self.failing], []
+
+    def run_command(self, *args):
+        call_command('sync_tmdb_changes', *args, stdout=io.StringIO())
+        self.checkpoint.refresh_from_db()
+        return self.checkpoint.value
+
+    def test_failed_fetch_kept_and_retried_next_run(self):
+        # Deux fenêtres : 14 jours puis 6
+        self.service.get_changed_movie_ids.side_effect = [[1, 2, 99], [3]]
+        self.failing = {2}
+        value = self.run_command()
+        self.assertEqual(value, {'watermark': self.today.isoformat(), 'retry': [2]})
+
+        self.failing = set()
+        self.service.fetch_movie_details.reset_mock()
+        value = self.run_command()
+        self.service.fetch_movie_details.assert_called_once_with([2], refresh=True)
+        self.assertEqual(value['retry'], [])
+        self.assertEqual(value['watermark'], self.today.isoformat())
+
+    def test_watermark_advances_after_last_batch_only(self):
+        start = (self.today - timedelta(days=5)).isoformat()
+        self.checkpoint.value = {'watermark': start}
+        self.checkpoint.save()
+        self.service.get_changed_movie_ids.return_value = [1, 2]
+        self.failing = {'crash'}
+
+        with self.assertRaises(RuntimeError):
+            self.run_command('--batch-size', '1')
+        self.checkpoint.refresh_from_db()
+        # Le premier lot est enregistré, sans avancer le watermark
+        self.assertEqual(self.checkpoint.value, {'watermark': start, 'retry': []})
+        self.service.save_movies_bulk.assert_called_once()
+
+        self.failing = set()
+        self.assertEqual(self.run_command('--batch-size', '1')['watermark'], self.today.isoformat())
+
+    def test_changes_unavailable_keeps_watermark(self):
+        self.service.get_changed_movie_ids.return_value = None
+        with self.assertRaises(CommandError):
+            self.run_command()
+        self.checkpoint.refresh_from_db()
+        self.assertEqual(self.checkpoint.value, {'watermark': (self.today - timedelta(days=20)).isoformat()})
+        self.service.save_movies_bulk.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class KeysetPaginationTests(TestCase):
+    """Cursor pagination of the catalogue listing on (sort value, id)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Cinq films à égalité de popularité, deux autres au-dessus
+        cls.tied = [Movie.objects.create(title=f'Tie {n}', tmdb_id=100 + n, popularity=5.0) for n in range(5)]
+        cls.top = [Movie.objects.create(title=f'Top {n}', tmdb_id=200 + n, popularity=9.0 - n) for n in range(2)]
+
+    def walk(self, sort, per_page=2):
+        pages, cursor = [], None
+        while True:
+            page = paginate_queryset(Movie.objects.all(), sort, cursor, per_page)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_cursor_round_trip(self):
+        for value in (5.0, 'Heat', '1995-12-15', None):
+            self.assertEqual(decode_cursor(encode_cursor(value, 42)), (value, 42, False))
+        self.assertEqual(decode_cursor(encode_cursor(date(1995, 12, 15), 7, backwards=True)), ('1995-12-15', 7, True))
+
+    def test_ties_broken_on_id_forward_and_backward(self):
+        pages = self.walk('-popularity')
+        ids = [movie.pk for page in pages for movie in page]
+        expected = [movie.pk for movie in self.top] + sorted((movie.pk for movie in self.tied), reverse=True)
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 4)
+
+        # En reculant depuis la dernière page on retrouve exactement les pages précédentes
+        page = pages[-1]
+        for expected_page in reversed(pages[:-1]):
+            page = paginate_queryset(Movie.objects.all(), '-popularity', page.previous_cursor, 2)
+            self.assertEqual([movie.pk for movie in page], [movie.pk for movie in expected_page])
+        self.assertFalse(page.has_previous)
+
+    def test_missing_release_dates_are_paged(self):
+        Movie.objects.filter(pk=self.top[0].pk).update(release_date=date(1995, 12, 15))
+        ids = [movie.pk for page in self.walk('-release_date', per_page=3) for movie in page]
+        self.assertEqual(ids[0], self.top[0].pk)
+        self.assertEqual(sorted(ids), sorted(Movie.objects.values_list('pk', flat=True)))
+
+    def test_malformed_cursor_serves_first_page(self):
+        for cursor in ('garbage!', 'bm90IGpzb24', 'WzEsMl0'):   # pas du base64, pas du JSON, 2 valeurs
+            self.assertIsNone(decode_cursor(cursor))
+
+        # Curseur d'un autre tri (titre sur un tri par date) : première page
+        first = [movie.pk for movie in paginate_queryset(Movie.objects.all(), '-release_date', None, 2)]
+        page = paginate_queryset(Movie.objects.all(), '-release_date', encode_cursor('Heat', 1), 2)
+        self.assertEqual([movie.pk for movie in page], first)
+        self.assertFalse(page.has_previous)
+
+        response = self.client.get(reverse('movies:movie_list'), {'cursor': 'garbage!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 7)
+        self.assertFalse(response.context['page'].has_previous)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FullTextSearchTests(TestCase):
+    """FTS5 ranking: title matches first, popularity as a tie-breaker, prefixes and accents"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Les tables sont créées après post_migrate : index et triggers créés ici
+        ensure_search_index()
+        cls.heat = Movie.objects.create(title='Heat', tmdb_id=949, popularity=20.0,
+                                        overview='A group of professional bank robbers.')
+        cls.overview_only = Movie.objects.create(title='Collateral', tmdb_id=1538, popularity=90.0,
+                                                 overview='A cab driver feels the heat of one night in Los Angeles.')
+        cls.amelie = Movie.objects.create(title='Le Fabuleux Destin d’Amélie Poulain', tmdb_id=194, popularity=30.0)
+        Movie.objects.create(title='Ronin', tmdb_id=8195, popularity=50.0, overview='Mercenaries in France.')
+
+    def test_title_match_outranks_more_popular_overview_match(self):
+        self.assertEqual(search_movie_ids('heat'), [self.heat.pk, self.overview_only.pk])
+
+    def test_popularity_breaks_equal_relevance(self):
+        twin = Movie.objects.create(title='Heat', tmdb_id=8487, popularity=80.0,
+                                    overview='A group of professional bank robbers.')
+        self.assertEqual(search_movie_ids('heat')[:2], [twin.pk, self.heat.pk])
+
+    def test_prefix_and_accent_insensitive(self):
+        self.assertEqual(search_movie_ids('hea'), [self.heat.pk, self.overview_only.pk])
+        self.assertEqual(search_movie_ids('amelie'), [self.amelie.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        Movie.objects.filter(pk=self.heat.pk).update(title='Chaleur')
+        self.assertEqual(search_movie_ids('chaleur'), [self.heat.pk])
+        self.overview_only.delete()
+        self.assertEqual(search_movie_ids('night'), [])
+
+    def test_movie_list_keeps_relevance_order(self):
+        response = self.client.get(reverse('movies:movie_list'), {'search': 'heat'})
+        self.assertEqual([movie.pk for movie in response.context['page']], [self.heat.pk, self.overview_only.pk])
+
+
+@skipUnless(CLUSTERING_AVAILABLE, 'numpy and scikit-learn are required')
+class UserCohortTests(TestCase):
+    """Cohorts group users of similar taste and restrict content-based candidates to the cohort pool"""
+
+    @classmethod
+    def setUpTestData(cls):
+        action = Genre.objects.create(tmdb_id=28, name='Action')
+        drama = Genre.objects.create(tmdb_id=18, name='Drama')
+        cls.action_movies, cls.drama_movies = [], []
+        for n in range(4):
+            movie = Movie.objects.create(title=f'Action {n}', tmdb_id=100 + n, vote_average=7.0)
+            movie.genres.add(action)
+            cls.action_movies.append(movie)
+            movie = Movie.objects.create(title=f'Drama {n}', tmdb_id=200 + n, vote_average=7.0)
+            movie.genres.add(drama)
+            cls.drama_movies.append(movie)
+
+        # Deux amateurs d'action, deux de drames ; chacun a noté les deux premiers films de chaque genre
+        cls.users = {}
+        for name, liked in (('ana', 'action'), ('alex', 'action'), ('dora', 'drama'), ('dan', 'drama')):
+            user = cls.users[name] = User.objects.create_user(name)
+            for movie in cls.action_movies[:2] + cls.drama_movies[:2]:
+                rating = 5 if movie.title.lower().startswith(liked) else 1
+                Review.objects.create(user=user, movie=movie, rating=rating)
+
+    def cohort_of(self, name):
+        return UserPreference.objects.get(user=self.users[name]).cohort_id
+
+    def test_cohorts_and_candidate_pools_built(self):
+        call_command('build_user_cohorts', '--clusters', '2', '--candidates', '3', '--random-state', '0',
+                     stdout=io.StringIO())
+
+        self.assertEqual(UserCohort.objects.count(), 2)
+        self.assertEqual(self.cohort_of('ana'), self.cohort_of('alex'))
+        self.assertEqual(self.cohort_of('dora'), self.cohort_of('dan'))
+        self.assertNotEqual(self.cohort_of('ana'), self.cohort_of('dora'))
+
+        action_cohort = UserCohort.objects.get(cohort_id=self.cohort_of('ana'))
+        self.assertEqual(action_cohort.size, 2)
+        self.assertEqual(len(action_cohort.candidate_movie_ids), 3)
+        action_ids = {movie.pk for movie in self.action_movies}
+        self.assertTrue(set(action_cohort.candidate_movie_ids[:2]) <= action_ids)
+
+        # Même graine, mêmes cohortes
+        before = {name: self.cohort_of(name) for name in self.users}
+        build_user_cohorts(n_clusters=2, candidates_per_cohort=3, random_state=0)
+        self.assertEqual({name: self.cohort_of(name) for name in self.users}, before)
+
+    def test_content_recommendations_use_cohort_pool(self):
+        UserPreference.objects.create(user=self.users['ana'], cohort_id=7)
+        UserCohort.objects.create(cohort_id=7, size=1, candidate_movie_ids=[self.drama_movies[3].pk])
+        recommendations = get_content_based_recommendations(self.users['ana'], limit=10)
+        self.assertEqual(recommendations, [self.drama_movies[3]])
+
+    def test_content_recommendations_fall_back_without_cohort(self):
+        UserPreference.objects.create(user=self.users['ana'], cohort_id=None)
+        recommendations = get_content_based_recommendations(self.users['ana'], limit=10)
+        # Tout le catalogue non noté, l'action d'abord
+        self.assertEqual(set(recommendations[:2]), set(self.action_movies[2:]))
+        self.assertEqual({movie.pk for movie in recommendations},
+                         {movie.pk for movie in self.action_movies[2:] + self.drama_movies[2:]})
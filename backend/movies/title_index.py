@@ -0,0 +1,144 @@
+"""
+Base class for per-process indexes built from movie titles
+Handles the full rebuild, the incremental refresh from Movie.updated_at and the locking
+"""
+from abc import ABC, abstractmethod
+from .models import Movie
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Columns handed to _index() for every movie
+MOVIE_FIELDS = ('id', 'title', 'release_date', 'poster_path', 'popularity', 'updated_at')
+
+
+def normalize_text(text):
+    """Lower-case, strip accents and collapse punctuation/whitespace to single spaces"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+class TitleIndex(ABC):
+    """
+    Subclasses implement _empty_state(), _index(state, movie) and _unindex(state, movie_id).
+    Writers build a new state and swap it in, never mutating the published one, so readers
+    take `state = self._state` once without locking. A refresh works on a shallow copy:
+    _index/_unindex modify nested containers through _mutable(), which copies on write.
+    """
+    # Seconds between two incremental refreshes from Movie.updated_at
+    refresh_interval = 30
+    # Seconds between full rebuilds (catches deletions and drift)
+    rebuild_interval = 3600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._state = self._empty_state()
+        self._watermark = None
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        # (table, key) of the containers already copied by the refresh in progress, None otherwise
+        self._copied = None
+
+    @abstractmethod
+    def _empty_state(self):
+        """A new, empty state"""
+
+    def _copy_state(self, state):
+        """Shallow copy of `state`: its dicts are copied, the containers they hold are shared"""
+        return {name: dict(value) if isinstance(value, dict) else value for name, value in state.items()}
+
+    def _mutable(self, state, table, key, factory):
+        """
+        Container stored under state[table][key] (created with `factory` if missing), safe to
+        modify: during a refresh, a container still shared with the published state is copied first
+        """
+        container = state[table].get(key)
+        if self._copied is None:
+            if container is None:
+                container = state[table][key] = factory()
+            return container
+        if (table, key) not in self._copied:
+            container = state[table][key] = factory() if container is None else type(container)(container)
+            self._copied.add((table, key))
+        return container
+
+    @abstractmethod
+    def _index(self, state, movie):
+        """Add a movie (MOVIE_FIELDS values) to the state"""
+
+    @abstractmethod
+    def _unindex(self, state, movie_id):
+        """Remove a movie from the state"""
+
+    def _rebuild_extra(self, state):
+        """Hook for data that is not derived from movies (e.g. genres)"""
+
+    def _movies(self):
+        # Most popular first, so size budgets keep the movies people look for
+        return Movie.objects.exclude(title='').order_by('-popularity').values(*MOVIE_FIELDS)
+
+    def rebuild(self):
+        state = self._empty_state()
+        watermark = None
+        count = 0
+        for movie in self._movies().iterator(chunk_size=2000):
+            self._index(state, movie)
+            count += 1
+            if movie['updated_at'] and (watermark is None or movie['updated_at'] > watermark):
+                watermark = movie['updated_at']
+        self._rebuild_extra(state)
+
+        with self._lock:
+            self._state = state
+            self._watermark = watermark
+            self._last_refresh = self._last_rebuild = time.monotonic()
+        logger.info(f"{self.__class__.__name__} built: {count} movies")
+
+    def refresh(self):
+        """Re-index movies changed since the last build or refresh"""
+        changed = Movie.objects.all()
+        if self._watermark is not None:
+            changed = changed.filter(updated_at__gt=self._watermark)
+        movies = list(changed.values(*MOVIE_FIELDS))
+
+        with self._lock:
+            if movies:
+                # Les lecteurs ne prennent pas le verrou : modifie une copie puis la publie d'un coup.
+                # Seuls les conteneurs touchés par les films modifiés sont recopiés.
+                state = self._copy_state(self._state)
+                watermark = self._watermark
+                self._copied = set()
+                try:
+                    for movie in movies:
+                        self._unindex(state, movie['id'])
+                        if movie['title']:
+                            self._index(state, movie)
+                        if movie['updated_at'] and (watermark is None or movie['updated_at'] > watermark):
+                            watermark = movie['updated_at']
+                finally:
+                    self._copied = None
+                self._state = state
+                self._watermark = watermark
+            self._last_refresh = time.monotonic()
+
+    def ensure_fresh(self):
+        """Build on first use, then refresh periodically; only one thread does the work"""
+        now = time.monotonic()
+        stale = not self._last_rebuild or now - self._last_rebuild > self.rebuild_interval
+        if not stale and now - self._last_refresh <= self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=not self._last_rebuild):
+            return
+        try:
+            if not self._last_rebuild or time.monotonic() - self._last_rebuild > self.rebuild_interval:
+                self.rebuild()
+            elif time.monotonic() - self._last_refresh > self.refresh_interval:
+                self.refresh()
+        finally:
+            self._refresh_lock.release()
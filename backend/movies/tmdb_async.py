@@ -0,0 +1,83 @@
+"""
+Async TMDb client for the async views
+Runs the request steps of TMDbService (same rate limiter, disk HTTP cache and retry
+policy) on httpx.AsyncClient, so a slow TMDb call waits on the event loop instead of
+holding a worker thread.
+Without httpx the calls fall back to TMDbService in a worker thread.
+"""
+import asyncio
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+
+from .tmdb_service import (
+    tmdb_service, advance_request, ACQUIRE, DONE, REQUEST_TIMEOUT, SLEEP,
+)
+
+try:
+    import httpx
+except ImportError:  # repli : client synchrone dans un thread
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTMDbClient:
+    """Client TMDb asynchrone adossé à un TMDbService (clé, limiteur et cache partagés)"""
+
+    def __init__(self, service=tmdb_service):
+        self.service = service
+        # httpx.AsyncClient est lié à la boucle qui l'a créé : un client par boucle
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=self.service.max_workers * 4)
+            client = self._clients[loop] = httpx.AsyncClient(
+                params={'api_key': self.service.api_key},
+                timeout=REQUEST_TIMEOUT,
+                limits=limits,
+            )
+        return client
+
+    async def _make_request(self, endpoint, params=None, max_age=0, revalidate=False, not_found=None):
+        """
+        Async TMDbService._make_request: same request steps, sent with httpx.
+        The steps touching the disk cache and the limiter file run in a worker thread.
+        """
+        service = self.service
+        if httpx is None:
+            return await sync_to_async(service._make_request, thread_sensitive=False)(
+                endpoint, params, max_age=max_age, revalidate=revalidate, not_found=not_found
+            )
+
+        steps = service._request_steps(endpoint, params, max_age, revalidate, not_found)
+        step = await asyncio.to_thread(advance_request, steps)
+        while step[0] != DONE:
+            result = None
+            if step[0] == ACQUIRE:
+                await service.rate_limiter.aacquire()
+            elif step[0] == SLEEP:
+                await asyncio.sleep(step[1])
+            else:
+                _, url, params, headers = step
+                try:
+                    result = await self._client().get(url, params=params, headers=headers)
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    result = e
+            step = await asyncio.to_thread(advance_request, steps, result)
+        return step[1]
+
+    async def search_movies(self, query, page=1):
+        """Recherche des films"""
+        return await self._make_request('search/movie', {
+            'query': query,
+            'page': page
+        }, max_age=1800)  # 30 minutes
+
+
+# Instance globale du client asynchrone
+async_tmdb_client = AsyncTMDbClient()
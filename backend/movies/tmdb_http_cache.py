@@ -0,0 +1,200 @@
+"""
+On-disk HTTP cache for TMDb responses
+Bodies are stored zlib-compressed and content-addressed (sha256 of the body), request
+entries hold the validators (ETag / Last-Modified) and point at a body. Writes go through
+a temporary file + os.replace so several worker processes can share the directory.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows : éviction non coordonnée entre processus
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'tmdb_http_cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Eviction runs on about one store in EVICTION_SAMPLE, and trims down to this share of the cap
+EVICTION_SAMPLE = 50
+EVICTION_TARGET = 0.9
+
+
+class CachedResponse:
+    """Entry read from the cache"""
+    __slots__ = ('key', 'body', 'etag', 'last_modified', 'expires_at')
+
+    def __init__(self, key, body, etag, last_modified, expires_at):
+        self.key = key
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def is_fresh(self):
+        return time.time() < self.expires_at
+
+    def validators(self):
+        """Headers for a conditional request"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HTTPCache:
+    """Cache disque partagé, plafonné en taille avec éviction LRU"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries_dir = os.path.join(directory, 'entries')
+        self.objects_dir = os.path.join(directory, 'objects')
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    @staticmethod
+    def request_key(url, params=None):
+        canonical = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries_dir, key[:2], f'{key}.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, url, params=None):
+        """Cached entry for a request (fresh or stale), or None"""
+        key = self.request_key(url, params)
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as entry_file:
+                entry = json.load(entry_file)
+            with open(self._object_path(entry['digest']), 'rb') as object_file:
+                body = zlib.decompress(object_file.read())
+        except (OSError, ValueError, KeyError, zlib.error):
+            return None   # absent, évincé entre-temps ou corrompu
+
+        self._touch(entry_path)
+        return CachedResponse(key, body, entry.get('etag'), entry.get('last_modified'), entry.get('expires_at', 0))
+
+    def store(self, url, params, body, etag=None, last_modified=None, max_age=0):
+        """Store a 200 response body with its validators"""
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, zlib.compress(body, 6))
+
+        entry = {
+            'digest': digest,
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires_at': time.time() + max_age,
+        }
+        self._write_atomic(self._entry_path(self.request_key(url, params)), json.dumps(entry).encode('utf-8'))
+
+        if random.randrange(EVICTION_SAMPLE) == 0:
+            self.evict()
+
+    def refresh(self, cached, max_age=0):
+        """Extend an entry after a 304 Not Modified"""
+        entry_path = self._entry_path(cached.key)
+        try:
+            with open(entry_path, 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return
+        entry['expires_at'] = time.time() + max_age
+        self._write_atomic(entry_path, json.dumps(entry).encode('utf-8'))
+
+    def _touch(self, path):
+        # mtime des entrées = dernier accès, utilisé pour l'éviction LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _scan(self, directory):
+        for bucket in os.scandir(directory):
+            if bucket.is_dir():
+                for item in os.scandir(bucket.path):
+                    if not item.name.startswith('.tmp-'):
+                        yield item
+
+    def evict(self):
+        """Drop least recently used entries, then unreferenced bodies, until under the cap"""
+        lock_path = os.path.join(self.directory, '.evict.lock')
+        with open(lock_path, 'a') as lock_file:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return   # un autre processus s'en charge
+            try:
+                objects = {item.name: (item.path, item.stat().st_size) for item in self._scan(self.objects_dir)}
+                total = sum(size for path, size in objects.values())
+                if total <= self.max_bytes:
+                    return
+
+                entries = sorted(
+                    ((item.stat().st_mtime, item.path) for item in self._scan(self.entries_dir)),
+                    reverse=True
+                )
+                # Les entrées les plus récentes sont gardées tant que leurs corps tiennent dans la cible
+                target = self.max_bytes * EVICTION_TARGET
+                kept_digests, kept_size = set(), 0
+                for mtime, path in entries:
+                    try:
+                        with open(path, 'r') as entry_file:
+                            digest = json.load(entry_file)['digest']
+                    except (OSError, ValueError, KeyError):
+                        digest = None
+                    if digest in objects:
+                        size = 0 if digest in kept_digests else objects[digest][1]
+                        if kept_size + size <= target:
+                            kept_digests.add(digest)
+                            kept_size += size
+                            continue
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+                removed = 0
+                for digest, (path, size) in objects.items():
+                    if digest not in kept_digests:
+                        try:
+                            os.remove(path)
+                            removed += size
+                        except OSError:
+                            pass
+                logger.info(f"TMDb HTTP cache evicted {removed} bytes ({total} → {total - removed})")
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
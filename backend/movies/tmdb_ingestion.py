@@ -0,0 +1,111 @@
+"""
+Background ingestion of TMDb payloads
+Requests render TMDb results straight from the API payload and hand persistence
+(and the batched Mongo/Neo4j sync of save_movies_bulk) to this queue
+"""
+from django.core import signing
+from django.core.cache import cache
+from django.db import close_old_connections
+from .tmdb_service import tmdb_service
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# A tmdb_id claimed by a process stays claimed this long if its worker dies mid-save
+INGEST_CLAIM_TIMEOUT = 300
+# Maximum payloads saved by one bulk upsert
+INGEST_BATCH_SIZE = 100
+# Links to not-yet-imported search results carry a signed tmdb_id valid this long
+TMDB_LINK_SALT = 'movies.tmdb_link'
+TMDB_LINK_MAX_AGE = 3600
+
+
+def _claim_key(tmdb_id):
+    return f"tmdb_ingest_{tmdb_id}"
+
+
+def sign_tmdb_id(tmdb_id):
+    """Token for the link of a TMDb search result, so only ids shown in results can be imported"""
+    return signing.dumps(tmdb_id, salt=TMDB_LINK_SALT)
+
+
+def unsign_tmdb_id(token):
+    """tmdb_id carried by a search result token; raises signing.BadSignature if forged or expired"""
+    return signing.loads(token, salt=TMDB_LINK_SALT, max_age=TMDB_LINK_MAX_AGE)
+
+
+class TMDbIngestionQueue:
+    """
+    Per-process queue drained by a daemon thread.
+    A tmdb_id is queued once: in-process via the pending set, across processes via cache.add().
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def enqueue(self, payloads):
+        """Queue TMDb movie payloads for persistence; returns how many were accepted"""
+        accepted = 0
+        for movie_data in payloads:
+            tmdb_id = movie_data.get('id')
+            if tmdb_id is None:
+                continue
+            with self._lock:
+                if tmdb_id in self._pending:
+                    continue
+                if not cache.add(_claim_key(tmdb_id), True, INGEST_CLAIM_TIMEOUT):
+                    continue   # déjà en cours dans un autre processus
+                self._pending.add(tmdb_id)
+            self._queue.put(movie_data)
+            accepted += 1
+
+        if accepted:
+            self._ensure_worker()
+        return accepted
+
+    def is_pending(self, tmdb_id):
+        return tmdb_id in self._pending
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='tmdb-ingestion', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            # Attend un film puis prend tout ce qui est déjà en file, pour un seul upsert groupé
+            batch = [self._queue.get()]
+            while len(batch) < INGEST_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            tmdb_ids = [movie_data['id'] for movie_data in batch]
+            try:
+                close_old_connections()
+                movie_ids = tmdb_service.save_movies_bulk(batch)
+                logger.info(f"{len(movie_ids)} films importés en arrière-plan")
+            except Exception as e:
+                logger.error(f"Background ingestion failed for TMDb movies {tmdb_ids}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.difference_update(tmdb_ids)
+                cache.delete_many([_claim_key(tmdb_id) for tmdb_id in tmdb_ids])
+                close_old_connections()
+                for _ in batch:
+                    self._queue.task_done()
+
+    def join(self):
+        """Block until every queued payload has been processed"""
+        self._queue.join()
+
+
+# Instance par processus
+ingestion_queue = TMDbIngestionQueue()
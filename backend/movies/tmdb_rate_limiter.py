@@ -0,0 +1,100 @@
+"""
+Token bucket shared by every thread and worker process talking to TMDb
+State lives in a small JSON file guarded by an exclusive file lock
+"""
+from contextlib import contextmanager
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou limité au processus
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE = os.path.join(tempfile.gettempdir(), 'tmdb_rate_limit.json')
+
+
+class TokenBucket:
+    """
+    `capacity` requests per `period` seconds, refilled continuously.
+    pause() blocks every holder of the bucket, e.g. after a 429 with Retry-After.
+    """
+
+    def __init__(self, capacity=40, period=10.0, path=DEFAULT_STATE_FILE):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.path = path
+        self._thread_lock = threading.Lock()
+        if fcntl is None:
+            logger.warning("fcntl unavailable, TMDb rate limit is only shared within this process")
+
+    @contextmanager
+    def _state(self):
+        with self._thread_lock:
+            with open(self.path, 'a+') as state_file:
+                if fcntl:
+                    fcntl.flock(state_file, fcntl.LOCK_EX)
+                try:
+                    state_file.seek(0)
+                    try:
+                        state = json.loads(state_file.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    yield state
+                    state_file.seek(0)
+                    state_file.truncate()
+                    state_file.write(json.dumps(state))
+                    state_file.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    def _take(self):
+        """Take a token if possible; returns the number of seconds to wait otherwise"""
+        now = time.time()
+        with self._state() as state:
+            blocked_until = state.get('blocked_until', 0.0)
+            if blocked_until > now:
+                return blocked_until - now
+
+            updated = state.get('updated', now)
+            tokens = min(self.capacity, state.get('tokens', self.capacity) + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            state['tokens'] = tokens
+            state['updated'] = now
+            return wait
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """acquire() for coroutines: the file lock is taken in a thread, the wait does not block the loop"""
+        while True:
+            wait = await asyncio.to_thread(self._take)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop every client for `seconds` and empty the bucket"""
+        now = time.time()
+        with self._state() as state:
+            state['blocked_until'] = max(state.get('blocked_until', 0.0), now + seconds)
+            state['tokens'] = 0.0
+            state['updated'] = state['blocked_until']   # refill restarts when the pause ends
@@ -1,172 +1,383 @@
+import json
 import requests
+import random
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from django.conf import settings
-from django.core.cache import cache
-from .models import Movie, Genre
+from django.db import close_old_connections, transaction
+from requests.adapters import HTTPAdapter
+from .models import Movie, Genre, suppress_movie_sync, sync_movies
+from .tmdb_rate_limiter import TokenBucket, DEFAULT_STATE_FILE
+from .tmdb_http_cache import HTTPCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+REQUEST_TIMEOUT = 10
+# Étapes d'E/S de _request_steps, exécutées par le transport (requests ou httpx)
+ACQUIRE, SEND, SLEEP, DONE = 'acquire', 'send', 'sleep', 'done'
+# Returned by fetch_movie_details' requests for ids TMDb answers 404 for (deleted movies)
+NOT_FOUND = object()
+
+# Sous-ressources récupérées avec les détails d'un film (une seule requête)
+DETAILS_APPEND = ('credits', 'keywords', 'release_dates')
+CAST_LIMIT = 10
+CERTIFICATION_COUNTRIES = ('FR', 'US')
+ENRICHMENT_FIELDS = ('cast', 'director', 'keywords', 'certification')
+
+
+def extract_enrichment(movie_data):
+    """
+    Map the appended credits/keywords/release_dates of a details payload to flat fields:
+    cast (top billed names), director, keywords (names) and certification.
+    Only keys whose sub-resource is present are returned.
+    """
+    enrichment = {}
+    
+    credits = movie_data.get('credits')
+    if isinstance(credits, dict):
+        cast = sorted(credits.get('cast', []), key=lambda member: member.get('order', 0))
+        enrichment['cast'] = [member['name'] for member in cast[:CAST_LIMIT]]
+        enrichment['director'] = next(
+            (member['name'] for member in credits.get('crew', []) if member.get('job') == 'Director'),
+            ''
+        )
+    
+    keywords = movie_data.get('keywords')
+    if isinstance(keywords, dict):  # sous-ressource brute (déjà aplatie dans un payload compact)
+        enrichment['keywords'] = [keyword['name'] for keyword in keywords.get('keywords', [])]
+    
+    release_dates = movie_data.get('release_dates')
+    if isinstance(release_dates, dict):
+        by_country = {entry.get('iso_3166_1'): entry.get('release_dates', [])
+                      for entry in release_dates.get('results', [])}
+        enrichment['certification'] = next(
+            (release['certification']
+             for country in CERTIFICATION_COUNTRIES
+             for release in by_country.get(country, [])
+             if release.get('certification')),
+            ''
+        )
+    
+    return enrichment
+
+
+def movie_enrichment(movie_data):
+    """Enrichment fields of a raw or compacted details payload (empty for list payloads)"""
+    enrichment = {field: movie_data[field] for field in ENRICHMENT_FIELDS if field in movie_data}
+    enrichment.update(extract_enrichment(movie_data))
+    return enrichment
+
+
+def movie_fields(movie_data):
+    """Movie column values for a TMDb payload (list or details)"""
+    release_date = None
+    if movie_data.get('release_date'):
+        try:
+            release_date = datetime.strptime(movie_data['release_date'], '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    
+    return {
+        'title': movie_data.get('title', ''),
+        'original_title': movie_data.get('original_title', ''),
+        'overview': movie_data.get('overview', ''),
+        'release_date': release_date,
+        'runtime': movie_data.get('runtime'),
+        'poster_path': movie_data.get('poster_path', ''),
+        'backdrop_path': movie_data.get('backdrop_path', ''),
+        'vote_average': movie_data.get('vote_average', 0.0),
+        'vote_count': movie_data.get('vote_count', 0),
+        'popularity': movie_data.get('popularity', 0.0),
+        **movie_enrichment(movie_data),
+    }
+
+
+def compact_details(movie_data):
+    """Replace the bulky appended sub-resources by their extracted fields"""
+    compact = {key: value for key, value in movie_data.items() if key not in DETAILS_APPEND}
+    compact.update(extract_enrichment(movie_data))
+    return compact
+
+
+def _retry_after_seconds(value):
+    """Retry-After header as seconds (delta-seconds or HTTP date), None if absent/invalid"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def advance_request(steps, value=None):
+    """Next step of a TMDbService._request_steps generator, (DONE, result) once it returned"""
+    try:
+        return steps.send(value)
+    except StopIteration as stop:
+        return (DONE, stop.value)
+
+
+def _max_age(response, default):
+    """Freshness lifetime: Cache-Control max-age when TMDb sends one, else the caller's default"""
+    match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return int(match.group(1)) if match else default
+
 
 class TMDbService:
     """Service pour interagir avec l'API TMDb"""
     
-    def __init__(self):
-        self.api_key = settings.TMDB_API_KEY
-        self.base_url = settings.TMDB_BASE_URL
+    def __init__(self, api_key=None, base_url=None, rate_limiter=None, max_workers=None, http_cache=None):
+        self.api_key = api_key or settings.TMDB_API_KEY
+        self.base_url = base_url or settings.TMDB_BASE_URL
         self.image_base_url = settings.TMDB_SETTINGS.get('image_base_url', 'https://image.tmdb.org/t/p/w500')
         self.rate_limit = settings.TMDB_SETTINGS.get('rate_limit', 40)
+        self.max_workers = max_workers or settings.TMDB_SETTINGS.get('max_workers', 8)
+        
+        # Pool de connexions dimensionné pour les workers concurrents
         self.session = requests.Session()
         self.session.params.update({'api_key': self.api_key})
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Rate limiting partagé entre threads et processus (40 requêtes / 10 s par défaut)
+        self.rate_limiter = rate_limiter or TokenBucket(
+            capacity=self.rate_limit,
+            period=10.0,
+            path=settings.TMDB_SETTINGS.get('rate_limit_file', DEFAULT_STATE_FILE)
+        )
         
-        # Rate limiting
-        self.last_request_time = 0
-        self.request_count = 0
+        # Cache HTTP disque partagé (remplace le cache Django, qui passe par la base sans Redis)
+        self.http_cache = http_cache
+        if self.http_cache is None and settings.TMDB_SETTINGS.get('http_cache', True):
+            try:
+                self.http_cache = HTTPCache(
+                    directory=settings.TMDB_SETTINGS.get('http_cache_dir', DEFAULT_CACHE_DIR),
+                    max_bytes=settings.TMDB_SETTINGS.get('http_cache_max_bytes', DEFAULT_MAX_BYTES)
+                )
+            except OSError as e:
+                logger.warning(f"TMDb HTTP cache disabled: {e}")
     
-    def _rate_limit(self):
-        """Implémente le rate limiting"""
-        current_time = time.time()
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    
+    def _request_steps(self, endpoint, params=None, max_age=0, revalidate=False, not_found=None):
+        """
+        Logique d'une requête TMDb, commune aux transports synchrone et asynchrone :
+        cache HTTP disque, reprises avec backoff, 429/Retry-After, 304 et 404.
+        Generator driven by advance_request(): yields the I/O steps (ACQUIRE,), (SEND, url,
+        params, headers) and (SLEEP, seconds), receives the response (or the transport
+        exception) of each SEND, and returns `not_found` for a 404, None for other failures.
+        """
+        url = f"{self.base_url}/{endpoint}"
         
-        # Reset counter every 10 seconds
-        if current_time - self.last_request_time > 10:
-            self.request_count = 0
-            self.last_request_time = current_time
+        cached = self.http_cache.get(url, params) if self.http_cache is not None else None
+        if cached is not None and cached.is_fresh and not revalidate:
+            return cached.json()
+        headers = cached.validators() if cached is not None else {}
         
-        # Wait if we've hit the rate limit
-        if self.request_count >= self.rate_limit:
-            sleep_time = 10 - (current_time - self.last_request_time)
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-            self.request_count = 0
-            self.last_request_time = time.time()
+        for attempt in range(MAX_RETRIES + 1):
+            yield (ACQUIRE,)
+            
+            response = yield (SEND, url, params, headers)
+            if isinstance(response, Exception):
+                logger.warning(f"Requête TMDb échouée ({response}), tentative {attempt + 1}")
+                yield (SLEEP, self._backoff(attempt))
+                continue
+            
+            if response.status_code == 304 and cached is not None:
+                self.http_cache.refresh(cached, _max_age(response, max_age))
+                return cached.json()
+            
+            if response.status_code == 429:
+                # Trop de requêtes : tous les clients attendent le délai demandé
+                delay = _retry_after_seconds(response.headers.get('Retry-After'))
+                self.rate_limiter.pause(delay if delay is not None else self._backoff(attempt))
+                continue
+            
+            if response.status_code >= 500:
+                yield (SLEEP, self._backoff(attempt))
+                continue
+            
+            if response.status_code == 404:
+                return not_found
+            
+            if response.status_code >= 400:
+                logger.error(f"Erreur lors de la requête TMDb: {endpoint} HTTP {response.status_code}")
+                return None
+            try:
+                data = json.loads(response.content)
+            except ValueError as e:
+                logger.error(f"Erreur lors de la requête TMDb: {e}")
+                return None
+            
+            if self.http_cache is not None:
+                try:
+                    self.http_cache.store(
+                        url, params, response.content,
+                        etag=response.headers.get('ETag'),
+                        last_modified=response.headers.get('Last-Modified'),
+                        max_age=_max_age(response, max_age)
+                    )
+                except OSError as e:
+                    logger.warning(f"TMDb HTTP cache write failed: {e}")
+            return data
         
-        self.request_count += 1
+        logger.error(f"Erreur lors de la requête TMDb: {endpoint} abandonné après {MAX_RETRIES + 1} tentatives")
+        return None
+    
+    def _make_request(self, endpoint, params=None, max_age=0, revalidate=False, not_found=None):
+        """
+        Effectue une requête vers l'API TMDb avec rate limiting et reprises (transport requests).
+        Les réponses passent par le cache HTTP disque : servies sans requête tant qu'elles
+        ont moins de max_age secondes (sauf revalidate=True), puis revalidées (304).
+        Returns `not_found` when TMDb answers 404 and None for every other failure.
+        """
+        steps = self._request_steps(endpoint, params, max_age, revalidate, not_found)
+        step = advance_request(steps)
+        while step[0] != DONE:
+            result = None
+            if step[0] == ACQUIRE:
+                self.rate_limiter.acquire()
+            elif step[0] == SLEEP:
+                time.sleep(step[1])
+            else:
+                _, url, params, headers = step
+                try:
+                    result = self.session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    result = e
+            step = advance_request(steps, result)
+        return step[1]
     
-    def _make_request(self, endpoint, params=None):
-        """Effectue une requête vers l'API TMDb avec rate limiting"""
-        self._rate_limit()
+    def get(self, endpoint, params=None):
+        """Requête TMDb sans cache"""
+        return self._make_request(endpoint, params)
+    
+    def map_concurrent(self, func, items, max_workers=None):
+        """Apply func to every item on a thread pool, results in input order"""
+        def run(item):
+            try:
+                return func(item)
+            except Exception as e:
+                logger.error(f"Erreur TMDb pour {item}: {e}")
+                return None
+            finally:
+                close_old_connections()
         
-        url = f"{self.base_url}/{endpoint}"
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers or self.max_workers, len(items))) as executor:
+            return list(executor.map(run, items))
+    
+    def fetch_pages(self, endpoint, pages, params=None):
+        """Fetch several pages of a listing endpoint concurrently"""
+        return self.map_concurrent(
+            lambda page: self._make_request(endpoint, {**(params or {}), 'page': page}),
+            pages
+        )
+    
+    def get_movie_details_many(self, tmdb_ids, refresh=False):
+        """Movie details for several ids, fetched concurrently; {tmdb_id: data}"""
+        return self.fetch_movie_details(tmdb_ids, refresh=refresh)[0]
+    
+    def fetch_movie_details(self, tmdb_ids, refresh=False):
+        """
+        Movie details for several ids, fetched concurrently: ({tmdb_id: data}, failed, missing).
+        `failed` ids (network errors, retries exhausted) are worth retrying later,
+        `missing` ids are confirmed 404s.
+        """
+        tmdb_ids = list(tmdb_ids)
+        results = self.map_concurrent(
+            lambda tmdb_id: self.get_movie_details(tmdb_id, refresh=refresh, not_found=NOT_FOUND), tmdb_ids
+        )
+        details, failed, missing = {}, [], []
+        for tmdb_id, data in zip(tmdb_ids, results):
+            if data is NOT_FOUND:
+                missing.append(tmdb_id)
+            elif data:
+                details[tmdb_id] = data
+            else:
+                failed.append(tmdb_id)
+        return details, failed, missing
+    
+    def get_changed_movie_ids(self, start_date, end_date):
+        """
+        TMDb ids listed by /movie/changes between two dates (at most 14 days apart).
+        Returns None if a page could not be fetched, so callers do not skip changes.
+        """
+        params = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+        first_page = self._make_request('movie/changes', {**params, 'page': 1})
+        if first_page is None:
+            return None
         
-        try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Erreur lors de la requête TMDb: {e}")
+        pages = [first_page] + self.fetch_pages('movie/changes', range(2, first_page.get('total_pages', 1) + 1), params)
+        if any(page is None for page in pages):
             return None
+        
+        return list(dict.fromkeys(
+            result['id'] for page in pages for result in page.get('results', []) if result.get('id')
+        ))
     
     def get_popular_movies(self, page=1):
         """Récupère les films populaires"""
-        cache_key = f"tmdb_popular_movies_{page}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
-        data = self._make_request('movie/popular', {'page': page})
-        
-        if data:
-            cache.set(cache_key, data, 3600)  # Cache for 1 hour
-        
-        return data
+        return self._make_request('movie/popular', {'page': page}, max_age=3600)  # 1 hour
     
-    def get_movie_details(self, tmdb_id):
-        """Récupère les détails d'un film"""
-        cache_key = f"tmdb_movie_{tmdb_id}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
-        data = self._make_request(f'movie/{tmdb_id}')
+    def get_movie_details(self, tmdb_id, append=DETAILS_APPEND, refresh=False, not_found=None):
+        """
+        Récupère les détails d'un film, enrichis en une seule requête
+        (append_to_response) du casting, du réalisateur, des mots-clés et de la classification.
+        refresh=True revalide la version en cache auprès de TMDb (film modifié).
+        """
+        params = {'append_to_response': ','.join(append)} if append else None
+        data = self._make_request(
+            f'movie/{tmdb_id}', params, max_age=86400, revalidate=refresh, not_found=not_found
+        )  # 24 hours
         
-        if data:
-            cache.set(cache_key, data, 86400)  # Cache for 24 hours
+        if isinstance(data, dict):
+            data = compact_details(data)
         
         return data
     
     def search_movies(self, query, page=1):
         """Recherche des films"""
-        cache_key = f"tmdb_search_{query}_{page}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
-        data = self._make_request('search/movie', {
+        return self._make_request('search/movie', {
             'query': query,
             'page': page
-        })
-        
-        if data:
-            cache.set(cache_key, data, 1800)  # Cache for 30 minutes
-        
-        return data
+        }, max_age=1800)  # 30 minutes
     
     def get_genres(self):
         """Récupère la liste des genres"""
-        cache_key = "tmdb_genres"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
-        data = self._make_request('genre/movie/list')
-        
-        if data:
-            cache.set(cache_key, data, 86400)  # Cache for 24 hours
-        
-        return data
+        return self._make_request('genre/movie/list', max_age=86400)  # 24 hours
     
     def get_movies_by_genre(self, genre_id, page=1):
         """Récupère les films d'un genre spécifique"""
-        cache_key = f"tmdb_genre_{genre_id}_{page}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
-        data = self._make_request('discover/movie', {
+        return self._make_request('discover/movie', {
             'with_genres': genre_id,
             'page': page,
             'sort_by': 'popularity.desc'
-        })
-        
-        if data:
-            cache.set(cache_key, data, 3600)  # Cache for 1 hour
-        
-        return data
+        }, max_age=3600)  # 1 hour
     
     def save_movie_to_db(self, movie_data):
         """Sauvegarde un film dans la base de données"""
         try:
-            # Parse release date
-            release_date = None
-            if movie_data.get('release_date'):
-                try:
-                    release_date = datetime.strptime(
-                        movie_data['release_date'], '%Y-%m-%d'
-                    ).date()
-                except ValueError:
-                    pass
-            
             # Create or update movie
             movie, created = Movie.objects.update_or_create(
                 tmdb_id=movie_data['id'],
-                defaults={
-                    'title': movie_data.get('title', ''),
-                    'original_title': movie_data.get('original_title', ''),
-                    'overview': movie_data.get('overview', ''),
-                    'release_date': release_date,
-                    'runtime': movie_data.get('runtime'),
-                    'poster_path': movie_data.get('poster_path', ''),
-                    'backdrop_path': movie_data.get('backdrop_path', ''),
-                    'vote_average': movie_data.get('vote_average', 0.0),
-                    'vote_count': movie_data.get('vote_count', 0),
-                    'popularity': movie_data.get('popularity', 0.0),
-                }
+                defaults=movie_fields(movie_data)
             )
             
             # Add genres
@@ -191,6 +402,76 @@ class TMDbService:
             logger.error(f"Erreur lors de la sauvegarde du film: {e}")
             return None
     
+    def save_movies_bulk(self, payloads, batch_size=500):
+        """
+        Upsert many TMDb payloads at once: bulk_create(update_conflicts) keyed on tmdb_id,
+        genre links rewritten with one bulk insert, per-movie signals suppressed and
+        a single batched Mongo/Neo4j sync once the caller's transaction has committed
+        (never holding the write lock during network I/O). Returns the local movie ids.
+        """
+        # Un seul payload par film (le dernier gagne)
+        payloads = list({movie_data['id']: movie_data for movie_data in payloads if movie_data.get('id')}.values())
+        if not payloads:
+            return []
+        
+        with suppress_movie_sync(), transaction.atomic():
+            # Genres complets ({id, name}) présents dans les payloads de détails
+            genre_rows = {
+                genre['id']: genre['name']
+                for movie_data in payloads for genre in movie_data.get('genres') or []
+            }
+            if genre_rows:
+                Genre.objects.bulk_create(
+                    [Genre(tmdb_id=tmdb_id, name=name) for tmdb_id, name in genre_rows.items()],
+                    ignore_conflicts=True
+                )
+            genre_ids = dict(Genre.objects.values_list('tmdb_id', 'id'))
+            
+            # Les payloads sans credits ne doivent pas effacer l'enrichissement existant
+            groups = {}
+            for movie_data in payloads:
+                fields = movie_fields(movie_data)
+                groups.setdefault(tuple(sorted(fields)), []).append(Movie(tmdb_id=movie_data['id'], **fields))
+            
+            for field_names, movies in groups.items():
+                Movie.objects.bulk_create(
+                    movies,
+                    batch_size=batch_size,
+                    update_conflicts=True,
+                    unique_fields=['tmdb_id'],
+                    update_fields=list(field_names) + ['updated_at'],
+                )
+            
+            movie_ids = dict(Movie.objects.filter(
+                tmdb_id__in=[movie_data['id'] for movie_data in payloads]
+            ).values_list('tmdb_id', 'id'))
+            
+            # Liens film/genre : remplacés pour les films dont le payload porte des genres
+            through = Movie.genres.through
+            links = {}
+            for movie_data in payloads:
+                if movie_data.get('genres'):
+                    tmdb_genres = [genre['id'] for genre in movie_data['genres']]
+                elif movie_data.get('genre_ids'):
+                    tmdb_genres = movie_data['genre_ids']
+                else:
+                    continue
+                links[movie_ids[movie_data['id']]] = {genre_ids[g] for g in tmdb_genres if g in genre_ids}
+            
+            if links:
+                through.objects.filter(movie_id__in=list(links)).delete()
+                through.objects.bulk_create(
+                    [through(movie_id=movie_id, genre_id=genre_id)
+                     for movie_id, genres in links.items() for genre_id in genres],
+                    batch_size=batch_size,
+                    ignore_conflicts=True
+                )
+        
+        # Immédiat hors transaction, sinon après le COMMIT de la transaction englobante
+        local_ids = list(movie_ids.values())
+        transaction.on_commit(lambda: sync_movies(local_ids, batch_size=batch_size))
+        return local_ids
+    
     def sync_genres(self):
         """Synchronise les genres avec TMDb"""
         data = self.get_genres()
@@ -207,24 +488,17 @@ class TMDbService:
         return True
     
     def fetch_popular_movies(self, pages=5):
-        """Récupère et sauvegarde les films populaires"""
-        movies_saved = 0
+        """Récupère et sauvegarde les films populaires (pages et détails en parallèle)"""
+        pages_data = self.map_concurrent(self.get_popular_movies, range(1, pages + 1))
+        tmdb_ids = list(dict.fromkeys(
+            movie_data['id']
+            for data in pages_data if data and 'results' in data
+            for movie_data in data['results']
+        ))
         
-        for page in range(1, pages + 1):
-            data = self.get_popular_movies(page)
-            
-            if not data or 'results' not in data:
-                continue
-            
-            for movie_data in data['results']:
-                # Get detailed movie info
-                detailed_movie = self.get_movie_details(movie_data['id'])
-                
-                if detailed_movie:
-                    movie = self.save_movie_to_db(detailed_movie)
-                    if movie:
-                        movies_saved += 1
-                        logger.info(f"Film sauvegardé: {movie.title}")
+        details = self.get_movie_details_many(tmdb_ids)
+        movies_saved = len(self.save_movies_bulk(details[tmdb_id] for tmdb_id in tmdb_ids if tmdb_id in details))
+        logger.info(f"{movies_saved} films sauvegardés")
         
         return movies_saved
 
@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('movies/', views.MovieListView.as_view(), name='movie_list'),
     path('movies/<int:pk>/', views.MovieDetailView.as_view(), name='movie_detail'),
+    path('movies/tmdb/<str:token>/', views.movie_detail_tmdb, name='movie_detail_tmdb'),
     path('search/', views.search, name='search'),
     path('genre/<int:genre_id>/', views.movies_by_genre, name='movies_by_genre'),
     
@@ -31,6 +32,8 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     
     # API
+    path('api/page-state/', views.api_page_state, name='api_page_state'),
+    path('api/movies/<int:movie_id>/view/', views.api_record_view, name='api_record_view'),
     path('api/search/suggestions/', views.api_search_suggestions, name='api_search_suggestions'),
     path('api/movies/', views.api_movies_list, name='api_movies_list'),
     path('api/movies/<int:movie_id>/', views.api_movie_detail, name='api_movie_detail'),
@@ -0,0 +1,167 @@
+"""
+User cohort clustering for shared recommendation work
+Groups users with similar taste vectors so candidate lists are computed once per cohort
+"""
+from .models import Movie, Review, Genre, UserPreference, UserCohort
+from .recommendation_engine import calculate_content_score
+from django.db import transaction
+from collections import defaultdict
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from sklearn.cluster import MiniBatchKMeans
+    CLUSTERING_AVAILABLE = True
+except ImportError:
+    np = None
+    MiniBatchKMeans = None
+    CLUSTERING_AVAILABLE = False
+
+
+def build_user_feature_matrix():
+    """
+    Build one taste vector per user who rated at least one movie
+    Features: average normalised rating per genre, then average and spread of ratings
+    Returns (user_ids, genre_ids, matrix)
+    """
+    genre_ids = list(Genre.objects.order_by('id').values_list('id', flat=True))
+    genre_index = {genre_id: i for i, genre_id in enumerate(genre_ids)}
+
+    movie_genres = defaultdict(list)
+    for movie_id, genre_id in Movie.genres.through.objects.values_list('movie_id', 'genre_id'):
+        movie_genres[movie_id].append(genre_index[genre_id])
+
+    genre_scores = defaultdict(lambda: [0.0] * len(genre_ids))
+    genre_counts = defaultdict(lambda: [0] * len(genre_ids))
+    user_ratings = defaultdict(list)
+
+    reviews = Review.objects.values_list('user_id', 'movie_id', 'rating')
+    for user_id, movie_id, rating in reviews.iterator(chunk_size=2000):
+        user_ratings[user_id].append(rating)
+        rating_weight = rating / 5.0
+        for index in movie_genres.get(movie_id, ()):
+            genre_scores[user_id][index] += rating_weight
+            genre_counts[user_id][index] += 1
+
+    user_ids = sorted(user_ratings)
+    matrix = np.zeros((len(user_ids), len(genre_ids) + 2))
+    for row, user_id in enumerate(user_ids):
+        scores = genre_scores[user_id]
+        counts = genre_counts[user_id]
+        for index, count in enumerate(counts):
+            if count:
+                matrix[row, index] = scores[index] / count
+
+        ratings = user_ratings[user_id]
+        avg_rating = sum(ratings) / len(ratings)
+        std_rating = math.sqrt(sum((r - avg_rating) ** 2 for r in ratings) / len(ratings))
+        matrix[row, -2] = avg_rating / 5.0
+        matrix[row, -1] = std_rating / 5.0
+
+    return user_ids, genre_ids, matrix
+
+
+def compute_cohort_candidates(genre_preferences, rating_preferences, movies, limit=200):
+    """
+    Rank the catalogue once for a cohort centroid, using the per-user content score
+    """
+    scored_movies = []
+    for movie in movies:
+        score = calculate_content_score(movie, genre_preferences, rating_preferences)
+        if score > 0:
+            scored_movies.append((movie.id, score))
+
+    scored_movies.sort(key=lambda x: x[1], reverse=True)
+    return [movie_id for movie_id, score in scored_movies[:limit]]
+
+
+def build_user_cohorts(n_clusters=50, candidates_per_cohort=200, batch_size=1024, random_state=0):
+    """
+    Cluster users with mini-batch k-means, store each cohort's shared candidate pool
+    and each user's cohort id. Returns the number of cohorts built.
+    The same random_state and ratings give the same cohorts.
+    """
+    if not CLUSTERING_AVAILABLE:
+        raise ImportError("numpy and scikit-learn are required to build user cohorts")
+
+    user_ids, genre_ids, matrix = build_user_feature_matrix()
+    if not user_ids:
+        logger.info("No rated movies yet, skipping cohort clustering")
+        return 0
+
+    n_clusters = max(1, min(n_clusters, len(user_ids)))
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        batch_size=batch_size,
+        random_state=random_state,
+        n_init=3
+    )
+    labels = kmeans.fit_predict(matrix)
+
+    members = defaultdict(list)
+    for user_id, label in zip(user_ids, labels):
+        members[int(label)].append(user_id)
+
+    movies = list(Movie.objects.prefetch_related('genres'))
+
+    cohorts = []
+    for cohort_id, cohort_users in members.items():
+        centroid = kmeans.cluster_centers_[cohort_id]
+        genre_preferences = {
+            genre_id: float(centroid[i])
+            for i, genre_id in enumerate(genre_ids)
+            if centroid[i] > 0
+        }
+        rating_preferences = {
+            'avg_rating': float(centroid[-2]) * 5.0,
+            'std_rating': float(centroid[-1]) * 5.0,
+        }
+        cohorts.append(UserCohort(
+            cohort_id=cohort_id,
+            size=len(cohort_users),
+            genre_affinity={str(k): v for k, v in genre_preferences.items()},
+            candidate_movie_ids=compute_cohort_candidates(
+                genre_preferences, rating_preferences, movies, candidates_per_cohort
+            ),
+        ))
+
+    with transaction.atomic():
+        UserCohort.objects.all().delete()
+        UserCohort.objects.bulk_create(cohorts)
+
+        existing = set(UserPreference.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', flat=True))
+        UserPreference.objects.bulk_create([
+            UserPreference(user_id=user_id)
+            for user_id in user_ids if user_id not in existing
+        ])
+
+        UserPreference.objects.exclude(cohort_id=None).update(cohort_id=None)
+        for cohort_id, cohort_users in members.items():
+            UserPreference.objects.filter(user_id__in=cohort_users).update(cohort_id=cohort_id)
+
+    logger.info(f"Built {len(cohorts)} user cohorts for {len(user_ids)} users")
+    return len(cohorts)
+
+
+def get_cohort_candidate_ids(user):
+    """
+    Get the shared candidate pool of the user's cohort, or None if not clustered yet
+    """
+    try:
+        cohort_id = UserPreference.objects.filter(
+            user=user
+        ).values_list('cohort_id', flat=True).first()
+        if cohort_id is None:
+            return None
+
+        return UserCohort.objects.filter(
+            cohort_id=cohort_id
+        ).values_list('candidate_movie_ids', flat=True).first()
+    except Exception as e:
+        logger.error(f"Error getting cohort candidates: {e}")
+        return None
@@ -0,0 +1,114 @@
+"""
+Materialised per-user statistics (UserStats)
+Review, Watchlist and MovieInteraction signals apply their change to the user's row:
+counters with F() UPDATEs, liked genres under a row lock. Profile pages and APIs read the
+row in one query instead of counting, averaging and walking review.movie.genres.
+A missing row is built from scratch on first read (rebuild_user_stats), so signals only
+ever update existing rows.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Genre, MovieInteraction, Review, UserStats, Watchlist
+
+# Avis comptés dans les genres préférés
+LIKED_RATING = 4
+
+STATS_FIELDS = (
+    'review_count', 'rating_sum',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    'watchlist_count', 'interaction_count', 'genre_counts',
+)
+
+
+def apply_review_change(user_id, removed=None, added=None):
+    """
+    Take the `removed` review out of the user stats and count the `added` one;
+    each is a (movie id, rating) pair or None
+    """
+    if removed == added:
+        return
+    deltas = defaultdict(int)
+    liked_movies = []
+    for review, delta in ((removed, -1), (added, 1)):
+        if review is None:
+            continue
+        movie_id, rating = review
+        deltas['review_count'] += delta
+        deltas['rating_sum'] += delta * rating
+        deltas[f'rating_{rating}_count'] += delta
+        if rating >= LIKED_RATING:
+            liked_movies.append((movie_id, delta))
+
+    stats = UserStats.objects.filter(user_id=user_id)
+    with transaction.atomic():
+        updates = {field: F(field) + amount for field, amount in deltas.items() if amount}
+        if not stats.update(updated_at=timezone.now(), **updates):
+            return   # pas encore de ligne : elle sera calculée à la première lecture
+        if liked_movies:
+            _apply_genre_change(stats, liked_movies)
+
+
+def _apply_genre_change(stats, liked_movies):
+    genre_deltas = defaultdict(int)
+    for movie_id, delta in liked_movies:
+        for name in Genre.objects.filter(movie=movie_id).values_list('name', flat=True):
+            genre_deltas[name] += delta
+    if not any(genre_deltas.values()):
+        return
+    row = stats.select_for_update().only('pk', 'genre_counts').first()
+    for name, delta in genre_deltas.items():
+        count = row.genre_counts.get(name, 0) + delta
+        if count > 0:
+            row.genre_counts[name] = count
+        else:
+            row.genre_counts.pop(name, None)
+    row.save(update_fields=['genre_counts'])
+
+
+def apply_count_change(user_id, field, delta):
+    """Add `delta` to one counter (watchlist_count, interaction_count) of the user stats"""
+    UserStats.objects.filter(user_id=user_id).update(**{field: F(field) + delta, 'updated_at': timezone.now()})
+
+
+def rebuild_user_stats(user_ids):
+    """Recompute and upsert the stats rows of the given users from the source tables"""
+    user_ids = list(user_ids)
+    rows = {user_id: UserStats(user_id=user_id, genre_counts={}) for user_id in user_ids}
+
+    reviews = Review.objects.filter(user_id__in=user_ids).order_by()
+    for row in reviews.values('user_id', 'rating').annotate(count=Count('id')):
+        stats = rows[row['user_id']]
+        stats.review_count += row['count']
+        stats.rating_sum += row['count'] * row['rating']
+        setattr(stats, f'rating_{row["rating"]}_count', row['count'])
+
+    liked = reviews.filter(rating__gte=LIKED_RATING, movie__genres__isnull=False)
+    for row in liked.values('user_id', 'movie__genres__name').annotate(count=Count('id')):
+        rows[row['user_id']].genre_counts[row['movie__genres__name']] = row['count']
+
+    for model, field in ((Watchlist, 'watchlist_count'), (MovieInteraction, 'interaction_count')):
+        counts = model.objects.filter(user_id__in=user_ids).order_by().values('user_id').annotate(count=Count('id'))
+        for row in counts:
+            setattr(rows[row['user_id']], field, row['count'])
+
+    now = timezone.now()
+    for stats in rows.values():
+        stats.updated_at = now
+    UserStats.objects.bulk_create(
+        rows.values(), update_conflicts=True, unique_fields=['user'],
+        update_fields=STATS_FIELDS + ('updated_at',),
+    )
+    return rows
+
+
+def user_stats_for(user):
+    """Stats row of `user` (a User or an id), built on first access"""
+    user_id = getattr(user, 'pk', user)
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        stats = rebuild_user_stats([user_id])[user_id]
+    return stats
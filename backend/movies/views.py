@@ -3,23 +3,44 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
+from django.core import signing
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, Exists, OuterRef, Subquery
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import never_cache
+from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils import timezone
 from django.db import connection
 from django.contrib.auth.forms import UserCreationForm
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+import asyncio
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 from .models import Movie, Review, Genre, Watchlist, UserPreference, MovieInteraction
+from .movie_summary import MovieSummary
+from .search_index import search_movie_ids, search_movies, rank_expression
+from .suggestion_index import suggestion_index
+from .fuzzy_search import fuzzy_index
+from .tmdb_ingestion import ingestion_queue, unsign_tmdb_id
+from .page_cache import anonymous_page_cache, current_versions, MOVIES_VERSION_KEY
+from .conditional import conditional_get, versions_etag, weak_etag, movies_etag, movies_last_modified
+from .json_stream import StreamingJSONResponse, queryset_rows, ITERATOR_CHUNK_SIZE
+from .card_cache import movie_cards_json
+from .keyset import (
+    SORT_ALIASES, SORT_FIELDS, resolve_sort, paginate_on, paginate_queryset,
+    page_from_rows, decode_cursor, cursor_querystring, cached_count, KeysetPage,
+)
+from .ranked_list import ranked_page
+from .user_stats import user_stats_for
 
 # Add error handling for Neo4j imports
 try:
@@ -39,119 +60,90 @@ except ImportError as e:
     get_neo4j_connection = None
 
 from .tmdb_service import tmdb_service
+from .tmdb_async import async_tmdb_client
 from .recommendation_engine import get_action_movie_recommendations
 
 logger = logging.getLogger(__name__)
 
+# Appels Neo4j lancés en parallèle du travail SQL d'une vue
+neo4j_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='neo4j-view')
 
-# Vue d'accueil
-def home(request):
-    """Page d'accueil avec films populaires et recommandations"""
+# Movies a single api_page_state call may ask about
+PAGE_STATE_MAX_MOVIES = 100
+# Largest page served by the paginated JSON APIs
+API_PAGE_MAX_SIZE = 100
+
+
+def fallback_popular_movies(limit):
+    """Films populaires depuis la base, quand Neo4j est vide ou indisponible"""
+    logger.info("Using Django models as fallback for popular movies")
+    django_movies = Movie.objects.filter(
+        vote_average__gte=7.0
+    ).prefetch_related('genres').order_by('-popularity', '-vote_average')[:limit]
+    return [MovieSummary.from_movie(movie) for movie in django_movies]
+
+
+async def popular_movie_summaries(limit):
+    """Films populaires depuis Neo4j (driver asynchrone), sinon depuis la base"""
     try:
         popular_movies = []
         if NEO4J_AVAILABLE and neo4j_movie_service:
-            neo4j_movies = neo4j_movie_service.get_popular_movies(12) or []
-            # Convert Neo4j records to dictionaries and add pk field
-            for movie in neo4j_movies:
-                try:
-                    # Convert Record to dict if needed
-                    if hasattr(movie, '_asdict'):  # Neo4j Record object
-                        movie_dict = dict(movie)
-                    elif isinstance(movie, dict):
-                        movie_dict = movie.copy()
-                    else:
-                        movie_dict = dict(movie)
-                    
-                    if movie_dict.get('movie_id'):  # Only include movies with valid IDs
-                        movie_dict['pk'] = movie_dict['movie_id']  # Add pk for URL reversal
-                        movie_dict['id'] = movie_dict['movie_id']  # Add id field for template compatibility
-                        # Add poster URL if poster_path exists
-                        if movie_dict.get('poster_path'):
-                            movie_dict['poster_url'] = f"https://image.tmdb.org/t/p/w500{movie_dict['poster_path']}"
-                        popular_movies.append(movie_dict)
-                except Exception as e:
-                    logger.warning(f"Error processing movie record: {e}")
-                    continue
+            popular_movies = MovieSummary.from_records(await neo4j_movie_service.aget_popular_movies(limit))
         
         # If Neo4j is empty or unavailable, use Django models as fallback
         if not popular_movies:
-            logger.info("Using Django models as fallback for popular movies")
-            django_movies = Movie.objects.filter(vote_average__gte=7.0).order_by('-popularity', '-vote_average')[:12]
-            popular_movies = [
-                {
-                    'id': movie.id,
-                    'movie_id': movie.id,
-                    'title': movie.title,
-                    'genres': [genre.name for genre in movie.genres.all()],
-                    'rating': movie.vote_average,
-                    'release_date': movie.release_date.isoformat() if movie.release_date else None,
-                    'overview': movie.overview,
-                    'poster_path': movie.poster_path,
-                    'poster_url': f"https://image.tmdb.org/t/p/w500{movie.poster_path}" if movie.poster_path else "",
-                    'pk': movie.id  # Add pk for URL reversal
-                }
-                for movie in django_movies
-            ]
+            popular_movies = await sync_to_async(fallback_popular_movies)(limit)
+        return popular_movies
     except Exception as e:
         logger.error(f"Error fetching popular movies: {e}")
-        popular_movies = []
+        return []
+
+
+# Vue d'accueil
+@anonymous_page_cache('home')
+async def home(request):
+    """Page d'accueil avec films populaires (recommandations hydratées via api_page_state)"""
+    # Neo4j et la base sont interrogés en même temps
+    popular_movies, genres = await asyncio.gather(
+        popular_movie_summaries(12),
+        sync_to_async(list)(Genre.objects.all()[:8]),
+    )
     
     context = {
         'popular_movies': popular_movies,
-        'genres': Genre.objects.all()[:8],
+        'genres': genres,
     }
     
-    if request.user.is_authenticated:
-        # Synchroniser l'utilisateur dans Neo4j si disponible
-        if NEO4J_AVAILABLE and neo4j_movie_service:
-            user_data = {
-                'id': request.user.id,
-                'username': request.user.username,
-                'email': request.user.email,
-                'first_name': request.user.first_name,
-                'last_name': request.user.last_name,
-                'date_joined': request.user.date_joined.isoformat(),
-                'is_active': request.user.is_active
-            }
-            try:
-                neo4j_movie_service.create_or_update_user(user_data)
-                
-                # Obtenir les recommandations intelligentes
-                recommended_movies = neo4j_engine.get_recommendations_for_user(
-                    request.user.id, limit=12, recommendation_type='smart'
-                ) or []
-                context['recommended_movies'] = recommended_movies
-            except Exception as e:
-                logger.error(f"Error fetching recommendations: {e}")
-                context['recommended_movies'] = []
-        else:
-            context['recommended_movies'] = []
-        
-        context['user_reviews_count'] = Review.objects.filter(user=request.user).count()
-        context['watchlist_count'] = Watchlist.objects.filter(user=request.user).count()
-    
-    return render(request, 'movies/home.html', context)
+    return await sync_to_async(render)(request, 'movies/home.html', context)
 
 
 # Liste des films
+@method_decorator(anonymous_page_cache('movie_list'), name='dispatch')
 class MovieListView(ListView):
     model = Movie
     template_name = 'movies/movie_list.html'
     context_object_name = 'movies'
-    paginate_by = 20
+    per_page = 20
+    search_limit = 200
     
     def get_queryset(self):
-        queryset = Movie.objects.select_related().prefetch_related('genres')
+        queryset = Movie.objects.prefetch_related('genres')
         
         # Filtrage par recherche
         search_query = self.request.GET.get('search')
+        self.ranked_ids = None
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(overview__icontains=search_query)
-            )
+            ranked_ids = search_movie_ids(search_query, limit=self.search_limit)
+            if ranked_ids is not None:
+                queryset = queryset.filter(id__in=ranked_ids).annotate(search_rank=rank_expression(ranked_ids))
+                self.ranked_ids = ranked_ids
+            else:
+                queryset = queryset.filter(
+                    Q(title__icontains=search_query) |
+                    Q(overview__icontains=search_query)
+                )
         
-        # Filtrage par genre
+        # Filtrage par genre (un seul genre : la jointure ne duplique pas de lignes, pas de DISTINCT)
         genre_id = self.request.GET.get('genre')
         if genre_id:
             queryset = queryset.filter(genres__id=genre_id)
@@ -173,15 +165,29 @@ class MovieListView(ListView):
         if rating:
             queryset = queryset.filter(vote_average__gte=rating)
         
-        # Tri
-        sort_by = self.request.GET.get('sort', '-popularity')
-        if sort_by in ['-popularity', '-vote_average', '-release_date', 'release_date', 'title']:
-            queryset = queryset.order_by(sort_by)
-        
-        return queryset.distinct()
+        return queryset
+    
+    def get_sort(self):
+        """Sort option; search results keep their relevance order without a recognised sort"""
+        sort = self.request.GET.get('sort')
+        if self.ranked_ids is not None and SORT_ALIASES.get(sort, sort) not in SORT_FIELDS:
+            return 'relevance'
+        return resolve_sort(sort)
     
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        # Pagination par curseur sur (tri, id) : pas d'OFFSET ni de COUNT par page
+        cursor = self.request.GET.get('cursor')
+        sort = self.get_sort()
+        if sort == 'relevance':
+            page = paginate_on(self.object_list, 'search_rank', False, cursor, self.per_page)
+        else:
+            page = paginate_queryset(self.object_list, sort, cursor, self.per_page)
+        
+        context = super().get_context_data(object_list=page, **kwargs)
+        context['page'] = page
+        context['next_query'] = cursor_querystring(self.request.GET, page.next_cursor)
+        context['previous_query'] = cursor_querystring(self.request.GET, page.previous_cursor)
+        context['movies_count'] = cached_count(self.object_list)
         context['genres'] = Genre.objects.all()
         context['current_genre'] = self.request.GET.get('genre')
         context['current_search'] = self.request.GET.get('search', '')
@@ -201,135 +207,133 @@ class MovieListView(ListView):
 
 
 # Détails d'un film
+@method_decorator(anonymous_page_cache('movie_detail', movie_kwarg='pk'), name='dispatch')
 class MovieDetailView(DetailView):
     model = Movie
     template_name = 'movies/movie_detail.html'
     context_object_name = 'movie'
+    reviews_per_page = 10
+    similar_movies_timeout = 2
     
-    def get_object(self):
-        obj = super().get_object()
+    def get_queryset(self):
+        return Movie.objects.prefetch_related('genres')
+    
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
         
-        # Enregistre l'interaction de visualisation dans Neo4j
-        if self.request.user.is_authenticated:
-            neo4j_engine.record_user_interaction(
-                self.request.user.id, obj.id, 'view'
+        # Neo4j tourne en parallèle des requêtes SQL du contexte
+        self.similar_future = None
+        if NEO4J_AVAILABLE and neo4j_movie_service:
+            self.similar_future = neo4j_executor.submit(
+                neo4j_movie_service.get_similar_movies, self.object.id, 6
             )
         
-        return obj
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        movie = self.get_object()
+        movie = self.object
         
-        # Avis du film
-        reviews = Review.objects.filter(movie=movie).order_by('-created_at')
-        context['reviews'] = reviews
-        context['reviews_count'] = reviews.count()
-        context['average_rating'] = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+        # Compteur et moyenne des avis : colonnes du film, aucune agrégation
+        context['reviews_count'] = movie.rating_count
+        context['average_rating'] = movie.rating_average
+        context['rating_histogram'] = movie.rating_histogram
         
-        # Avis de l'utilisateur actuel
-        if self.request.user.is_authenticated:
-            context['user_review'] = Review.objects.filter(
-                user=self.request.user, 
-                movie=movie
-            ).first()
-            
-            # Vérifier si le film est dans la watchlist
-            context['in_watchlist'] = Watchlist.objects.filter(
-                user=self.request.user,
-                movie=movie
-            ).exists()
+        # Page d'avis courante ; le total vient du film, pas d'un COUNT
+        reviews = Review.objects.filter(movie=movie)
+        paginator = Paginator(reviews.select_related('user').order_by('-created_at'), self.reviews_per_page)
+        paginator.count = movie.rating_count
+        page_obj = paginator.get_page(self.request.GET.get('page'))
+        context['reviews'] = page_obj.object_list
+        context['reviews_page'] = page_obj
         
         # Films similaires - utilise Neo4j
-        try:
-            if NEO4J_AVAILABLE and neo4j_movie_service:
-                similar_movies_raw = neo4j_movie_service.get_similar_movies(movie.id, limit=6) or []
-                similar_movies_data = []
-                for sim_movie in similar_movies_raw:
-                    try:
-                        # Convert Record to dict if needed
-                        if hasattr(sim_movie, '_asdict'):  # Neo4j Record object
-                            movie_dict = dict(sim_movie)
-                        elif isinstance(sim_movie, dict):
-                            movie_dict = sim_movie.copy()
-                        else:
-                            movie_dict = dict(sim_movie)
-                        
-                        if movie_dict.get('movie_id'):
-                            movie_dict['pk'] = movie_dict['movie_id']
-                            movie_dict['id'] = movie_dict['movie_id']
-                            # Add poster URL if poster_path exists
-                            if movie_dict.get('poster_path'):
-                                movie_dict['poster_url'] = f"https://image.tmdb.org/t/p/w500{movie_dict['poster_path']}"
-                            similar_movies_data.append(movie_dict)
-                    except Exception as e:
-                        logger.warning(f"Error processing similar movie record: {e}")
-                        continue
-                context['similar_movies'] = similar_movies_data
-            else:
-                context['similar_movies'] = []
-        except Exception as e:
-            logger.error(f"Error fetching similar movies: {e}")
-            context['similar_movies'] = []
+        context['similar_movies'] = []
+        if self.similar_future is not None:
+            try:
+                context['similar_movies'] = MovieSummary.from_records(
+                    self.similar_future.result(timeout=self.similar_movies_timeout)
+                )
+            except Exception as e:
+                logger.error(f"Error fetching similar movies: {e}")
         
         return context
 
 
+def user_movie_states(user, movie_ids):
+    """Watchlist flag and own review of `user` for each movie, in a single query"""
+    user_reviews = Review.objects.filter(user=user, movie=OuterRef('pk'))
+    rows = Movie.objects.filter(pk__in=movie_ids).order_by().annotate(
+        in_watchlist=Exists(Watchlist.objects.filter(user=user, movie=OuterRef('pk'))),
+        review_id=Subquery(user_reviews.values('id')[:1]),
+        review_rating=Subquery(user_reviews.values('rating')[:1]),
+        review_comment=Subquery(user_reviews.values('comment')[:1]),
+    ).values('pk', 'in_watchlist', 'review_id', 'review_rating', 'review_comment')
+    
+    states = {}
+    for row in rows:
+        review = None
+        if row['review_id'] is not None:
+            review = {'id': row['review_id'], 'rating': row['review_rating'], 'comment': row['review_comment']}
+        states[row['pk']] = {'in_watchlist': row['in_watchlist'], 'review': review}
+    return states
+
+
 # Recommandations
 @login_required
-def recommendations(request):
+async def recommendations(request):
     """Page des recommandations personnalisées avec intelligence améliorée"""
     recommendation_type = request.GET.get('type', 'smart')
+    user = await request.auser()
     
+    page = KeysetPage([])
+    page.number = 1
     try:
         if NEO4J_AVAILABLE and neo4j_engine:
-            # Utilise le nouveau moteur Neo4j pour toutes les recommandations
-            neo4j_recommendations = neo4j_engine.get_recommendations_for_user(
-                request.user.id, 
-                limit=20,
-                recommendation_type=recommendation_type
-            ) or []
-            
-            # Convert Neo4j records to dictionaries
-            recommended_movies = []
-            for movie in neo4j_recommendations:
-                try:
-                    # Convert Record to dict if needed
-                    if hasattr(movie, '_asdict'):  # Neo4j Record object
-                        movie_dict = dict(movie)
-                    elif isinstance(movie, dict):
-                        movie_dict = movie.copy()
-                    else:
-                        movie_dict = dict(movie)
-                    
-                    if movie_dict.get('movie_id'):  # Only include movies with valid IDs
-                        movie_dict['pk'] = movie_dict['movie_id']  # Add pk for URL reversal
-                        movie_dict['id'] = movie_dict['movie_id']  # Add id field for template compatibility
-                        # Add poster URL if poster_path exists
-                        if movie_dict.get('poster_path'):
-                            movie_dict['poster_url'] = f"https://image.tmdb.org/t/p/w500{movie_dict['poster_path']}"
-                        recommended_movies.append(movie_dict)
-                except Exception as e:
-                    logger.warning(f"Error processing recommendation record: {e}")
-                    continue
-        else:
-            recommended_movies = []
+            # Liste classée calculée une fois par version, chaque page en est une tranche
+            page = await ranked_page(
+                neo4j_engine, user.id, recommendation_type,
+                cursor=request.GET.get('cursor'), per_page=12
+            )
     except Exception as e:
         logger.error(f"Error fetching recommendations: {e}")
-        recommended_movies = []
-    
-    # Pagination
-    paginator = Paginator(recommended_movies, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
 
     context = {
-        'movies': page_obj,
+        'movies': page,
         'recommendation_type': recommendation_type,
-        'page_obj': page_obj,
+        'page': page,
+        'next_query': cursor_querystring(request.GET, page.next_cursor),
+        'previous_query': cursor_querystring(request.GET, page.previous_cursor),
         'use_neo4j': NEO4J_AVAILABLE,
     }
-    return render(request, 'movies/recommendations.html', context)
+    return await sync_to_async(render)(request, 'movies/recommendations.html', context)
+
+
+# Fiche d'un film affiché depuis TMDb (import pas encore terminé)
+def movie_detail_tmdb(request, token):
+    """
+    Redirige vers la fiche locale d'un résultat de recherche TMDb.
+    Seuls les ids signés dans les résultats sont acceptés ; l'import passe par la file
+    d'ingestion et la page d'attente se recharge jusqu'à ce que le film soit en base.
+    """
+    try:
+        tmdb_id = unsign_tmdb_id(token)
+    except signing.BadSignature:
+        raise Http404("Lien invalide ou expiré")
+    
+    movie = Movie.objects.filter(tmdb_id=tmdb_id).only('pk').first()
+    if movie is not None:
+        return redirect('movies:movie_detail', pk=movie.pk)
+    
+    # Normalement déjà en file depuis la recherche ; sinon (autre processus, redémarrage) on le remet
+    if not ingestion_queue.is_pending(tmdb_id):
+        movie_data = tmdb_service.get_movie_details(tmdb_id)
+        if not movie_data:
+            raise Http404("Film introuvable")
+        ingestion_queue.enqueue([movie_data])
+    
+    return render(request, 'movies/movie_pending.html', status=202)
 
 
 # Ajouter/Modifier un avis
@@ -382,7 +386,12 @@ def add_review(request, movie_id):
 def delete_review(request, review_id):
     """Supprimer un avis"""
     review = get_object_or_404(Review, id=review_id, user=request.user)
+    movie_id = review.movie_id
     review.delete()
+    
+    # Retirer la note de Neo4j et rafraîchir le profil stocké
+    neo4j_engine.remove_user_rating(request.user.id, movie_id)
+    
     return JsonResponse({'success': True})
 
 
@@ -451,58 +460,95 @@ def toggle_watchlist(request, movie_id):
         }, status=500)
 
 
+def local_search(query):
+    """
+    Résultats de la base locale (index plein texte, sinon icontains) complétés par les
+    titres proches en cas de faute de frappe; (movies, a trouvé des titres proches)
+    """
+    movies = search_movies(query, limit=20)
+    if movies is None:
+        movies = list(Movie.objects.filter(
+            Q(title__icontains=query) |
+            Q(overview__icontains=query)
+        )[:20])
+    
+    fuzzy_ids = []
+    if len(movies) < 5:
+        found_ids = {movie.id for movie in movies}
+        fuzzy_ids = [movie_id for movie_id in fuzzy_index.search_ids(query, limit=20)
+                     if movie_id not in found_ids]
+        fuzzy_movies = Movie.objects.in_bulk(fuzzy_ids)
+        movies.extend(fuzzy_movies[movie_id] for movie_id in fuzzy_ids if movie_id in fuzzy_movies)
+    return movies, bool(fuzzy_ids)
+
+
+def merge_tmdb_results(movies, tmdb_results):
+    """Ajoute les résultats TMDb : depuis la base s'ils y sont, sinon affichés depuis TMDb et importés"""
+    existing_ids = {movie.tmdb_id for movie in movies}
+    results = [movie_data for movie_data in tmdb_results['results'][:10]
+               if movie_data.get('id') and movie_data['id'] not in existing_ids]
+    
+    # Films déjà en base : affichés depuis la base
+    stored = Movie.objects.in_bulk([movie_data['id'] for movie_data in results],
+                                   field_name='tmdb_id')
+    genre_names = dict(Genre.objects.values_list('tmdb_id', 'name'))
+    
+    # Les autres sont affichés depuis TMDb et importés en arrière-plan
+    missing = []
+    for movie_data in results:
+        if movie_data['id'] in stored:
+            movies.append(stored[movie_data['id']])
+        else:
+            movies.append(MovieSummary.from_tmdb(movie_data, genre_names))
+            missing.append(movie_data)
+    ingestion_queue.enqueue(missing)
+    return movies
+
+
+async def search_results(query):
+    """Résultats d'une recherche : base locale, puis TMDb s'il y a peu de résultats"""
+    if not query:
+        return []
+    try:
+        movies, has_fuzzy = await sync_to_async(local_search)(query)
+        
+        # Si peu de résultats et aucun titre proche, recherche sur TMDb
+        if len(movies) < 5 and not has_fuzzy:
+            try:
+                tmdb_results = await async_tmdb_client.search_movies(query)
+                if tmdb_results and 'results' in tmdb_results:
+                    movies = await sync_to_async(merge_tmdb_results)(movies, tmdb_results)
+            except Exception as e:
+                logger.error(f"Error fetching from TMDb: {e}")
+        return movies
+    except Exception as e:
+        logger.error(f"Error in search: {e}")
+        return []
+
+
+def watchlist_movie_ids(user):
+    if not user.is_authenticated:
+        return []
+    return list(Watchlist.objects.filter(user=user).values_list('movie_id', flat=True))
+
+
 # Recherche
-def search(request):
+async def search(request):
     """Page de recherche"""
     query = request.GET.get('q', '').strip()
-    movies = []
+    user = await request.auser()
     
-    if query:
-        try:
-            # Recherche dans la base locale
-            local_movies = Movie.objects.filter(
-                Q(title__icontains=query) |
-                Q(overview__icontains=query)
-            )[:20]
-            
-            # Convert to list for easier manipulation
-            movies = list(local_movies)
-            
-            # Si peu de résultats, recherche sur TMDb
-            if len(movies) < 5:
-                try:
-                    tmdb_results = tmdb_service.search_movies(query)
-                    
-                    if tmdb_results and 'results' in tmdb_results:
-                        existing_ids = {movie.tmdb_id for movie in movies}
-                        
-                        for movie_data in tmdb_results['results'][:10]:
-                            if movie_data.get('id') not in existing_ids:
-                                try:
-                                    saved_movie = tmdb_service.save_movie_to_db(movie_data)
-                                    if saved_movie:
-                                        movies.append(saved_movie)
-                                except Exception as e:
-                                    logger.error(f"Error saving movie from TMDb: {e}")
-                                    continue
-                except Exception as e:
-                    logger.error(f"Error fetching from TMDb: {e}")
-        except Exception as e:
-            logger.error(f"Error in search: {e}")
-            movies = []
+    # La watchlist est lue pendant que la recherche (et l'éventuel appel TMDb) s'exécute
+    movies, user_watchlist = await asyncio.gather(
+        search_results(query),
+        sync_to_async(watchlist_movie_ids)(user),
+    )
     
     # Pagination
     paginator = Paginator(movies, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Get user's watchlist if authenticated
-    user_watchlist = []
-    if request.user.is_authenticated:
-        user_watchlist = list(Watchlist.objects.filter(
-            user=request.user
-        ).values_list('movie_id', flat=True))
-    
     context = {
         'movies': page_obj,
         'query': query,
@@ -510,81 +556,43 @@ def search(request):
         'user_watchlist': user_watchlist,
     }
     
-    return render(request, 'movies/search.html', context)
+    return await sync_to_async(render)(request, 'movies/search.html', context)
 
 
 # Films par genre
+@anonymous_page_cache('movies_by_genre')
 def movies_by_genre(request, genre_id):
-    """Films d'un genre spécifique"""
+    """Films d'un genre spécifique, paginés par curseur sur (vote_average, id)"""
     genre = get_object_or_404(Genre, id=genre_id)
+    cursor = request.GET.get('cursor')
+    per_page = 12
     
+    page = None
     try:
         if NEO4J_AVAILABLE and neo4j_movie_service:
-            movies_data = neo4j_movie_service.get_movies_by_genre(genre.name, limit=100) or []
-            # Convert Neo4j records to dictionaries and add pk field
-            movies_with_pk = []
-            for movie in movies_data:
-                # Convert Record to dict if needed
-                if hasattr(movie, '_asdict'):  # Neo4j Record object
-                    movie_dict = dict(movie)
-                elif isinstance(movie, dict):
-                    movie_dict = movie.copy()
-                else:
-                    movie_dict = dict(movie)
-                
-                if movie_dict.get('movie_id'):
-                    movie_dict['pk'] = movie_dict['movie_id']
-                    movie_dict['id'] = movie_dict['movie_id']  # Add id field for template compatibility
-                    # Add poster URL if poster_path exists
-                    if movie_dict.get('poster_path'):
-                        movie_dict['poster_url'] = f"https://image.tmdb.org/t/p/w500{movie_dict['poster_path']}"
-                    movies_with_pk.append(movie_dict)
-        else:
-            # Fallback to Django ORM
-            django_movies = Movie.objects.filter(genres=genre).order_by('-vote_average', '-popularity')[:100]
-            movies_with_pk = [
-                {
-                    'id': movie.id,
-                    'movie_id': movie.id,
-                    'title': movie.title,
-                    'genres': [g.name for g in movie.genres.all()],
-                    'rating': movie.vote_average,
-                    'release_date': movie.release_date.isoformat() if movie.release_date else None,
-                    'overview': movie.overview,
-                    'poster_path': movie.poster_path,
-                    'poster_url': f"https://image.tmdb.org/t/p/w500{movie.poster_path}" if movie.poster_path else "",
-                    'pk': movie.id
-                }
-                for movie in django_movies
-            ]
+            rows = neo4j_movie_service.get_movies_by_genre(genre.name, limit=per_page + 1, cursor=cursor)
+            if rows:
+                page = page_from_rows(
+                    MovieSummary.from_records(rows), per_page, decode_cursor(cursor),
+                    lambda movie: movie.vote_average, lambda movie: movie.id
+                )
     except Exception as e:
         logger.error(f"Error fetching movies by genre: {e}")
-        # Fallback to Django ORM on error
-        django_movies = Movie.objects.filter(genres=genre).order_by('-vote_average', '-popularity')[:100]
-        movies_with_pk = [
-            {
-                'id': movie.id,
-                'movie_id': movie.id,
-                'title': movie.title,
-                'genres': [g.name for g in movie.genres.all()],
-                'rating': movie.vote_average,
-                'release_date': movie.release_date.isoformat() if movie.release_date else None,
-                'overview': movie.overview,
-                'poster_path': movie.poster_path,
-                'poster_url': f"https://image.tmdb.org/t/p/w500{movie.poster_path}" if movie.poster_path else "",
-                'pk': movie.id
-            }
-            for movie in django_movies
-        ]
     
-    # Pagination
-    paginator = Paginator(movies_with_pk, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Fallback to Django ORM (Neo4j vide, indisponible ou en erreur)
+    if page is None:
+        page = paginate_on(
+            Movie.objects.filter(genres=genre).prefetch_related('genres'),
+            'vote_average', True, cursor, per_page
+        )
+        page.object_list = [MovieSummary.from_movie(movie) for movie in page.object_list]
+    
     context = {
         'genre': genre,
-        'movies': page_obj,
-        'page_obj': page_obj,
+        'movies': page,
+        'page': page,
+        'next_query': cursor_querystring(request.GET, page.next_cursor),
+        'previous_query': cursor_querystring(request.GET, page.previous_cursor),
     }
     return render(request, 'movies/genre.html', context)
 
@@ -593,29 +601,18 @@ def movies_by_genre(request, genre_id):
 @login_required
 def profile(request):
     """Page de profil utilisateur"""
-    user_reviews = Review.objects.filter(user=request.user).order_by('-created_at')
-    user_watchlist = Watchlist.objects.filter(user=request.user).order_by('-added_at')
+    user_reviews = Review.objects.filter(user=request.user).select_related('movie').order_by('-created_at')
+    user_watchlist = Watchlist.objects.filter(user=request.user).select_related('movie').order_by('-added_at')
     
-    # Statistiques
+    # Statistiques : une ligne UserStats, tenue à jour par les signaux
+    user_stats = user_stats_for(request.user)
     stats = {
-        'total_reviews': user_reviews.count(),
-        'total_watchlist': user_watchlist.count(),
-        'average_rating': user_reviews.aggregate(Avg('rating'))['rating__avg'] or 0,
-        'favorite_genres': [],
+        'total_reviews': user_stats.review_count,
+        'total_watchlist': user_stats.watchlist_count,
+        'average_rating': user_stats.average_rating,
+        'favorite_genres': user_stats.favorite_genres(5),
     }
     
-    # Genres préférés basés sur les avis
-    genre_counts = {}
-    for review in user_reviews.filter(rating__gte=4):
-        for genre in review.movie.genres.all():
-            genre_counts[genre] = genre_counts.get(genre, 0) + 1
-    
-    stats['favorite_genres'] = sorted(
-        genre_counts.items(), 
-        key=lambda x: x[1], 
-        reverse=True
-    )[:5]
-    
     context = {
         'user_reviews': user_reviews[:10],
         'user_watchlist': user_watchlist[:10],
@@ -627,52 +624,39 @@ def profile(request):
 
 # API endpoints
 @csrf_exempt
-def api_popular_movies(request):
+@conditional_get(movies_etag, movies_last_modified)
+async def api_popular_movies(request):
     """API pour récupérer les films populaires"""
-    movies_data = neo4j_movie_service.get_popular_movies(20)
+    movies_data = MovieSummary.from_records(await neo4j_movie_service.aget_popular_movies(20))
+    rows = await sync_to_async(movie_cards_json)(movies_data, score=lambda movie: movie.score)
     
-    data = []
-    for movie_data in movies_data:
-        data.append({
-            'id': movie_data.get('movie_id'),
-            'title': movie_data.get('title'),
-            'overview': movie_data.get('overview', '')[:200],
-            'release_date': movie_data.get('release_date'),
-            'vote_average': movie_data.get('rating'),
-            'poster_url': '',  # Will need to be fetched separately or stored in Neo4j
-            'genres': movie_data.get('genres', []),
-        })
-    
-    return JsonResponse({'movies': data})
+    return StreamingJSONResponse(request, {'movies': iter(rows)})
 
 
 @csrf_exempt
 @login_required
-def api_recommendations(request):
+async def api_recommendations(request):
     """API pour récupérer les recommandations"""
     limit = int(request.GET.get('limit', 20))
     recommendation_type = request.GET.get('type', 'smart')
+    user = await request.auser()
     
-    movies_data = neo4j_engine.get_recommendations_for_user(
-        request.user.id,
-        limit=limit,
-        recommendation_type=recommendation_type
-    )
-    
-    data = []
-    for movie_data in movies_data:
-        data.append({
-            'id': movie_data.get('movie_id'),
-            'title': movie_data.get('title'),
-            'overview': '',  # Will need to be added to Neo4j schema
-            'release_date': movie_data.get('release_date'),
-            'vote_average': movie_data.get('rating'),
-            'poster_url': '',  # Will need to be added to Neo4j schema
-            'genres': movie_data.get('genres', []),
-            'recommendation_score': movie_data.get('recommendation_score', 0.0)
-        })
+    try:
+        movies_data = await neo4j_engine.aget_recommendations_for_user(
+            user.id,
+            limit=limit,
+            recommendation_type=recommendation_type
+        )
+        rows = await sync_to_async(movie_cards_json)(
+            movies_data or [],
+            score=lambda movie: movie.score,
+            recommendation_score=lambda movie: movie.score or 0.0,
+        )
+    except Exception as e:
+        logger.error(f"Error getting recommendations: {e}")
+        return JsonResponse({'error': 'Unable to get recommendations'}, status=500)
     
-    return JsonResponse({'movies': data})
+    return StreamingJSONResponse(request, {'movies': iter(rows)})
 
 
 @csrf_exempt
@@ -749,24 +733,64 @@ def register_view(request):
     return render(request, 'movies/register.html', {'form': form})
 
 # API Views
+def movie_list_json(movie):
+    """Row of api_movies_list (genres must be prefetched)"""
+    return {
+        'id': movie.id,
+        'title': movie.title,
+        'overview': movie.overview,
+        'release_date': movie.release_date.isoformat() if movie.release_date else None,
+        'vote_average': float(movie.vote_average) if movie.vote_average else 0,
+        'poster_path': movie.poster_path,
+        'genres': [genre.name for genre in movie.genres.all()],
+    }
+
+
 @csrf_exempt
+@conditional_get(versions_etag(MOVIES_VERSION_KEY, per_path=True), movies_last_modified)
 def api_movies_list(request):
-    """API pour lister les films"""
-    movies = Movie.objects.all()[:20]
-    data = []
-    for movie in movies:
-        data.append({
-            'id': movie.id,
-            'title': movie.title,
-            'overview': movie.overview,
-            'release_date': movie.release_date.isoformat() if movie.release_date else None,
-            'vote_average': float(movie.vote_average) if movie.vote_average else 0,
-            'poster_path': movie.poster_path,
-            'genres': [genre.name for genre in movie.genres.all()],
-        })
-    return JsonResponse({'movies': data})
+    """
+    API pour lister les films, paginée par curseur :
+    ?sort=-popularity|-vote_average|-release_date|release_date|title, ?cursor=, ?limit= (max 100),
+    ?genre=<id>, ?count=1 pour un total (mis en cache)
+    """
+    queryset = Movie.objects.prefetch_related('genres')
+    genre_id = request.GET.get('genre')
+    if genre_id:
+        queryset = queryset.filter(genres__id=genre_id)
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), API_PAGE_MAX_SIZE)
+    except ValueError:
+        limit = 20
+    page = paginate_queryset(queryset, request.GET.get('sort'), request.GET.get('cursor'), limit)
+    
+    response = {
+        'movies': (movie_list_json(movie) for movie in page),
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+    if request.GET.get('count'):
+        response['count'] = cached_count(queryset)
+    return StreamingJSONResponse(request, response)
+
+def movie_updated_at(request, movie_id):
+    """updated_at of the requested movie, read once per request for both validators"""
+    if not hasattr(request, '_movie_updated_at'):
+        request._movie_updated_at = Movie.objects.filter(id=movie_id).values_list('updated_at', flat=True).first()
+    return request._movie_updated_at
+
+
+def movie_detail_etag(request, movie_id):
+    updated_at = movie_updated_at(request, movie_id)
+    if updated_at is None:
+        return None
+    # La version du catalogue couvre les genres (m2m et renommages), absents de updated_at
+    return weak_etag(movie_id, updated_at.timestamp(), *current_versions([MOVIES_VERSION_KEY]))
+
 
 @csrf_exempt
+@conditional_get(movie_detail_etag, movie_updated_at)
 def api_movie_detail(request, movie_id):
     """API pour les détails d'un film"""
     movie = get_object_or_404(Movie, id=movie_id)
@@ -780,6 +804,9 @@ def api_movie_detail(request, movie_id):
         'poster_path': movie.poster_path,
         'backdrop_path': movie.backdrop_path,
         'genres': [genre.name for genre in movie.genres.all()],
+        'rating_count': movie.rating_count,
+        'average_rating': movie.rating_average,
+        'rating_histogram': movie.rating_histogram,
     }
     return JsonResponse(data)
 
@@ -787,42 +814,23 @@ def api_movie_detail(request, movie_id):
 def api_movie_reviews(request, movie_id):
     """API pour les avis d'un film"""
     movie = get_object_or_404(Movie, id=movie_id)
-    reviews = Review.objects.filter(movie=movie).order_by('-created_at')
-    data = []
-    for review in reviews:
-        data.append({
+    reviews = Review.objects.filter(movie=movie).select_related('user').order_by('-created_at')
+    return StreamingJSONResponse(request, {
+        'reviews': queryset_rows(reviews, lambda review: {
             'id': review.id,
             'user': review.user.username,
             'rating': review.rating,
             'comment': review.comment,
             'created_at': review.created_at.isoformat(),
         })
-    return JsonResponse({'reviews': data})
+    })
 
 @csrf_exempt
+@conditional_get(movies_etag)
 def api_genres_list(request):
     """API pour lister les genres"""
-    genres = Genre.objects.all()
-    data = []
-    for genre in genres:
-        data.append({
-            'id': genre.id,
-            'name': genre.name,
-        })
-    return JsonResponse({'genres': data})
-
-@csrf_exempt
-@login_required
-def api_recommendations(request):
-    """API pour les recommandations"""
-    try:
-        recommended_movies = neo4j_engine.get_recommendations_for_user(
-            request.user.id, limit=20, recommendation_type='smart'
-        )
-        return JsonResponse({'movies': recommended_movies})
-    except Exception as e:
-        logger.error(f"Error getting recommendations: {e}")
-        return JsonResponse({'error': 'Unable to get recommendations'}, status=500)
+    genres = Genre.objects.values('id', 'name')
+    return StreamingJSONResponse(request, {'genres': genres.iterator(chunk_size=ITERATOR_CHUNK_SIZE)})
 
 # Dashboard Views
 @login_required
@@ -877,11 +885,12 @@ def api_analytics(request):
 def api_user_profile(request):
     """API pour le profil utilisateur"""
     if request.user.is_authenticated:
+        user_stats = user_stats_for(request.user)
         data = {
             'username': request.user.username,
             'email': request.user.email,
-            'reviews_count': Review.objects.filter(user=request.user).count(),
-            'watchlist_count': Watchlist.objects.filter(user=request.user).count(),
+            'reviews_count': user_stats.review_count,
+            'watchlist_count': user_stats.watchlist_count,
         }
         return JsonResponse(data)
     return JsonResponse({'error': 'Not authenticated'}, status=401)
@@ -932,45 +941,76 @@ def api_dashboard_queries(request):
         })
 
 
+@never_cache
+@require_http_methods(["GET"])
+def api_page_state(request):
+    """
+    User-specific state of a cached page, in one call:
+    watchlist flags and own reviews for ?movies=1,2,3, home stats and recommendations
+    strip with ?home=1. Read-only: views are recorded by api_record_view.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'authenticated': False})
+    
+    user = request.user
+    data = {
+        'authenticated': True,
+        'user_id': user.id,
+        'username': user.username,
+    }
+    
+    movie_ids = []
+    for value in request.GET.get('movies', '').split(','):
+        if value.strip().isdigit():
+            movie_ids.append(int(value))
+    movie_ids = movie_ids[:PAGE_STATE_MAX_MOVIES]
+    if movie_ids:
+        data['movies'] = user_movie_states(user, movie_ids)
+    
+    if request.GET.get('home'):
+        recommended_movies = []
+        if NEO4J_AVAILABLE and neo4j_engine:
+            try:
+                recommended_movies = neo4j_engine.get_recommendations_for_user(
+                    user.id, limit=12, recommendation_type='smart'
+                ) or []
+            except Exception as e:
+                logger.error(f"Error fetching recommendations: {e}")
+        
+        user_stats = user_stats_for(user)
+        data['stats'] = {
+            'reviews_count': user_stats.review_count,
+            'watchlist_count': user_stats.watchlist_count,
+            'recommendations_count': len(recommended_movies),
+        }
+        data['recommendations_html'] = render_to_string(
+            'movies/recommendations_strip.html',
+            {'recommended_movies': recommended_movies},
+            request=request,
+        ) if recommended_movies else ''
+    
+    return JsonResponse(data)
+
+
+@login_required
+@require_http_methods(["POST"])
+def api_record_view(request, movie_id):
+    """Record the Neo4j view interaction of a movie page (POST, CSRF protected)"""
+    if NEO4J_AVAILABLE and neo4j_engine:
+        neo4j_executor.submit(neo4j_engine.record_user_interaction, request.user.id, movie_id, 'view')
+    return JsonResponse({'success': True})
+
+
 @require_http_methods(["GET"])
 def api_search_suggestions(request):
-    """API endpoint for search suggestions"""
+    """API endpoint for search suggestions (served from the in-memory prefix index)"""
     query = request.GET.get('q', '').strip()
     
     if not query or len(query) < 2:
         return JsonResponse({'suggestions': []})
     
     try:
-        # Search for movie titles matching the query
-        movies = Movie.objects.filter(
-            title__icontains=query
-        ).exclude(
-            title__exact=''
-        ).order_by('-popularity', '-vote_average')[:8]
-        
-        suggestions = []
-        for movie in movies:
-            suggestions.append({
-                'title': movie.title,
-                'type': 'movie',
-                'year': movie.release_date.year if movie.release_date else None,
-                'poster_url': f"https://image.tmdb.org/t/p/w92{movie.poster_path}" if movie.poster_path else None,
-                'url': f"/movies/{movie.id}/"
-            })
-        
-        # Also search for genres if query is long enough
-        if len(query) >= 3:
-            genres = Genre.objects.filter(
-                name__icontains=query
-            ).order_by('name')[:3]
-            
-            for genre in genres:
-                suggestions.append({
-                    'title': genre.name,
-                    'type': 'genre',
-                    'url': f"/movies/genre/{genre.id}/"
-                })
-        
+        suggestions = suggestion_index.suggest(query)
         return JsonResponse({'suggestions': suggestions})
         
     except Exception as e:
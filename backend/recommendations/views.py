@@ -1,8 +1,11 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.db.models import prefetch_related_objects
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from movies.models import Movie
+from movies.models import Movie, MovieInteraction
+from movies.json_stream import StreamingJSONResponse
+from movies.conditional import conditional_get, weak_etag, movies_last_modified
+from movies.page_cache import MOVIES_VERSION_KEY, current_versions
 from movies.recommendation_engine import (
     get_recommendations_for_user,
     get_similar_movies,
@@ -12,22 +15,36 @@ from movies.recommendation_engine import (
 )
 
 
+def movie_json(movie, with_popularity=False, with_genres=False):
+    """Row shared by the recommendation endpoints"""
+    data = {
+        'id': movie.id,
+        'title': movie.title,
+        'poster_url': movie.poster_url,
+        'vote_average': movie.vote_average,
+        'release_year': movie.release_year,
+    }
+    if with_popularity:
+        data['popularity'] = movie.popularity
+    if with_genres:
+        data['genres'] = [genre.name for genre in movie.genres.all()]
+    return data
+
+
+def with_genres(movies):
+    """Load the genres of every movie in one query"""
+    movies = list(movies)
+    prefetch_related_objects(movies, 'genres')
+    return movies
+
+
 @login_required
 def recommendations_list(request):
     """Get recommendations for the current user"""
     recommendations = get_recommendations_for_user(request.user, limit=20)
-    
-    return JsonResponse({
-        'recommendations': [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'poster_url': movie.poster_url,
-                'vote_average': movie.vote_average,
-                'release_year': movie.release_year,
-            }
-            for movie in recommendations
-        ]
+
+    return StreamingJSONResponse(request, {
+        'recommendations': (movie_json(movie) for movie in recommendations)
     })
 
 
@@ -35,19 +52,10 @@ def user_recommendations(request, user_id):
     """Get recommendations for a specific user"""
     user = get_object_or_404(User, id=user_id)
     recommendations = get_recommendations_for_user(user, limit=20)
-    
-    return JsonResponse({
+
+    return StreamingJSONResponse(request, {
         'user_id': user_id,
-        'recommendations': [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'poster_url': movie.poster_url,
-                'vote_average': movie.vote_average,
-                'release_year': movie.release_year,
-            }
-            for movie in recommendations
-        ]
+        'recommendations': (movie_json(movie) for movie in recommendations)
     })
 
 
@@ -55,77 +63,57 @@ def similar_movies(request, movie_id):
     """Get movies similar to the specified movie"""
     movie = get_object_or_404(Movie, id=movie_id)
     similar = get_similar_movies(movie, limit=12)
-    
-    return JsonResponse({
+
+    return StreamingJSONResponse(request, {
         'movie_id': movie_id,
         'movie_title': movie.title,
-        'similar_movies': [
-            {
-                'id': similar_movie.id,
-                'title': similar_movie.title,
-                'poster_url': similar_movie.poster_url,
-                'vote_average': similar_movie.vote_average,
-                'release_year': similar_movie.release_year,
-            }
-            for similar_movie in similar
-        ]
+        'similar_movies': (movie_json(similar_movie) for similar_movie in similar)
     })
 
 
+def last_interaction(request):
+    """(id, timestamp) of the latest interaction, read through the primary key index once per request"""
+    if not hasattr(request, '_last_interaction'):
+        request._last_interaction = MovieInteraction.objects.order_by('-id').values_list('id', 'timestamp').first()
+    return request._last_interaction or (None, None)
+
+
+def trending_etag(request):
+    # Le classement suit les interactions : le dernier id suffit à savoir s'il a pu changer
+    interaction_id, _ = last_interaction(request)
+    return weak_etag(interaction_id, *current_versions([MOVIES_VERSION_KEY]))
+
+
+def trending_last_modified(request):
+    _, interaction_time = last_interaction(request)
+    return max(filter(None, [interaction_time, movies_last_modified(request)]), default=None)
+
+
+@conditional_get(trending_etag, trending_last_modified)
 def trending_movies(request):
     """Get trending movies"""
     trending = get_trending_movies(limit=20)
-    
-    return JsonResponse({
-        'trending_movies': [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'poster_url': movie.poster_url,
-                'vote_average': movie.vote_average,
-                'release_year': movie.release_year,
-                'popularity': movie.popularity,
-            }
-            for movie in trending
-        ]
+
+    return StreamingJSONResponse(request, {
+        'trending_movies': (movie_json(movie, with_popularity=True) for movie in trending)
     })
 
 
 @login_required
 def smart_recommendations(request):
     """Get smart recommendations based on user's last viewed movie"""
-    recommendations = get_smart_recommendations_based_on_last_viewed(request.user, limit=20)
-    
-    return JsonResponse({
-        'smart_recommendations': [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'poster_url': movie.poster_url,
-                'vote_average': movie.vote_average,
-                'release_year': movie.release_year,
-                'genres': [genre.name for genre in movie.genres.all()],
-            }
-            for movie in recommendations
-        ]
+    recommendations = with_genres(get_smart_recommendations_based_on_last_viewed(request.user, limit=20))
+
+    return StreamingJSONResponse(request, {
+        'smart_recommendations': (movie_json(movie, with_genres=True) for movie in recommendations)
     })
 
 
-@login_required 
+@login_required
 def action_recommendations(request):
     """Get specialized action movie recommendations"""
-    recommendations = get_action_movie_recommendations(request.user, limit=20)
-    
-    return JsonResponse({
-        'action_recommendations': [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'poster_url': movie.poster_url,
-                'vote_average': movie.vote_average,
-                'release_year': movie.release_year,
-                'genres': [genre.name for genre in movie.genres.all()],
-            }
-            for movie in recommendations
-        ]
+    recommendations = with_genres(get_action_movie_recommendations(request.user, limit=20))
+
+    return StreamingJSONResponse(request, {
+        'action_recommendations': (movie_json(movie, with_genres=True) for movie in recommendations)
     })